@@ -0,0 +1,196 @@
+# bench/fakes.py
+"""
+Offline stand-ins for the upstream providers and Gemini.
+
+FakeProviders answers the Amadeus, Viator, OpenWeather and Qloo endpoints the
+services call, as an httpx transport, so requests still pass through the
+pooled clients, retries and circuit breakers. FakeGenerativeModel replaces
+google.generativeai's model, and FakeGeolocator geopy's Nominatim. All of
+them draw latency and failures from a LatencyProfile.
+"""
+import json
+import time
+import random
+import asyncio
+from urllib.parse import parse_qs
+from typing import Dict, Optional
+
+import httpx
+
+from .fixtures import Fixture, prompt_facts
+
+
+class LatencyProfile:
+    """
+    Response time and failure rate of a fake upstream.
+
+    Latency is `latency` seconds plus or minus up to `jitter`; a share
+    `error_rate` of calls fails (HTTP 503 for providers, an exception for
+    Gemini). `overrides` holds per-provider (latency, jitter, error_rate).
+    """
+
+    def __init__(self, latency: float = 0.05, jitter: float = 0.02, error_rate: float = 0.0,
+                 overrides: Optional[Dict[str, tuple]] = None, seed: int = 7):
+        self.latency, self.jitter, self.error_rate = latency, jitter, error_rate
+        self.overrides = overrides or {}
+        self._rng = random.Random(seed)
+
+    def _settings(self, provider: str) -> tuple:
+        return self.overrides.get(provider, (self.latency, self.jitter, self.error_rate))
+
+    def delay(self, provider: str) -> float:
+        latency, jitter, _ = self._settings(provider)
+        return max(0.0, latency + self._rng.uniform(-jitter, jitter))
+
+    def fails(self, provider: str) -> bool:
+        return self._rng.random() < self._settings(provider)[2]
+
+
+def _json_response(status: int, body: dict, request: httpx.Request) -> httpx.Response:
+    return httpx.Response(status, content=json.dumps(body).encode("utf-8"), headers={"Content-Type": "application/json"}, request=request)
+
+
+class FakeProviders:
+    """Routes provider requests to fixture payloads, one transport per provider."""
+
+    def __init__(self, fixture: Fixture, profile: LatencyProfile):
+        self.fixture = fixture
+        self.profile = profile
+        self.requests: Dict[str, int] = {}
+
+    def transport(self, provider: str, limits: Optional[httpx.Limits] = None) -> httpx.AsyncBaseTransport:
+        """Matches http_clients.set_transport_factory."""
+        return _FakeTransport(self, provider)
+
+    def route(self, provider: str, request: httpx.Request) -> tuple:
+        path = request.url.path
+        query = parse_qs(request.url.query.decode("ascii") if isinstance(request.url.query, bytes) else request.url.query)
+        fixture = self.fixture
+        if provider == "amadeus":
+            if path.endswith("/security/oauth2/token"):
+                return 200, fixture.amadeus_token()
+            if path.endswith("/locations/hotels/by-city"):
+                return 200, fixture.amadeus_hotel_list()
+            if path.endswith("/reference-data/locations"):
+                return 200, fixture.amadeus_locations()
+            if path.endswith("/shopping/hotel-offers"):
+                return 200, fixture.amadeus_hotel_offers(query.get("hotelIds", []))
+        elif provider == "viator":
+            if path.endswith("/destinations"):
+                return 200, fixture.viator_destinations()
+            if path.endswith("/products/search"):
+                return 200, fixture.viator_products()
+        elif provider == "openweather":
+            if path.endswith("/forecast"):
+                return 200, fixture.openweather_forecast()
+        elif provider == "qloo":
+            if path.endswith("/search"):
+                return 200, fixture.qloo_search((query.get("query") or [""])[0])
+            if path.endswith("/insights"):
+                payload = json.loads(request.content or b"{}")
+                take = ((payload.get("results") or [{}])[0]).get("take", 10)
+                return 200, fixture.qloo_insights(take)
+        return 404, {"error": f"No fake route for {request.method} {path}"}
+
+
+class _FakeTransport(httpx.AsyncBaseTransport):
+    def __init__(self, providers: FakeProviders, provider: str):
+        self.providers = providers
+        self.provider = provider
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        await request.aread()
+        providers, profile = self.providers, self.providers.profile
+        providers.requests[self.provider] = providers.requests.get(self.provider, 0) + 1
+        await asyncio.sleep(profile.delay(self.provider))
+        if profile.fails(self.provider):
+            return _json_response(503, {"error": "injected failure"}, request)
+        status, body = providers.route(self.provider, request)
+        return _json_response(status, body, request)
+
+
+class _Usage:
+    def __init__(self, prompt_tokens: int, output_tokens: int):
+        self.prompt_token_count = prompt_tokens
+        self.candidates_token_count = output_tokens
+
+
+class FakeResponse:
+    """The parts of a Gemini response the orchestrator reads: .text and .usage_metadata."""
+
+    def __init__(self, text: str, prompt: str = "", usage: Optional[_Usage] = None):
+        self.text = text
+        self.usage_metadata = usage or _Usage(len(prompt) // 4, len(text) // 4)
+
+
+class _FakeStream:
+    def __init__(self, chunks: list, delay: float):
+        self.chunks = chunks
+        self.delay = delay
+
+    async def __aiter__(self):
+        for chunk in self.chunks:
+            await asyncio.sleep(self.delay)
+            yield chunk
+
+
+class FakeGenerativeModel:
+    """
+    Answers prompt.txt, plan_prompt.txt, day_prompt.txt and budget prompts
+    with the sample itinerary, shaped to the trip the prompt asks for.
+    Streams are split into STREAM_CHUNKS chunks spread over the same latency.
+    """
+
+    STREAM_CHUNKS = 8
+
+    def __init__(self, model_name: str, fixture: Fixture, profile: LatencyProfile):
+        self.model_name = model_name
+        self.fixture = fixture
+        self.profile = profile
+
+    def answer(self, prompt: str) -> dict:
+        facts = prompt_facts(prompt)
+        trip_length = facts["trip_length"] or len(self.fixture.days) or 3
+        if facts["day_number"]:
+            day = self.fixture.day(facts["day_number"])
+            if facts["date"]:
+                day["date"] = facts["date"]
+            return day
+        if "day_plans" in prompt:
+            return self.fixture.plan(trip_length, facts["check_in"])
+        if '"accommodation_budget":' in prompt:
+            return self.fixture.budget_split()
+        return self.fixture.itinerary(trip_length, facts["check_in"])
+
+    async def generate_content_async(self, prompt: str, stream: bool = False, generation_config=None, **kwargs):
+        text = json.dumps(self.answer(prompt), ensure_ascii=False)
+        delay = self.profile.delay("gemini")
+        if self.profile.fails("gemini"):
+            await asyncio.sleep(delay)
+            raise RuntimeError("injected Gemini failure")
+        if not stream:
+            await asyncio.sleep(delay)
+            return FakeResponse(text, prompt)
+        size = -(-len(text) // self.STREAM_CHUNKS)
+        pieces = [text[i:i + size] for i in range(0, len(text), size)]
+        chunks = [FakeResponse(piece, usage=_Usage(0, 0)) for piece in pieces]
+        chunks[-1].usage_metadata = _Usage(len(prompt) // 4, len(text) // 4)
+        return _FakeStream(chunks, delay / len(chunks))
+
+
+class _Location:
+    def __init__(self, raw: dict):
+        self.raw = raw
+
+
+class FakeGeolocator:
+    """geopy's Nominatim.reverse, blocking for the profile's latency like the real call."""
+
+    def __init__(self, fixture: Fixture, profile: LatencyProfile):
+        self.fixture = fixture
+        self.profile = profile
+
+    def reverse(self, query: str, language: str = "en", **kwargs) -> _Location:
+        time.sleep(self.profile.delay("nominatim"))
+        lat, lon = (float(part) for part in query.split(","))
+        return _Location({"address": self.fixture.address(lat, lon)})
@@ -0,0 +1,253 @@
+# bench/fixtures.py
+"""
+Provider payloads derived from the sample itinerary in response.json.
+
+Every place in the sample becomes a Qloo POI and a Viator product, its hotel
+becomes the first of HOTEL_COUNT Amadeus offers, and its weather the
+OpenWeather forecast, so a benchmark run plans the same London trip the
+sample describes. Coordinates and prices are generated from a fixed seed.
+"""
+import os
+import re
+import json
+import random
+import hashlib
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+SAMPLE_PATH = os.path.join(os.path.dirname(__file__), "..", "response.json")
+
+CITY = "London"
+COUNTRY = "United Kingdom"
+CITY_CODE = "LON"
+CITY_CENTER = (51.5074, -0.1278)
+VIATOR_DESTINATION_ID = "737"
+HOTEL_COUNT = 60
+QLOO_RESULTS_PER_SEARCH = 3
+
+SLOTS = ("morning", "lunch", "afternoon", "evening", "dinner")
+
+
+def load_sample(path: str = SAMPLE_PATH) -> dict:
+    """Reads the sample itinerary. The file is UTF-16 (it was saved from PowerShell)."""
+    with open(path, "rb") as f:
+        raw = f.read()
+    for encoding in ("utf-16", "utf-8-sig"):
+        try:
+            return json.loads(raw.decode(encoding))
+        except (UnicodeDecodeError, ValueError):
+            continue
+    raise ValueError(f"{path} is not a JSON document in UTF-16 or UTF-8.")
+
+
+def _stable_id(prefix: str, text: str) -> str:
+    return f"{prefix}-{hashlib.sha1(text.encode('utf-8')).hexdigest()[:12]}"
+
+
+class Fixture:
+    """The sample trip, as the raw responses of each provider."""
+
+    def __init__(self, sample: Optional[dict] = None, seed: int = 7, hotel_count: int = HOTEL_COUNT):
+        self.sample = sample or load_sample()
+        rng = random.Random(seed)
+        self.places = self._places(rng)
+        self.hotels = self._hotels(rng, hotel_count)
+        self.days = [day for day in self.sample.get("days", []) if isinstance(day, dict)]
+
+    def _places(self, rng: random.Random) -> List[dict]:
+        places, seen = [], set()
+        for day in self.sample.get("days", []):
+            for slot in SLOTS:
+                item = day.get(slot) or {}
+                name = item.get("activity_name") or item.get("restaurant_name")
+                if not name or name in seen:
+                    continue
+                seen.add(name)
+                cost = item.get("estimated_cost_range") or {}
+                places.append({
+                    "name": name,
+                    "id": item.get("qloo_poi_id") or _stable_id("poi", name),
+                    "kind": item.get("type") or item.get("cuisine") or "Place",
+                    "description": item.get("description") or item.get("rationale") or "",
+                    "address": item.get("address") or f"{CITY}, {COUNTRY}",
+                    "website": item.get("website"),
+                    "price": float(cost.get("min") or 0),
+                    "lat": CITY_CENTER[0] + rng.uniform(-0.03, 0.03),
+                    "lon": CITY_CENTER[1] + rng.uniform(-0.05, 0.05),
+                    "rating": round(rng.uniform(3.8, 5.0), 1),
+                    "affinity": round(rng.uniform(0.4, 1.0), 3),
+                })
+        return places
+
+    def _hotels(self, rng: random.Random, count: int) -> List[dict]:
+        details = self.sample.get("hotel_details") or {}
+        total = float(details.get("total_price_for_stay") or 500.0)
+        hotels = [{
+            "hotelId": details.get("hotelId") or "BENCH000",
+            "name": details.get("name") or "Sample Hotel",
+            "price": total,
+        }]
+        for i in range(1, count):
+            hotels.append({"hotelId": f"BENCH{i:03d}", "name": f"{CITY} Bench Hotel {i}", "price": round(total * rng.uniform(0.6, 2.5), 2)})
+        for hotel in hotels:
+            hotel["latitude"] = CITY_CENTER[0] + rng.uniform(-0.04, 0.04)
+            hotel["longitude"] = CITY_CENTER[1] + rng.uniform(-0.06, 0.06)
+        return hotels
+
+    # --- Amadeus ---
+
+    def amadeus_token(self) -> dict:
+        return {"access_token": "bench-token", "expires_in": 1799}
+
+    def amadeus_locations(self) -> dict:
+        return {"data": [{"name": CITY.upper(), "subType": "CITY", "iataCode": CITY_CODE}]}
+
+    def amadeus_hotel_list(self) -> dict:
+        return {"data": [{"hotelId": hotel["hotelId"], "name": hotel["name"]} for hotel in self.hotels]}
+
+    def amadeus_hotel_offers(self, hotel_ids: List[str]) -> dict:
+        wanted = set(hotel_ids)
+        return {"data": [
+            {
+                "available": True,
+                "hotel": {k: hotel[k] for k in ("hotelId", "name", "latitude", "longitude")},
+                "offers": [{"price": {"total": f"{hotel['price']:.2f}", "currency": "USD"}}],
+            }
+            for hotel in self.hotels if hotel["hotelId"] in wanted
+        ]}
+
+    # --- Viator ---
+
+    def viator_destinations(self) -> dict:
+        return {"destinations": [{"destinationId": VIATOR_DESTINATION_ID, "name": CITY, "type": "CITY"}]}
+
+    def viator_products(self) -> dict:
+        return {"products": [
+            {
+                "productCode": _stable_id("VI", place["name"]),
+                "title": place["name"],
+                "description": place["description"],
+                "pricing": {"summary": {"fromPrice": place["price"]}, "currency": "USD"},
+                "reviews": {"combinedAverageRating": place["rating"]},
+                "images": [{"url": None}],
+                "webURL": place["website"],
+            }
+            for place in self.places
+        ]}
+
+    # --- OpenWeather ---
+
+    def openweather_forecast(self, start: Optional[date] = None) -> dict:
+        """A 5-day, 3-hourly forecast from today, cycling through the sample's weather."""
+        start = start or date.today()
+        weathers = [day.get("weather") or {} for day in self.days] or [{}]
+        entries = []
+        for step in range(5 * 8):
+            moment = datetime(start.year, start.month, start.day, tzinfo=timezone.utc) + timedelta(hours=3 * step)
+            weather = weathers[(step // 8) % len(weathers)]
+            entries.append({
+                "dt": int(moment.timestamp()),
+                "main": {"temp": float(weather.get("temperature_celsius") or 15) + (step % 8 - 4) * 0.5},
+                "weather": [{"main": weather.get("main") or "Clouds", "description": weather.get("description") or "clouds", "icon": "04d"}],
+            })
+        return {"list": entries, "city": {"name": CITY, "timezone": 0}}
+
+    # --- Qloo ---
+
+    def qloo_search(self, query: str) -> dict:
+        return {"results": [
+            {"entity_id": _stable_id("ent", f"{query}:{i}"), "name": f"{query} {i}", "types": ["urn:entity:place"]}
+            for i in range(QLOO_RESULTS_PER_SEARCH)
+        ]}
+
+    def qloo_insights(self, take: int = 10) -> dict:
+        entities = [
+            {
+                "entity_id": place["id"],
+                "name": place["name"],
+                "type": "urn:entity:place",
+                "properties": {
+                    "description": place["description"],
+                    "address": place["address"],
+                    "website": place["website"],
+                    "business_rating": place["rating"],
+                },
+                "location": {"lat": place["lat"], "lon": place["lon"]},
+                "query": {"affinity": place["affinity"]},
+            }
+            for place in self.places[:max(take, 1)]
+        ]
+        return {"success": True, "results": {"entities": entities}}
+
+    # --- Nominatim ---
+
+    def address(self, lat: float, lon: float) -> dict:
+        return {"house_number": str(int(abs(lat * 1e4)) % 200 + 1), "road": "Bench Street", "city": CITY, "postcode": "SW1A 1AA", "country": COUNTRY}
+
+    # --- Gemini ---
+
+    def itinerary(self, trip_length: int, check_in: Optional[str] = None) -> dict:
+        """The sample itinerary, its days repeated or cut to `trip_length`."""
+        itinerary = {key: value for key, value in self.sample.items() if key != "days"}
+        itinerary["days"] = [self.day(n, check_in) for n in range(1, trip_length + 1)]
+        return itinerary
+
+    def day(self, day_number: int, check_in: Optional[str] = None) -> dict:
+        day = dict(self.days[(day_number - 1) % len(self.days)]) if self.days else {}
+        day["day_number"] = day_number
+        day.setdefault("alternative_activities", [])
+        if check_in:
+            day["date"] = (date.fromisoformat(check_in) + timedelta(days=day_number - 1)).isoformat()
+        return day
+
+    def plan(self, trip_length: int, check_in: Optional[str] = None) -> dict:
+        plan = {key: value for key, value in self.sample.items() if key != "days"}
+        plan["day_plans"] = []
+        for n in range(1, trip_length + 1):
+            day = self.day(n, check_in)
+            activities = [day[slot]["activity_name"] for slot in ("morning", "afternoon", "evening") if (day.get(slot) or {}).get("activity_name")]
+            plan["day_plans"].append({"day_number": n, "date": day.get("date"), "theme": day.get("theme"), "activities": activities})
+        return plan
+
+    def budget_split(self) -> dict:
+        allocation = self.sample.get("budget_allocation") or {}
+        return {
+            "accommodation_budget": allocation.get("accommodation_budget_total", 0),
+            "food_budget": allocation.get("food_budget_total", 0),
+            "activities_budget": allocation.get("activities_budget_total", 0),
+            "transportation_budget": allocation.get("transportation_budget", 0),
+            "shopping_budget": allocation.get("shopping_budget", 0),
+        }
+
+    def request(self, trip_length: Optional[int] = None, check_in: Optional[date] = None, **overrides) -> dict:
+        """An ItineraryRequest body for the sample trip."""
+        trip_length = trip_length or len(self.days) or 3
+        check_in = check_in or date.today() + timedelta(days=1)
+        allocation = self.sample.get("budget_allocation") or {}
+        body = {
+            "budget": allocation.get("total_trip_budget", 2000.0),
+            "destination_city": CITY,
+            "destination_country": COUNTRY,
+            "likes": ["British history", "Markets", "Mr. Beans"],
+            "check_in_date": check_in.isoformat(),
+            "check_out_date": (check_in + timedelta(days=trip_length - 1)).isoformat(),
+        }
+        body.update(overrides)
+        return body
+
+
+_TRIP_LENGTH = re.compile(r"Trip Length:\s*(\d+)")
+_DAY_OF = re.compile(r"Day:\s*(\d+)\s+of\s+(\d+),\s*(\d{4}-\d{2}-\d{2})?")
+_CHECK_IN = re.compile(r"Check In:\s*(\d{4}-\d{2}-\d{2})")
+
+
+def prompt_facts(prompt: str) -> Dict[str, Optional[object]]:
+    """The trip length, check-in date and (for day prompts) day number a prompt was filled with."""
+    facts: Dict[str, Optional[object]] = {"trip_length": None, "check_in": None, "day_number": None, "date": None}
+    if match := _TRIP_LENGTH.search(prompt):
+        facts["trip_length"] = int(match.group(1))
+    if match := _CHECK_IN.search(prompt):
+        facts["check_in"] = match.group(1)
+    if match := _DAY_OF.search(prompt):
+        facts["day_number"], facts["trip_length"], facts["date"] = int(match.group(1)), int(match.group(2)), match.group(3)
+    return facts
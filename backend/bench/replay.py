@@ -0,0 +1,232 @@
+# bench/replay.py
+"""
+Record/replay of everything the services fetch.
+
+Recording wraps the three I/O boundaries every service function goes
+through: the providers' httpx transports (Qloo, Amadeus, Viator,
+OpenWeather), the Gemini model and the Nominatim geolocator. Replaying serves
+the recorded responses in their place, with their recorded latency scaled by
+`speed`, so the service functions themselves (parsing, caching, retries,
+ranking) still run. Misses go to an optional fallback, e.g. the fakes.
+
+A cassette is one JSON file holding the benchmark request it was recorded
+for and every interaction. Access tokens are masked before they are stored.
+"""
+import os
+import json
+import time
+import asyncio
+import hashlib
+from typing import Any, Dict, Optional
+
+import httpx
+
+from .fakes import FakeResponse, _FakeStream, _Location, _Usage
+
+SECRET_PARAMS = {"appid", "apikey", "api_key", "key"}
+
+
+def _digest(data: bytes) -> str:
+    return hashlib.sha1(data).hexdigest()[:16]
+
+
+class Cassette:
+    """Recorded interactions, keyed by kind ("http", "gemini", "geocode") and request."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.request: Optional[dict] = None
+        self.entries: Dict[str, Dict[str, dict]] = {"http": {}, "gemini": {}, "geocode": {}}
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def load(cls, path: str) -> "Cassette":
+        cassette = cls(path)
+        with open(path, "r", encoding="utf-8") as f:
+            stored = json.load(f)
+        cassette.request = stored.get("request")
+        for kind in cassette.entries:
+            cassette.entries[kind] = stored.get(kind, {})
+        return cassette
+
+    def save(self) -> None:
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"request": self.request, **self.entries}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def get(self, kind: str, key: str) -> Optional[dict]:
+        entry = self.entries[kind].get(key)
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return entry
+
+    def put(self, kind: str, key: str, entry: dict) -> None:
+        self.entries[kind][key] = entry
+
+
+def http_key(provider: str, request: httpx.Request) -> str:
+    """Provider, method, path, query without credentials, and a JSON body digest."""
+    params = sorted((k, v) for k, v in request.url.params.multi_items() if k.lower() not in SECRET_PARAMS)
+    query = "&".join(f"{k}={v}" for k, v in params)
+    body = ""
+    # Form bodies carry client credentials; only JSON bodies select a response
+    if request.content and "json" in request.headers.get("Content-Type", ""):
+        body = _digest(request.content)
+    return f"{provider} {request.method} {request.url.path}?{query} {body}".rstrip()
+
+
+def _mask(content: bytes) -> str:
+    text = content.decode("utf-8", errors="replace")
+    try:
+        body = json.loads(text)
+    except ValueError:
+        return text
+    if isinstance(body, dict) and "access_token" in body:
+        body["access_token"] = "recorded-token"
+        return json.dumps(body)
+    return text
+
+
+class RecordingTransport(httpx.AsyncBaseTransport):
+    def __init__(self, transport: httpx.AsyncBaseTransport, provider: str, cassette: Cassette):
+        self.transport, self.provider, self.cassette = transport, provider, cassette
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        await request.aread()
+        started = time.perf_counter()
+        response = await self.transport.handle_async_request(request)
+        content = await response.aread()
+        elapsed = time.perf_counter() - started
+        # Failures are not recorded, so a replay sees the successful retry
+        if response.status_code < 500:
+            self.cassette.put("http", http_key(self.provider, request), {
+                "status": response.status_code,
+                "content_type": response.headers.get("Content-Type", "application/json"),
+                "body": _mask(content),
+                "elapsed": elapsed,
+            })
+        return httpx.Response(response.status_code, headers=response.headers, content=content, request=request)
+
+    async def aclose(self) -> None:
+        await self.transport.aclose()
+
+
+class ReplayTransport(httpx.AsyncBaseTransport):
+    def __init__(self, provider: str, cassette: Cassette, speed: float = 1.0, fallback: Optional[httpx.AsyncBaseTransport] = None):
+        self.provider, self.cassette, self.speed, self.fallback = provider, cassette, speed, fallback
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        await request.aread()
+        entry = self.cassette.get("http", http_key(self.provider, request))
+        if entry is None:
+            if self.fallback is not None:
+                return await self.fallback.handle_async_request(request)
+            return httpx.Response(404, json={"error": "not recorded"}, request=request)
+        await asyncio.sleep(entry["elapsed"] * self.speed)
+        return httpx.Response(
+            entry["status"], content=entry["body"].encode("utf-8"),
+            headers={"Content-Type": entry["content_type"]}, request=request,
+        )
+
+
+def gemini_key(model_name: str, prompt: str) -> str:
+    return _digest(f"{model_name}\n{prompt}".encode("utf-8"))
+
+
+def _usage_of(response: Any) -> Optional[list]:
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return None
+    return [getattr(usage, "prompt_token_count", 0) or 0, getattr(usage, "candidates_token_count", 0) or 0]
+
+
+class _RecordedStream:
+    """Passes a Gemini stream through while collecting its text for the cassette."""
+
+    def __init__(self, stream: Any, on_done):
+        self.stream, self.on_done = stream, on_done
+
+    async def __aiter__(self):
+        texts, last = [], None
+        async for chunk in self.stream:
+            texts.append(chunk.text)
+            last = chunk
+            yield chunk
+        self.on_done(texts, _usage_of(last))
+
+
+class RecordingModel:
+    """Wraps a google.generativeai GenerativeModel and records every response."""
+
+    def __init__(self, model: Any, model_name: str, cassette: Cassette):
+        self.model, self.model_name, self.cassette = model, model_name, cassette
+
+    async def generate_content_async(self, prompt: str, stream: bool = False, **kwargs):
+        key = gemini_key(self.model_name, prompt)
+        started = time.perf_counter()
+        response = await self.model.generate_content_async(prompt, stream=stream, **kwargs)
+        if not stream:
+            self.cassette.put("gemini", key, {
+                "chunks": [response.text], "usage": _usage_of(response), "elapsed": time.perf_counter() - started,
+            })
+            return response
+
+        def done(texts, usage):
+            self.cassette.put("gemini", key, {"chunks": texts, "usage": usage, "elapsed": time.perf_counter() - started})
+        return _RecordedStream(response, done)
+
+
+class ReplayModel:
+    """Serves recorded Gemini responses, streamed in their recorded chunks."""
+
+    def __init__(self, model_name: str, cassette: Cassette, speed: float = 1.0, fallback: Any = None):
+        self.model_name, self.cassette, self.speed, self.fallback = model_name, cassette, speed, fallback
+
+    async def generate_content_async(self, prompt: str, stream: bool = False, **kwargs):
+        entry = self.cassette.get("gemini", gemini_key(self.model_name, prompt))
+        if entry is None:
+            if self.fallback is not None:
+                return await self.fallback.generate_content_async(prompt, stream=stream, **kwargs)
+            raise RuntimeError("Gemini response not recorded for this prompt")
+        usage = _Usage(*entry["usage"]) if entry.get("usage") else None
+        delay = entry["elapsed"] * self.speed
+        if not stream:
+            await asyncio.sleep(delay)
+            return FakeResponse("".join(entry["chunks"]), usage=usage)
+        chunks = [FakeResponse(text, usage=_Usage(0, 0)) for text in entry["chunks"]] or [FakeResponse("", usage=_Usage(0, 0))]
+        chunks[-1].usage_metadata = usage
+        return _FakeStream(chunks, delay / len(chunks))
+
+
+def geocode_key(query: str) -> str:
+    lat, lon = (round(float(part), 4) for part in query.split(","))
+    return f"{lat},{lon}"
+
+
+class RecordingGeolocator:
+    def __init__(self, geolocator: Any, cassette: Cassette):
+        self.geolocator, self.cassette = geolocator, cassette
+
+    def reverse(self, query: str, **kwargs):
+        started = time.perf_counter()
+        location = self.geolocator.reverse(query, **kwargs)
+        self.cassette.put("geocode", geocode_key(query), {
+            "raw": location.raw if location else None, "elapsed": time.perf_counter() - started,
+        })
+        return location
+
+
+class ReplayGeolocator:
+    def __init__(self, cassette: Cassette, speed: float = 1.0, fallback: Any = None):
+        self.cassette, self.speed, self.fallback = cassette, speed, fallback
+
+    def reverse(self, query: str, **kwargs):
+        entry = self.cassette.get("geocode", geocode_key(query))
+        if entry is None:
+            return self.fallback.reverse(query, **kwargs) if self.fallback is not None else None
+        time.sleep(entry["elapsed"] * self.speed)
+        return _Location(entry["raw"]) if entry["raw"] is not None else None
@@ -0,0 +1,278 @@
+# bench/run.py
+"""
+End-to-end benchmark of the itinerary API, with no network.
+
+Drives the FastAPI app in-process at fixed concurrency levels and reports
+p50/p95/p99 latency, throughput and per-stage timing (from services.metrics).
+Upstreams are served by the fakes (default), or by a cassette recorded once
+against the real providers:
+
+    python -m bench.run                                  # fakes, concurrency 1, 4, 16
+    python -m bench.run --concurrency 8 --requests 64 --error-rate 0.05
+    python -m bench.run --mode record --cassette bench/london.json   # needs .env keys
+    python -m bench.run --mode replay --cassette bench/london.json --speed 0
+    python -m bench.run --json out.json --baseline last.json --tolerance 0.2
+
+With --baseline, the exit status is 1 when p95 latency or throughput at any
+concurrency level is more than --tolerance worse than the baseline.
+
+Run from backend/, so `services` and `main` are importable.
+"""
+import os
+import sys
+import json
+import math
+import time
+import types
+import asyncio
+import argparse
+import tempfile
+from datetime import date, timedelta
+from typing import Dict, List, Optional
+
+from .fixtures import Fixture
+from .fakes import LatencyProfile, FakeProviders, FakeGenerativeModel, FakeGeolocator
+from .replay import (
+    Cassette, RecordingTransport, ReplayTransport, RecordingModel, ReplayModel, RecordingGeolocator, ReplayGeolocator,
+)
+
+ENDPOINTS = {"itinerary": "/api/v1/itinerary", "stream": "/api/v1/itinerary/stream"}
+
+
+def configure_environment(args: argparse.Namespace) -> None:
+    """Settings the services read at import time. Must run before `main` is imported."""
+    os.environ.setdefault("TASTETRAIL_CACHE_DIR", tempfile.mkdtemp(prefix="tastetrail-bench-"))
+    # Cold caches by default, so every request does the full work
+    cache_backend = "memory" if args.warm else "none"
+    os.environ.setdefault("PROVIDER_CACHE_BACKEND", cache_backend)
+    os.environ.setdefault("ITINERARY_CACHE_BACKEND", cache_backend)
+    # Per-request INFO lines would interleave with the report
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    if args.mode != "record":
+        for name in ("QLOO_API_KEY", "VIATOR_API_KEY", "AMADEUS_CLIENT_ID", "AMADEUS_CLIENT_SECRET", "OPENWEATHER_KEY", "GEMINI_API_KEY"):
+            os.environ.setdefault(name, "bench")
+        os.environ.setdefault("QLOO_API_URL", "https://qloo.bench.invalid")
+        # The public Nominatim limit of 1/s would dominate every cold run
+        os.environ.setdefault("NOMINATIM_RATE_LIMIT_PER_SEC", "50")
+        os.environ.setdefault("GEOCODE_MAX_CONCURRENCY", "8")
+    if args.generation_mode:
+        os.environ["ITINERARY_GENERATION_MODE"] = args.generation_mode
+
+
+def install_upstreams(args: argparse.Namespace, fixture: Fixture) -> Optional[Cassette]:
+    """Points the provider clients, Gemini and Nominatim at fakes, a recording, or a replay."""
+    from services import http_clients, geocoding, llm_orchestrator
+
+    overrides = {"gemini": (args.llm_latency, args.llm_jitter, args.llm_error_rate), "nominatim": (args.latency, args.jitter, 0.0)}
+    profile = LatencyProfile(args.latency, args.jitter, args.error_rate, overrides=overrides, seed=args.seed)
+    fakes = FakeProviders(fixture, profile)
+    fake_geolocator = FakeGeolocator(fixture, profile)
+    real_genai = llm_orchestrator.genai
+
+    if args.mode == "fake":
+        http_clients.set_transport_factory(fakes.transport)
+        llm_orchestrator.genai = types.SimpleNamespace(GenerativeModel=lambda name: FakeGenerativeModel(name, fixture, profile))
+        geocoding._geolocator = fake_geolocator
+        return None
+
+    if args.mode == "record":
+        cassette = Cassette(args.cassette)
+        import httpx
+        http_clients.set_transport_factory(lambda provider, limits: RecordingTransport(
+            httpx.AsyncHTTPTransport(limits=limits, http2=http_clients.HTTP2_AVAILABLE), provider, cassette,
+        ))
+        llm_orchestrator.genai = types.SimpleNamespace(
+            GenerativeModel=lambda name: RecordingModel(real_genai.GenerativeModel(name), name, cassette),
+        )
+        geocoding._geolocator = RecordingGeolocator(geocoding._geolocator, cassette)
+        return cassette
+
+    cassette = Cassette.load(args.cassette)
+    http_clients.set_transport_factory(lambda provider, limits: ReplayTransport(
+        provider, cassette, speed=args.speed, fallback=fakes.transport(provider),
+    ))
+    llm_orchestrator.genai = types.SimpleNamespace(
+        GenerativeModel=lambda name: ReplayModel(name, cassette, speed=args.speed, fallback=FakeGenerativeModel(name, fixture, profile)),
+    )
+    geocoding._geolocator = ReplayGeolocator(cassette, speed=args.speed, fallback=fake_geolocator)
+    return cassette
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, min(len(sorted_values), math.ceil(q / 100 * len(sorted_values))))
+    return sorted_values[rank - 1]
+
+
+def stage_summary(before: dict, after: dict) -> Dict[str, dict]:
+    """Count and mean per stage between two STAGE_SECONDS snapshots."""
+    stages = {}
+    for key, (_, total, count) in sorted(after.items()):
+        _, total_before, count_before = before.get(key, (None, 0.0, 0))
+        calls = count - count_before
+        if calls:
+            stages[key[0]] = {"calls": calls, "mean_ms": round((total - total_before) / calls * 1000, 2)}
+    return stages
+
+
+async def consume(client, endpoint: str, body: dict) -> int:
+    """Sends one request and reads the whole response. Returns the status, or 0 for an SSE error event."""
+    if endpoint == "stream":
+        async with client.stream("POST", ENDPOINTS[endpoint], json=body) as response:
+            failed = False
+            async for line in response.aiter_lines():
+                failed = failed or line == "event: error"
+            return 0 if failed else response.status_code
+    response = await client.post(ENDPOINTS[endpoint], json=body)
+    await response.aread()
+    return response.status_code
+
+
+async def run_level(client, metrics, endpoint: str, body: dict, concurrency: int, total: int) -> dict:
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+    queue: asyncio.Queue = asyncio.Queue()
+    for _ in range(total):
+        queue.put_nowait(body)
+
+    async def worker():
+        while not queue.empty():
+            request_body = queue.get_nowait()
+            started = time.perf_counter()
+            try:
+                status = await consume(client, endpoint, request_body)
+            except Exception as e:
+                status = type(e).__name__
+            latencies.append(time.perf_counter() - started)
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+
+    before = metrics.STAGE_SECONDS.snapshot()
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "concurrency": concurrency,
+        "requests": total,
+        "statuses": statuses,
+        "wall_s": round(wall, 3),
+        "throughput_rps": round(total / wall, 3) if wall else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+        "stages": stage_summary(before, metrics.STAGE_SECONDS.snapshot()),
+    }
+
+
+def print_report(results: List[dict]) -> None:
+    print(f"\n{'conc':>5} {'reqs':>5} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}  statuses")
+    for level in results:
+        print(f"{level['concurrency']:>5} {level['requests']:>5} {level['throughput_rps']:>8} {level['p50_ms']:>9} "
+              f"{level['p95_ms']:>9} {level['p99_ms']:>9}  {level['statuses']}")
+    for level in results:
+        print(f"\nStages at concurrency {level['concurrency']}:")
+        for stage, timing in level["stages"].items():
+            print(f"  {stage:<36} {timing['calls']:>6} calls {timing['mean_ms']:>10} ms mean")
+
+
+def regressions(results: List[dict], baseline: List[dict], tolerance: float) -> List[str]:
+    found = []
+    previous = {level["concurrency"]: level for level in baseline}
+    for level in results:
+        old = previous.get(level["concurrency"])
+        if not old:
+            continue
+        if old["p95_ms"] and level["p95_ms"] > old["p95_ms"] * (1 + tolerance):
+            found.append(f"p95 at concurrency {level['concurrency']}: {old['p95_ms']} -> {level['p95_ms']} ms")
+        if old["throughput_rps"] and level["throughput_rps"] < old["throughput_rps"] * (1 - tolerance):
+            found.append(f"throughput at concurrency {level['concurrency']}: {old['throughput_rps']} -> {level['throughput_rps']} rps")
+    return found
+
+
+async def benchmark(args: argparse.Namespace) -> List[dict]:
+    fixture = Fixture(seed=args.seed, hotel_count=args.hotels)
+    cassette = install_upstreams(args, fixture)
+
+    import httpx
+    import main as api
+    from services import metrics
+
+    if cassette is not None and cassette.request:
+        body = cassette.request
+    else:
+        check_in = date.fromisoformat(args.check_in) if args.check_in else date.today() + timedelta(days=1)
+        body = fixture.request(trip_length=args.days, check_in=check_in, regenerate=not args.warm)
+    if cassette is not None:
+        cassette.request = body
+
+    results = []
+    async with api.app.router.lifespan_context(api.app):
+        transport = httpx.ASGITransport(app=api.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            levels = [1] if args.mode == "record" else args.concurrency
+            for concurrency in levels:
+                total = 1 if args.mode == "record" else max(args.requests, concurrency)
+                print(f"🚀 [Bench] {total} requests at concurrency {concurrency}...")
+                results.append(await run_level(client, metrics, args.endpoint, body, concurrency, total))
+
+    if cassette is not None:
+        if args.mode == "record":
+            cassette.save()
+            print(f"✅ [Bench] Recorded {sum(len(v) for v in cassette.entries.values())} interactions to {cassette.path}")
+        else:
+            print(f"✅ [Bench] Replayed {cassette.hits} recorded interactions ({cassette.misses} served by fakes)")
+    return results
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Offline end-to-end benchmark of the itinerary API.")
+    parser.add_argument("--mode", choices=("fake", "record", "replay"), default="fake")
+    parser.add_argument("--cassette", default=os.path.join(os.path.dirname(__file__), "cassette.json"))
+    parser.add_argument("--speed", type=float, default=1.0, help="Replay latency multiplier; 0 replays instantly.")
+    parser.add_argument("--endpoint", choices=tuple(ENDPOINTS), default="itinerary")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--requests", type=int, default=32, help="Requests per concurrency level.")
+    parser.add_argument("--days", type=int, default=None, help="Trip length; defaults to the sample's.")
+    parser.add_argument("--check-in", default=None, help="Check-in date (YYYY-MM-DD); defaults to tomorrow.")
+    parser.add_argument("--generation-mode", choices=("single", "parallel", "auto"), default=None)
+    parser.add_argument("--warm", action="store_true", help="Keep provider and itinerary caches on between requests.")
+    parser.add_argument("--hotels", type=int, default=60, help="Hotels the fake Amadeus returns.")
+    parser.add_argument("--latency", type=float, default=0.05, help="Fake provider latency in seconds.")
+    parser.add_argument("--jitter", type=float, default=0.02)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of fake provider calls answered with 503.")
+    parser.add_argument("--llm-latency", type=float, default=1.0)
+    parser.add_argument("--llm-jitter", type=float, default=0.2)
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", dest="json_path", default=None, help="Write the results to this file.")
+    parser.add_argument("--baseline", default=None, help="Results file of an earlier run to compare against.")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    configure_environment(args)
+    from services import log
+    log.setup_logging()
+    try:
+        results = asyncio.run(benchmark(args))
+    finally:
+        log.shutdown_logging()
+    print_report(results)
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            found = regressions(results, json.load(f), args.tolerance)
+        for regression in found:
+            print(f"❌ [Bench] Regression: {regression}")
+        return 1 if found else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
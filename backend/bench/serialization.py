@@ -0,0 +1,152 @@
+# bench/serialization.py
+"""
+Micro-benchmark of the JSON and compression paths, old against new.
+
+    python -m bench.serialization                 # 7-day itinerary, 60 hotels
+    python -m bench.serialization --days 14 --hotels 200 --json out.json
+
+Each case times the previous implementation and the current one on the
+same fixture data:
+
+  itinerary   FastAPI's response_model=Dict[str, Any] serialization and the
+              stdlib JSONResponse, against the pre-encoded FastJSONResponse
+              the endpoints now return
+  typed       the same, validating against response_model=Itinerary, for
+              reference: the reason the endpoints skip response validation
+  sse_hotels  json.dumps(jsonable_encoder(hotels)) against dump_models
+  prompt      [h.model_dump() for h in hotels] against dump_models_python
+  cache_key   json.dumps(sort_keys=True) against serialization.dumps
+
+and reports the size and encode time of the itinerary under gzip and brotli.
+Run from backend/.
+"""
+import sys
+import json
+import time
+import gzip
+import asyncio
+import argparse
+from datetime import date, timedelta
+from typing import Any, Callable, Dict
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+
+from .fixtures import Fixture
+from services import serialization, compression, log
+from services.itinerary_models import Itinerary
+from services.travel_data_service import HotelResult
+
+
+def measure(func: Callable[[], Any], min_time: float = 0.5) -> float:
+    """Mean seconds per call, over at least `min_time` seconds."""
+    func()
+    calls, started = 0, time.perf_counter()
+    while True:
+        func()
+        calls += 1
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_time:
+            return elapsed / calls
+
+
+def hotel_models(fixture: Fixture) -> list:
+    return [
+        HotelResult(
+            hotel_id=h["hotelId"], name=h["name"], latitude=h["latitude"], longitude=h["longitude"],
+            address=f"{i} Bench Street, London", total_price=h["price"], currency="GBP",
+            booking_link=f"https://example.com/hotels/{h['hotelId']}",
+        )
+        for i, h in enumerate(fixture.hotels)
+    ]
+
+
+def cases(days: int, hotel_count: int) -> Dict[str, tuple]:
+    fixture = Fixture(hotel_count=hotel_count)
+    itinerary = fixture.itinerary(days, (date.today() + timedelta(days=30)).isoformat())
+    itinerary["metadata"] = {"prompt": {"budget": 8000, "total_tokens": 6200}, "sources": {"hotels": "live"}}
+    hotels = hotel_models(fixture)
+    fingerprint = {"hotels": [h.model_dump(mode="json") for h in hotels], "itinerary": itinerary}
+
+    dict_field = create_model_field("Response_create_itinerary", Dict[str, Any], mode="serialization")
+    typed_field = create_model_field("Response_create_itinerary", Itinerary, mode="serialization")
+    loop = asyncio.new_event_loop()
+
+    def respond(field):
+        content = loop.run_until_complete(serialize_response(field=field, response_content=itinerary))
+        return JSONResponse(content).body
+
+    return {
+        "itinerary": (
+            lambda: respond(dict_field),
+            lambda: serialization.dumps(itinerary),  # all FastJSONResponse does
+        ),
+        "typed": (
+            lambda: respond(dict_field),
+            lambda: respond(typed_field),
+        ),
+        "sse_hotels": (
+            lambda: json.dumps(jsonable_encoder(hotels)),
+            lambda: serialization.dump_models(hotels).decode("utf-8"),
+        ),
+        "prompt": (
+            lambda: [h.model_dump() for h in hotels],
+            lambda: serialization.dump_models_python(hotels),
+        ),
+        "cache_key": (
+            lambda: json.dumps(fingerprint, sort_keys=True, default=str).encode("utf-8"),
+            lambda: serialization.dumps(fingerprint, sort_keys=True),
+        ),
+    }, itinerary
+
+
+def compression_report(itinerary: dict) -> Dict[str, dict]:
+    body = serialization.dumps(itinerary)
+    report = {"identity": {"bytes": len(body), "ms": 0.0}}
+    report["gzip"] = {
+        "bytes": len(gzip.compress(body, compresslevel=compression.GZIP_LEVEL)),
+        "ms": measure(lambda: gzip.compress(body, compresslevel=compression.GZIP_LEVEL), 0.2) * 1000,
+    }
+    if compression.BROTLI_AVAILABLE:
+        report["br"] = {
+            "bytes": len(compression.compress(body, "br")),
+            "ms": measure(lambda: compression.compress(body, "br"), 0.2) * 1000,
+        }
+    return report
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=int, default=7)
+    parser.add_argument("--hotels", type=int, default=60)
+    parser.add_argument("--min-time", type=float, default=0.5, help="Seconds spent timing each side of a case.")
+    parser.add_argument("--json", help="Write the results to this file.")
+    args = parser.parse_args(argv)
+    log.setup_logging()
+
+    print(f"JSON backend: {serialization.JSON_BACKEND} (orjson installed: {serialization.ORJSON_AVAILABLE}), "
+          f"brotli installed: {compression.BROTLI_AVAILABLE}")
+    benchmark_cases, itinerary = cases(args.days, args.hotels)
+    results = {}
+    print(f"\n{'case':<12} {'before us':>11} {'after us':>11} {'speedup':>8}")
+    for name, (before, after) in benchmark_cases.items():
+        old, new = measure(before, args.min_time), measure(after, args.min_time)
+        results[name] = {"before_us": old * 1e6, "after_us": new * 1e6, "speedup": old / new}
+        print(f"{name:<12} {old * 1e6:>11.1f} {new * 1e6:>11.1f} {old / new:>7.2f}x")
+
+    sizes = compression_report(itinerary)
+    print(f"\n{'encoding':<12} {'bytes':>9} {'ms':>8}")
+    for encoding, row in sizes.items():
+        print(f"{encoding:<12} {row['bytes']:>9} {row['ms']:>8.3f}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"serialization": results, "compression": sizes}, f, indent=2)
+    log.shutdown_logging()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
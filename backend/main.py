@@ -1,19 +1,76 @@
 import asyncio
-from fastapi import FastAPI, HTTPException
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import StreamingResponse, PlainTextResponse, JSONResponse
 from pydantic import BaseModel, Field, model_validator
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, AsyncIterator, Awaitable, Iterable, Literal
 from datetime import date, timedelta
-import json
+import uuid
 
 # Import all the service modules
-from services import qloo_service, travel_data_service, llm_orchestrator
+from services import (
+    qloo_service, travel_data_service, llm_orchestrator, http_clients, offline_geocoder, hotel_ranking, activity_selection,
+    itinerary_edits, resilience, metrics, log, serialization, climatology, batch,
+)
+from services.log import get_logger, log_payload
+from services.compression import CompressionMiddleware
+from services.itinerary_models import Itinerary
+from services.resilience import Deadline
+from services.batch import SharedWork
+from services.amadeus_auth import token_manager
+from services.viator_catalog import viator_catalog
+from services.jobs import job_queue, JobQueueFull, FINISHED_STATES
+
+# How often a job's SSE watch re-reads the job store.
+JOB_WATCH_INTERVAL = 0.5
+
+logger = get_logger("api")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Opens shared resources on startup and releases them on shutdown."""
+    log.setup_logging()
+    await http_clients.startup()
+    await token_manager.start()
+    offline_geocoder.startup()
+    climatology.startup()
+    await viator_catalog.start()
+    await job_queue.start(run_itinerary_job)
+    yield
+    await job_queue.stop()
+    await viator_catalog.stop()
+    await token_manager.stop()
+    await http_clients.shutdown()
+    log.shutdown_logging()
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse encoded by services.serialization: orjson when installed, compact stdlib JSON otherwise."""
+
+    def render(self, content: Any) -> bytes:
+        return serialization.dumps(content)
+
 
 # Initialize the FastAPI app
 app = FastAPI(
     title="TasteTrail API",
     description="Backend for the TasteTrail travel planning application.",
-    version="1.1.0" # Version updated for new feature
+    version="1.1.0", # Version updated for new feature
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse,
 )
+app.add_middleware(CompressionMiddleware)
+
+
+@app.middleware("http")
+async def assign_request_id(request: Request, call_next):
+    """Tags every log record of a request with its ID, taken from X-Request-ID or generated, and echoes it back."""
+    rid = request.headers.get("X-Request-ID") or uuid.uuid4().hex[:12]
+    log.request_id.set(rid)
+    response = await call_next(request)
+    response.headers["X-Request-ID"] = rid
+    return response
 
 # --- Pydantic Models for Request and Response ---
 
@@ -31,6 +88,10 @@ class ItineraryRequest(BaseModel):
     adults: Optional[int] = Field(1, example=1, description="Number of adults on the trip")
     children: Optional[int] = Field(0, example=1, description="Number of childrens on the trip")
     rooms: Optional[int] = Field(1, example=1, description="Number of rooms for hotel")
+    regenerate: bool = Field(False, example=False, description="Skip the itinerary cache and generate a fresh plan.")
+    generation_mode: Optional[Literal["single", "parallel", "auto"]] = Field(
+        None, example="auto", description="Generate in one LLM call, or as a plan plus concurrent per-day calls. Defaults to the server setting."
+    )
 
     @model_validator(mode='after')
     def validate_dates(self) -> 'ItineraryRequest':
@@ -49,81 +110,521 @@ def read_root():
     return {"message": "Welcome to the TasteTrail API v1.1 (Weather-Aware)"}
 
 
-@app.post("/api/v1/itinerary", response_model=Dict[str, Any])
-async def create_itinerary(request: ItineraryRequest):
+@app.get("/metrics", response_class=PlainTextResponse)
+def read_metrics():
+    """Stage latencies, upstream outcomes, cache hit ratios and LLM token counts in Prometheus text format."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+async def get_qloo_data(request: ItineraryRequest, shared: Optional[SharedWork] = None) -> dict:
+    """Resolves the user's likes to Qloo entities and fetches place recommendations for the city."""
+    if shared is None:
+        valid_like_entities = await qloo_service.resolve_likes(request.likes)
+    else:
+        # Batch items with the same likes share one resolution, whatever their city
+        likes = frozenset(map(qloo_service.normalize_like, request.likes))
+        valid_like_entities = await shared.run("likes", likes, lambda: qloo_service.resolve_likes(request.likes))
+    if not valid_like_entities:
+        raise HTTPException(status_code=404, detail="Could not find any matching cultural entities for the provided 'likes'.")
+    logger.debug("Found %d Qloo entities for likes.", len(valid_like_entities))
+    return await qloo_service.get_recommendations(
+        user_likes=valid_like_entities,
+        filter_type="urn:entity:place",
+        destination_city=request.destination_city
+    )
+
+
+PROVIDER_STAGES = ("qloo", "hotels", "activities", "weather")
+
+
+async def timed_stage(stage: str, awaitable: Awaitable):
+    with metrics.span(f"stage.{stage}"):
+        return await awaitable
+
+
+def provider_keys(request: ItineraryRequest) -> Dict[str, tuple]:
+    """The request fields each provider stage depends on; batch items with equal keys share the stage's result."""
+    city = " ".join(request.destination_city.split()).casefold()
+    country = " ".join(request.destination_country.split()).casefold()
+    return {
+        "qloo": (city, frozenset(map(qloo_service.normalize_like, request.likes))),
+        "hotels": (city, request.check_in_date, request.check_out_date, request.adults, request.children, request.rooms),
+        "activities": (city,),
+        "weather": (city, country, request.check_in_date, request.trip_length),
+    }
+
+
+def provider_tasks(
+        request: ItineraryRequest,
+        stages: Iterable[str] = PROVIDER_STAGES,
+        deadline: Optional[Deadline] = None,
+        shared: Optional[SharedWork] = None,
+    ) -> Dict[str, Awaitable]:
     """
-    The main endpoint to generate a full travel itinerary, now with weather awareness.
+    Builds the external data calls for a request, keyed by stage name, each
+    bounded by its share of the deadline. With `shared`, a stage whose
+    provider_keys match an earlier batch item's reuses that item's call.
+    """
+    calls = {
+        "qloo": lambda: get_qloo_data(request, shared),
+        "hotels": lambda: travel_data_service.google_hotels(
+            city_name=request.destination_city,
+            check_in_date=request.check_in_date,
+            check_out_date=request.check_out_date,
+            adults=request.adults,
+            children=request.children,
+            rooms=request.rooms,
+        ),
+        "activities": lambda: travel_data_service.search_activities(request.destination_city),
+        "weather": lambda: travel_data_service.get_trip_weather(
+            request.destination_city, request.destination_country, request.check_in_date, request.trip_length,
+        ),
+    }
+    if shared is not None:
+        keys = provider_keys(request)
+        calls = {stage: (lambda stage=stage, call=call: shared.run(stage, keys[stage], call)) for stage, call in calls.items()}
+    if deadline is None:
+        return {stage: timed_stage(stage, calls[stage]()) for stage in stages}
+    return {stage: timed_stage(stage, resilience.with_timeout(calls[stage](), deadline.stage_timeout(stage))) for stage in stages}
+
+
+def provider_sources(results: Dict[str, Any]) -> Dict[str, str]:
+    """How each provider contributed: "used", "empty", or "unavailable" (failed, timed out or circuit open)."""
+    return {
+        stage: "unavailable" if isinstance(result, Exception) else "used" if result else "empty"
+        for stage, result in results.items()
+    }
+
+
+def with_sources(itinerary: dict, sources: Dict[str, str]) -> dict:
+    """Returns the itinerary with the providers it was planned from recorded in its metadata."""
+    metadata = dict(itinerary.get("metadata") or {})
+    metadata["sources"] = sources
+    metadata["degraded"] = any(status != "used" for status in sources.values())
+    return {**itinerary, "metadata": metadata}
+
+
+def check_provider_results(results: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Raises an HTTPException for results the itinerary cannot be planned
+    without: there is no itinerary without a hotel, so a hotels stage that
+    failed answers 503 just as one that found nothing answers 404. Any other
+    provider that failed, timed out or has an open circuit is replaced by
+    empty data so the LLM plans with what is left. Stages that were not run
+    are skipped.
+    """
+    results = dict(results)
+    qloo_pois, hotel_options = results["qloo"], results.get("hotels")
+
+    # Likes that match nothing are the user's to fix, not an outage
+    if isinstance(qloo_pois, HTTPException): raise qloo_pois
+
+    if isinstance(hotel_options, Exception):
+        logger.warning("hotels data unavailable (%s: %s).", type(hotel_options).__name__, hotel_options)
+        raise HTTPException(status_code=503, detail="Hotel availability could not be checked. Please try again shortly.")
+    if "hotels" in results and not hotel_options:
+        raise HTTPException(status_code=404, detail="Could not find any available hotels.")
+
+    for stage, empty in (("qloo", {}), ("activities", []), ("weather", [])):
+        if isinstance(results.get(stage), Exception):
+            logger.warning("%s data unavailable (%s: %s). Proceeding without it.", stage, type(results[stage]).__name__, results[stage])
+            results[stage] = empty
+
+    if not results["weather"]: logger.warning("No forecast or climate data for the trip. Proceeding without weather.")
+    return results
+
+
+@metrics.timed("stage.select")
+def select_candidates(request: ItineraryRequest, provider_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Prunes provider results to the candidates worth sending to the LLM."""
+    provider_data = dict(provider_data)
+    provider_data["hotels"] = hotel_ranking.rank_hotels(
+        provider_data["hotels"],
+        budget=request.budget,
+        poi_coords=hotel_ranking.poi_coordinates(provider_data["qloo"]),
+    )
+    provider_data["qloo"], provider_data["activities"] = activity_selection.select_activities(
+        provider_data["qloo"],
+        provider_data["activities"],
+        budget=request.budget,
+        trip_length=request.trip_length,
+        dislikes=request.dislikes,
+    )
+    return provider_data
+
+
+async def prepare_candidates(request: ItineraryRequest, results: Dict[str, Any], deadline: Deadline) -> Dict[str, Any]:
+    """
+    Checks and prunes the provider results, then reverse-geocodes the hotels
+    that were kept. Without addresses in time, hotels are planned without them.
     """
-    print("--- Received New Itinerary Request ---")
-    print(request.model_dump_json(indent=2))
-    print("------------------------------------")
+    provider_data = select_candidates(request, check_provider_results(results))
+    try:
+        provider_data["hotels"] = await timed_stage("geocode", resilience.with_timeout(
+            travel_data_service.add_hotel_addresses(provider_data["hotels"]), deadline.stage_timeout("geocode"),
+        ))
+    except asyncio.TimeoutError as e:
+        logger.warning("Hotel addresses unavailable (%s). Proceeding without them.", e)
+    return provider_data
+
+
+def is_valid_itinerary(itinerary: Optional[dict]) -> bool:
+    return bool(itinerary) and "error" not in itinerary and "days" in itinerary
 
+
+async def build_itinerary(request: ItineraryRequest, shared: Optional[SharedWork] = None) -> dict:
+    """Runs the full pipeline for a request. Raises HTTPException on failure."""
     # Step 1: Fetch all external data in parallel
-    print("\n--- Step 1: Fetching Data from External APIs (Qloo, Amadeus, Viator, OpenWeather) ---")
+    logger.debug("Step 1: Fetching data from external APIs (Qloo, Amadeus, Viator, OpenWeather)")
+
+    deadline = Deadline()
+    tasks = provider_tasks(request, deadline=deadline, shared=shared)
+    with metrics.span("stage.providers"):
+        results = dict(zip(tasks, await asyncio.gather(*tasks.values(), return_exceptions=True)))
+    sources = provider_sources(results)
+    provider_data = await prepare_candidates(request, results, deadline)
+
+    logger.debug("Step 2: Orchestrating LLM itinerary generation (weather-aware)")
     
-    async def get_qloo_data():
-        like_entities_tasks = [qloo_service.search_entities(like) for like in request.likes]
-        like_entities_results = await asyncio.gather(*like_entities_tasks)
-        valid_like_entities = [entity for sublist in like_entities_results for entity in sublist]
-        if not valid_like_entities:
-            raise HTTPException(status_code=404, detail="Could not find any matching cultural entities for the provided 'likes'.")
-        print(f"Found {len(valid_like_entities)} Qloo entities for likes.")
-        return await qloo_service.get_recommendations(
-            user_likes=valid_like_entities,
-            filter_type="urn:entity:place",
-            destination_city=request.destination_city
-        )
-
-    # Define all API call tasks, including the new weather forecast
-    qloo_task = get_qloo_data()
-    hotel_task = travel_data_service.google_hotels(
-        city_name=request.destination_city,
-        check_in_date=request.check_in_date,
-        check_out_date=request.check_out_date,
-        adults=request.adults,
-        children=request.children,
-        rooms=request.rooms,
+    request_data_dict = request.model_dump(mode='json')
+
+    try:
+        final_itinerary = await timed_stage("llm", resilience.with_timeout(llm_orchestrator.generate_itinerary(
+            input_request=request_data_dict,
+            qloo_recommendations=provider_data["qloo"],
+            hotel_options=provider_data["hotels"],
+            activity_options=provider_data["activities"],
+            weather_forecast=provider_data["weather"], # Pass the new weather data
+            # budget_allocation=budget_allocation,
+            regenerate=request.regenerate,
+            mode=request.generation_mode,
+        ), deadline.remaining()))
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Itinerary generation did not finish within the request deadline.")
+
+    if not is_valid_itinerary(final_itinerary):
+        logger.error("Failed to generate a final itinerary for %s.", request.destination_city)
+        raise HTTPException(status_code=500, detail="Failed to generate itinerary from the LLM.")
+    final_itinerary = with_sources(final_itinerary, sources)
+
+    logger.info("Generated a %d-day itinerary for %s.", len(final_itinerary["days"]), request.destination_city)
+    log_payload(logger, "Generated itinerary", final_itinerary)
+
+    return final_itinerary
+
+
+@app.post("/api/v1/itinerary", response_model=Itinerary)
+async def create_itinerary(request: ItineraryRequest):
+    """
+    The main endpoint to generate a full travel itinerary, now with weather awareness.
+    """
+    logger.info("Received itinerary request for %s, %d days.", request.destination_city, request.trip_length)
+    log_payload(logger, "Itinerary request", request)
+
+    # Returned pre-encoded: FastAPI would otherwise validate the whole itinerary against the response model
+    return FastJSONResponse(await build_itinerary(request))
+
+
+def sse_event(event: str, data: Any) -> str:
+    """Formats one Server-Sent Event. Lists of hotels, activities or weather are encoded by pydantic-core directly."""
+    body = serialization.dump_models(data) if isinstance(data, list) else serialization.dumps(data)
+    return f"event: {event}\ndata: {body.decode('utf-8')}\n\n"
+
+
+def _stage_payload(stage: str, result: Any) -> Any:
+    """Trims a provider result down to what the frontend renders for that stage."""
+    if stage == "qloo":
+        return result.get("results", {}).get("entities", []) if isinstance(result, dict) else []
+    return result
+
+
+async def itinerary_events(request: ItineraryRequest) -> AsyncIterator[str]:
+    """
+    Runs the itinerary pipeline and yields SSE events as each stage completes:
+    one event per provider ("qloo", "hotels", "activities", "weather"), or a
+    "degraded" event for a provider that is skipped, one "day" event per
+    generated day, then "itinerary" with the full result. Failures are
+    reported as an "error" event, since the 200 status line has already been
+    sent. The deadline bounds the provider stage only; days keep streaming.
+    """
+    deadline = Deadline()
+    tasks = {asyncio.ensure_future(coro): stage for stage, coro in provider_tasks(request, deadline=deadline).items()}
+    results: Dict[str, Any] = {}
+    try:
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                stage = tasks[task]
+                results[stage] = task.exception() or task.result()
+                if not isinstance(results[stage], Exception):
+                    yield sse_event(stage, _stage_payload(stage, results[stage]))
+                elif not isinstance(results[stage], HTTPException):
+                    yield sse_event("degraded", {"stage": stage, "detail": str(results[stage]) or type(results[stage]).__name__})
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    sources = provider_sources(results)
+    try:
+        provider_data = await prepare_candidates(request, results, deadline)
+    except HTTPException as e:
+        yield sse_event("error", {"status_code": e.status_code, "detail": e.detail})
+        return
+
+    final_itinerary = None
+    async for kind, payload in llm_orchestrator.stream_itinerary(
+        input_request=request.model_dump(mode='json'),
+        qloo_recommendations=provider_data["qloo"],
+        hotel_options=provider_data["hotels"],
+        activity_options=provider_data["activities"],
+        weather_forecast=provider_data["weather"],
+        regenerate=request.regenerate,
+        mode=request.generation_mode,
+    ):
+        if kind == "day":
+            yield sse_event("day", payload)
+        else:
+            final_itinerary = payload
+
+    if not is_valid_itinerary(final_itinerary):
+        yield sse_event("error", {"status_code": 500, "detail": "Failed to generate itinerary from the LLM."})
+        return
+    yield sse_event("itinerary", with_sources(final_itinerary, sources))
+
+
+@app.post("/api/v1/itinerary/stream")
+async def stream_itinerary(request: ItineraryRequest):
+    """
+    Streaming variant of /api/v1/itinerary using Server-Sent Events, so the
+    frontend can render weather, hotels, activities and days as they arrive.
+    """
+    return StreamingResponse(
+        itinerary_events(request),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
-    activity_task = travel_data_service.search_activities(request.destination_city)
-    weather_task = travel_data_service.get_weather_forecast(request.destination_city)
 
-    results = await asyncio.gather(qloo_task, hotel_task, activity_task, weather_task, return_exceptions=True)
-    
-    qloo_pois, hotel_options, activity_options, weather_forecast = results
-    
-    # Handle potential errors from API calls
-    if isinstance(qloo_pois, Exception): raise HTTPException(status_code=500, detail=f"Qloo API Error: {qloo_pois}")
-    if isinstance(hotel_options, Exception): raise HTTPException(status_code=500, detail=f"Amadeus API Error: {hotel_options}")
-    if isinstance(weather_forecast, Exception): raise HTTPException(status_code=500, detail=f"OpenWeather API Error: {weather_forecast}")
-    
-    if isinstance(activity_options, Exception):
-        print(f"⚠️ Warning: Could not get activity data from Viator: {activity_options}")
-        activity_options = []
-    
-    if not hotel_options: raise HTTPException(status_code=404, detail="Could not find any available hotels.")
-    if not weather_forecast: print("⚠️ Warning: Could not retrieve weather forecast. Proceeding without it.")
 
-    print("\n--- Step 2: Orchestrating LLM Itinerary Generation (Weather-Aware) ---")
-    
+# --- Itinerary Edits ---
+
+class ItineraryEdit(BaseModel):
+    """A change to an existing itinerary. Only the days it affects are regenerated."""
+    days: Optional[List[int]] = Field(None, example=[2], description="Day numbers to regenerate.")
+    instructions: Optional[str] = Field(None, example="Swap the museum for something outdoors.", description="The requested change, in the user's words. Applies to every day when no days are given.")
+    dislikes: Optional[List[str]] = Field(None, example=["Museums"], description="Replaces the trip's dislikes; days with a matching activity or meal are regenerated.")
+    shift_days: int = Field(0, ge=-30, le=30, example=1, description="Moves the whole trip by this many days; days whose weather turns wet or dry are regenerated.")
+
+
+class ItineraryEditRequest(BaseModel):
+    """An itinerary, the request it was generated from, and the edit to apply."""
+    request: ItineraryRequest
+    itinerary: Dict[str, Any]
+    edit: ItineraryEdit
+
+
+def apply_edit_to_request(request: ItineraryRequest, edit: ItineraryEdit) -> ItineraryRequest:
+    """The request an edited itinerary corresponds to."""
+    update = request.model_dump()
+    if edit.dislikes is not None:
+        update["dislikes"] = edit.dislikes
+    if edit.shift_days:
+        update["check_in_date"] = request.check_in_date + timedelta(days=edit.shift_days)
+        update["check_out_date"] = request.check_out_date + timedelta(days=edit.shift_days)
+    return ItineraryRequest.model_validate(update)
+
+
+@app.post("/api/v1/itinerary/edit", response_model=Itinerary)
+async def edit_itinerary(body: ItineraryEditRequest):
+    """
+    Applies an edit to an existing itinerary without planning it again.
+
+    Qloo, Viator and weather data come from the provider cache, hotels are not
+    fetched, and only the affected days are regenerated. The hotel and budget
+    are kept as they are, so shifting the dates does not re-check the hotel's
+    availability, and the weather is only updated when the dates move. The
+    updated request is returned in metadata.edit.request for use in the next
+    edit.
+    """
+    if not is_valid_itinerary(body.itinerary):
+        raise HTTPException(status_code=422, detail="The itinerary to edit has no days.")
+    day_numbers = {day.get("day_number") for day in body.itinerary["days"]}
+    unknown_days = sorted(set(body.edit.days or []) - day_numbers)
+    if unknown_days:
+        raise HTTPException(status_code=422, detail=f"The itinerary has no day {', '.join(map(str, unknown_days))}.")
+    request = apply_edit_to_request(body.request, body.edit)
+
+    deadline = Deadline()
+    tasks = provider_tasks(request, stages=("qloo", "activities", "weather"), deadline=deadline)
+    results = dict(zip(tasks, await asyncio.gather(*tasks.values(), return_exceptions=True)))
+    sources = provider_sources(results)
+    provider_data = check_provider_results(results)
+    qloo_pois, activity_options = activity_selection.select_activities(
+        provider_data["qloo"],
+        provider_data["activities"],
+        budget=request.budget,
+        trip_length=request.trip_length,
+        dislikes=request.dislikes,
+    )
+
+    itinerary = itinerary_edits.shift_itinerary(body.itinerary, request.check_in_date)
+    # Days keep the weather they were planned with unless the dates move.
+    affected = itinerary_edits.apply_weather(itinerary, provider_data["weather"]) if body.edit.shift_days else set()
+    if body.edit.days:
+        affected |= set(body.edit.days)
+    elif body.edit.instructions:
+        affected |= {day.get("day_number") for day in itinerary["days"]}
+    if body.edit.dislikes is not None:
+        affected |= itinerary_edits.days_matching_dislikes(itinerary, body.edit.dislikes)
+    affected.discard(None)
+
     request_data_dict = request.model_dump(mode='json')
+    if affected:
+        try:
+            itinerary = await timed_stage("llm", resilience.with_timeout(llm_orchestrator.regenerate_days(
+                itinerary,
+                input_request=request_data_dict,
+                qloo_recommendations=qloo_pois,
+                activity_options=activity_options,
+                weather_forecast=provider_data["weather"],
+                day_numbers=sorted(affected),
+                instructions=body.edit.instructions,
+            ), deadline.remaining()))
+        except asyncio.TimeoutError:
+            raise HTTPException(status_code=504, detail="Regenerating the edited days did not finish within the request deadline.")
+        if not is_valid_itinerary(itinerary):
+            raise HTTPException(status_code=500, detail="Failed to regenerate the edited days from the LLM.")
+    else:
+        itinerary.setdefault("metadata", {})["edit"] = {"regenerated_days": []}
+
+    itinerary["metadata"]["edit"]["request"] = request_data_dict
+    return FastJSONResponse(with_sources(itinerary, sources))
+
+
+# --- Batch Itineraries ---
+
+class BatchItineraryRequest(BaseModel):
+    """Several itineraries planned together, e.g. one traveler's candidate cities or date ranges."""
+    requests: List[ItineraryRequest] = Field(..., min_length=1, max_length=batch.BATCH_MAX_ITEMS, description="The itineraries to plan; results refer to them by index.")
+
+
+async def batch_events(body: BatchItineraryRequest) -> AsyncIterator[str]:
+    """
+    Plans every request of a batch and yields an SSE event as each finishes:
+    "itinerary" with its index and itinerary, or "error" with its index,
+    status code and detail, then "done" with the counts. Items share provider
+    calls and like resolution through one SharedWork; identical items share
+    the whole pipeline. At most BATCH_CONCURRENCY pipelines run at once across
+    all batches.
+    """
+    shared = SharedWork()
+    batch_id = log.request_id.get()
+
+    async def plan(index: int, request: ItineraryRequest) -> dict:
+        log.request_id.set(f"{batch_id}.{index}")
+        async with batch.batch_slots:
+            try:
+                itinerary = await shared.run("itinerary", request.model_dump_json(), lambda: build_itinerary(request, shared))
+            except HTTPException as e:
+                return {"index": index, "error": {"status_code": e.status_code, "detail": e.detail}}
+            except Exception as e:
+                logger.exception("Batch item %d failed: %s", index, e)
+                return {"index": index, "error": {"status_code": 500, "detail": str(e) or type(e).__name__}}
+        return {"index": index, "itinerary": itinerary}
+
+    tasks = [asyncio.ensure_future(plan(index, request)) for index, request in enumerate(body.requests)]
+    failed = 0
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            result = await next_done
+            if "error" in result:
+                failed += 1
+                yield sse_event("error", {"index": result["index"], **result["error"]})
+            else:
+                yield sse_event("itinerary", result)
+    finally:
+        for task in tasks:
+            task.cancel()
+        shared.close()
+    logger.info("Batch of %d itineraries finished, %d failed.", len(tasks), failed)
+    yield sse_event("done", {"succeeded": len(tasks) - failed, "failed": failed})
 
-    final_itinerary = await llm_orchestrator.generate_itinerary(
-        input_request=request_data_dict,
-        qloo_recommendations=qloo_pois,
-        hotel_options=hotel_options,
-        activity_options=activity_options,
-        weather_forecast=weather_forecast, # Pass the new weather data
-        # budget_allocation=budget_allocation,
+
+@app.post("/api/v1/itinerary/batch")
+async def create_itinerary_batch(body: BatchItineraryRequest):
+    """
+    Plans several itineraries in one call and streams each as Server-Sent
+    Events as soon as it is ready, in completion order. Use it instead of
+    parallel /api/v1/itinerary calls when requests repeat a city, dates or
+    likes: that work is then done once for the whole batch.
+    """
+    logger.info("Received batch of %d itinerary requests.", len(body.requests))
+    return StreamingResponse(
+        batch_events(body),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
 
-    if not final_itinerary or "error" in final_itinerary or "days" not in final_itinerary:
-        print("\n--- ❌ Failed to generate a final itinerary ---")
-        raise HTTPException(status_code=500, detail="Failed to generate itinerary from the LLM.")
 
-    print("\n--- Step 3: Successfully Generated Weather-Aware Itinerary ---")
+# --- Itinerary Jobs ---
 
-    formatted_itinerary = json.dumps(final_itinerary, indent=2)
-    print(formatted_itinerary)
-        
+async def run_itinerary_job(payload: dict) -> dict:
+    """Job runner: rebuilds the request from its stored payload and runs the pipeline."""
+    return await build_itinerary(ItineraryRequest.model_validate(payload))
 
-    return final_itinerary
+
+@app.post("/api/v1/itinerary/jobs", status_code=202)
+async def create_itinerary_job(request: ItineraryRequest):
+    """
+    Queues an itinerary for background generation and returns its job ID
+    immediately. Poll GET /api/v1/itinerary/jobs/{job_id} or watch its
+    /events stream for the result.
+    """
+    try:
+        job = await job_queue.submit(request.model_dump(mode='json'))
+    except JobQueueFull:
+        raise HTTPException(status_code=503, detail="Too many itineraries in progress. Please retry shortly.", headers={"Retry-After": "10"})
+    return {
+        "job_id": job["job_id"],
+        "status": job["status"],
+        "status_url": f"/api/v1/itinerary/jobs/{job['job_id']}",
+    }
+
+
+@app.get("/api/v1/itinerary/jobs/{job_id}")
+async def get_itinerary_job(job_id: str):
+    """Returns a job's status, plus its itinerary or error once finished."""
+    job = await job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return FastJSONResponse(job)
+
+
+async def job_events(job_id: str) -> AsyncIterator[str]:
+    """Polls the job store and yields a "status" event on every change until the job finishes."""
+    last_status = None
+    while True:
+        job = await job_queue.get(job_id)
+        if job is None:
+            yield sse_event("error", {"status_code": 404, "detail": "Job not found."})
+            return
+        if job["status"] != last_status:
+            last_status = job["status"]
+            yield sse_event("status", {"job_id": job_id, "status": last_status})
+        if job["status"] in FINISHED_STATES:
+            if job["error"]:
+                yield sse_event("error", job["error"])
+            else:
+                yield sse_event("itinerary", job["result"])
+            return
+        await asyncio.sleep(JOB_WATCH_INTERVAL)
+
+
+@app.get("/api/v1/itinerary/jobs/{job_id}/events")
+async def watch_itinerary_job(job_id: str):
+    """Server-Sent Events stream of a job's status changes and final result."""
+    return StreamingResponse(
+        job_events(job_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,166 @@
+# services/activity_selection.py
+import os
+import difflib
+import numpy as np
+from dotenv import load_dotenv
+from typing import Any, List, Optional, Set, Tuple
+
+from .travel_data_service import ActivityResult
+from .viator_catalog import normalize_name
+from .hotel_ranking import haversine_km
+from .log import get_logger
+
+load_dotenv()
+
+logger = get_logger(__name__)
+
+ACTIVITIES_PER_DAY = int(os.getenv("ACTIVITIES_PER_DAY", "4"))
+ACTIVITY_MIN_CANDIDATES = int(os.getenv("ACTIVITY_MIN_CANDIDATES", "8"))
+# Share of the total budget expected to go to paid activities.
+ACTIVITY_BUDGET_SHARE = float(os.getenv("ACTIVITY_BUDGET_SHARE", "0.25"))
+# Two items are the same venue when their names are this similar...
+ACTIVITY_DUPLICATE_NAME_RATIO = float(os.getenv("ACTIVITY_DUPLICATE_NAME_RATIO", "0.9"))
+# ...or loosely similar and this close together.
+ACTIVITY_NEARBY_NAME_RATIO = 0.5
+ACTIVITY_NEARBY_METERS = float(os.getenv("ACTIVITY_NEARBY_METERS", "150"))
+
+AFFINITY_WEIGHT, RATING_WEIGHT, PRICE_WEIGHT = 0.5, 0.3, 0.2
+
+
+class _Candidate:
+    """An activity from either provider, flattened to what selection needs."""
+
+    def __init__(self, source: str, item: Any, name: str, terms: Set[str],
+                 affinity: Optional[float], rating: Optional[float], price: Optional[float],
+                 lat: Optional[float], lon: Optional[float], key: str):
+        self.source, self.item, self.name, self.terms = source, item, name, terms
+        self.affinity, self.rating, self.price = affinity, rating, price
+        self.lat, self.lon, self.key = lat, lon, key
+
+
+def _stem(token: str) -> str:
+    """Folds simple plurals so the dislike "museums" matches the keyword "museum"."""
+    return token[:-1] if len(token) > 3 and token.endswith("s") and not token.endswith("ss") else token
+
+
+def text_terms(*texts: str) -> Set[str]:
+    """The normalized, plural-folded words of `texts`, as used for dislike matching."""
+    return {_stem(token) for text in texts for token in normalize_name(text).split()}
+
+
+def _float(value: Any) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _from_qloo(entity: dict) -> _Candidate:
+    properties = entity.get("properties") or {}
+    location = entity.get("location") or {}
+    keywords = [k.get("name", "") for k in properties.get("keywords") or [] if isinstance(k, dict)]
+    tags = [t.get("name", "") for t in entity.get("tags") or [] if isinstance(t, dict)]
+    kind = str(entity.get("subtype") or entity.get("type") or "").replace("urn:entity:", "")
+    affinity = _float((entity.get("query") or {}).get("affinity"))
+    if affinity is None:
+        affinity = _float(entity.get("popularity"))
+    rating = _float(properties.get("business_rating"))
+    return _Candidate(
+        "qloo", entity, normalize_name(entity.get("name", "")), text_terms(entity.get("name", ""), kind, *keywords, *tags),
+        affinity=affinity, rating=rating, price=None,
+        lat=_float(location.get("lat")), lon=_float(location.get("lon")), key=str(entity.get("entity_id", "")),
+    )
+
+
+def _from_viator(activity: ActivityResult) -> _Candidate:
+    return _Candidate(
+        "viator", activity, normalize_name(activity.name), text_terms(activity.name),
+        affinity=None, rating=activity.rating, price=activity.price or None,
+        lat=None, lon=None, key=str(activity.activity_id),
+    )
+
+
+def matches_dislikes(terms: Set[str], dislikes: List[Set[str]]) -> bool:
+    """True when every word of some dislike appears in the item's name, type, keywords or tags."""
+    return any(dislike and dislike <= terms for dislike in dislikes)
+
+
+def score_candidates(candidates: List[_Candidate], price_target: float) -> np.ndarray:
+    """
+    Scores candidates in [0, 1]: Qloo affinity, rating (out of 5) and price
+    fit against the per-activity budget. A missing signal scores a neutral 0.5.
+    """
+    affinity = np.array([np.nan if c.affinity is None else c.affinity for c in candidates], dtype=np.float64)
+    rating = np.array([np.nan if c.rating is None else c.rating / 5.0 for c in candidates], dtype=np.float64)
+    price = np.array([np.nan if c.price is None else c.price for c in candidates], dtype=np.float64)
+
+    target = max(price_target, 1.0)
+    price_fit = np.clip(1.0 - (price - target) / target, 0.0, 1.0)
+
+    def neutral(values: np.ndarray) -> np.ndarray:
+        return np.where(np.isnan(values), 0.5, np.clip(values, 0.0, 1.0))
+
+    return AFFINITY_WEIGHT * neutral(affinity) + RATING_WEIGHT * neutral(rating) + PRICE_WEIGHT * neutral(price_fit)
+
+
+def _token_overlap(a: Set[str], b: Set[str]) -> float:
+    return len(a & b) / min(len(a), len(b)) if a and b else 0.0
+
+
+def _is_duplicate(candidate: _Candidate, kept: List[_Candidate]) -> bool:
+    for other in kept:
+        ratio = difflib.SequenceMatcher(None, candidate.name, other.name).ratio()
+        if ratio >= ACTIVITY_DUPLICATE_NAME_RATIO:
+            return True
+        # "Louvre Museum" and "Musée du Louvre" at the same spot are one venue
+        similar = max(ratio, _token_overlap(set(candidate.name.split()), set(other.name.split())))
+        if similar >= ACTIVITY_NEARBY_NAME_RATIO and None not in (candidate.lat, candidate.lon, other.lat, other.lon):
+            distance = haversine_km(np.array([candidate.lat]), np.array([candidate.lon]), other.lat, other.lon)[0]
+            if distance * 1000 <= ACTIVITY_NEARBY_METERS:
+                return True
+    return False
+
+
+def select_activities(
+        qloo_recommendations: dict,
+        activities: List[ActivityResult],
+        budget: float,
+        trip_length: int,
+        dislikes: Optional[List[str]] = None,
+    ) -> Tuple[dict, List[ActivityResult]]:
+    """
+    Picks the activity candidates worth sending to the LLM.
+
+    Qloo places and Viator products that match a dislike are dropped, the rest
+    are scored, and then taken best first while skipping near-duplicates of an
+    already kept item, up to ACTIVITIES_PER_DAY per trip day. Returns the Qloo
+    response with its entities pruned and the kept Viator activities, both
+    best first, in the same shapes as the inputs.
+    """
+    entities = (qloo_recommendations or {}).get("results", {}).get("entities", [])
+    candidates = [_from_qloo(e) for e in entities] + [_from_viator(a) for a in activities or []]
+    if not candidates:
+        return qloo_recommendations, list(activities or [])
+
+    dislike_terms = [text_terms(d) for d in dislikes or [] if d and d.strip()]
+    allowed = [c for c in candidates if not matches_dislikes(c.terms, dislike_terms)]
+    limit = max(ACTIVITY_MIN_CANDIDATES, ACTIVITIES_PER_DAY * max(trip_length, 1))
+
+    kept: List[_Candidate] = []
+    if allowed:
+        scores = score_candidates(allowed, budget * ACTIVITY_BUDGET_SHARE / limit)
+        keys = np.array([c.key for c in allowed])
+        for i in np.lexsort((keys, -scores)):
+            if len(kept) >= limit:
+                break
+            if not _is_duplicate(allowed[i], kept):
+                kept.append(allowed[i])
+
+    logger.debug("[Activities] Kept %d of %d activities (%d matched dislikes).",
+                 len(kept), len(candidates), len(candidates) - len(allowed))
+    pruned_qloo = dict(qloo_recommendations)
+    pruned_qloo["results"] = {
+        **qloo_recommendations.get("results", {}),
+        "entities": [c.item for c in kept if c.source == "qloo"],
+    }
+    return pruned_qloo, [c.item for c in kept if c.source == "viator"]
@@ -0,0 +1,127 @@
+# services/amadeus_auth.py
+import os
+import time
+import asyncio
+import httpx
+from dotenv import load_dotenv
+from typing import Optional, Tuple
+
+from .http_clients import get_client
+from .log import get_logger
+
+load_dotenv()
+
+logger = get_logger(__name__)
+
+AMADEUS_CLIENT_ID = os.getenv("AMADEUS_CLIENT_ID")
+AMADEUS_CLIENT_SECRET = os.getenv("AMADEUS_CLIENT_SECRET")
+AMADEUS_API_BASE_URL = "https://test.api.amadeus.com"
+
+# Refresh this many seconds before the token actually expires.
+AMADEUS_TOKEN_REFRESH_MARGIN = float(os.getenv("AMADEUS_TOKEN_REFRESH_MARGIN", "120"))
+# Wait before retrying a failed background refresh while the current token is still usable.
+AMADEUS_TOKEN_RETRY_SECONDS = float(os.getenv("AMADEUS_TOKEN_RETRY_SECONDS", "15"))
+
+
+async def _request_token() -> Tuple[Optional[str], float]:
+    """Performs the OAuth2 client-credentials exchange. Returns (token, expires_in)."""
+    logger.debug("[Amadeus] Requesting access token...")
+    headers = {"Content-Type": "application/x-www-form-urlencoded"}
+    data = {
+        "grant_type": "client_credentials",
+        "client_id": AMADEUS_CLIENT_ID,
+        "client_secret": AMADEUS_CLIENT_SECRET,
+    }
+    client = get_client("amadeus")
+    try:
+        response = await client.post(f"{AMADEUS_API_BASE_URL}/v1/security/oauth2/token", headers=headers, data=data)
+        response.raise_for_status()
+        body = response.json()
+        logger.info("[Amadeus] Retrieved access token.")
+        return body.get("access_token"), float(body.get("expires_in", 1799))
+    except httpx.HTTPStatusError as e:
+        logger.error("[Amadeus] Getting token failed: %s - %s", e.response.status_code, e.response.text)
+        return None, 0.0
+    except (httpx.TransportError, ValueError) as e:
+        # Connection errors, timeouts, an open circuit (CircuitOpenError) or a malformed body.
+        logger.error("[Amadeus] Getting token failed: %s: %s", type(e).__name__, e)
+        return None, 0.0
+
+
+class AmadeusTokenManager:
+    """
+    Process-wide cache for the Amadeus access token.
+
+    The token is kept until shortly before its `expires_in`, a background task
+    refreshes it ahead of expiry, and a lock guarantees that concurrent callers
+    share a single in-flight token request.
+    """
+
+    def __init__(self, refresh_margin: float = AMADEUS_TOKEN_REFRESH_MARGIN):
+        self.refresh_margin = refresh_margin
+        self._token: Optional[str] = None
+        self._expires_at = 0.0
+        self._refresh_at = 0.0
+        self._lock: Optional[asyncio.Lock] = None
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    def _is_valid(self) -> bool:
+        return self._token is not None and time.monotonic() < self._refresh_at
+
+    async def get_token(self) -> Optional[str]:
+        """Returns a valid token, fetching one only if the cached token is stale."""
+        if self._is_valid():
+            return self._token
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            # Another caller may have refreshed while we waited on the lock.
+            if self._is_valid():
+                return self._token
+            return await self._refresh()
+
+    async def _refresh(self) -> Optional[str]:
+        token, expires_in = await _request_token()
+        if not token:
+            return None
+        # A margin of at most half the lifetime, so short-lived tokens still count as valid.
+        refresh_in = max(expires_in - min(self.refresh_margin, expires_in / 2), 1.0)
+        self._token = token
+        self._expires_at = time.monotonic() + expires_in
+        self._refresh_at = time.monotonic() + refresh_in
+        self._schedule_refresh(refresh_in)
+        return token
+
+    def _schedule_refresh(self, delay: float) -> None:
+        if self._refresh_task and not self._refresh_task.done():
+            self._refresh_task.cancel()
+        self._refresh_task = asyncio.create_task(self._refresh_later(delay))
+
+    async def _refresh_later(self, delay: float) -> None:
+        await asyncio.sleep(delay)
+        # Detach first so _refresh() does not cancel the task it is running in.
+        self._refresh_task = None
+        async with self._lock:
+            if await self._refresh() is None:
+                logger.warning("[Amadeus] Background token refresh failed; retrying in %.0fs.", AMADEUS_TOKEN_RETRY_SECONDS)
+                self._schedule_refresh(AMADEUS_TOKEN_RETRY_SECONDS)
+
+    async def start(self) -> None:
+        """Warms the cache so the first itinerary request does not pay for the token."""
+        if AMADEUS_CLIENT_ID and AMADEUS_CLIENT_SECRET:
+            await self.get_token()
+
+    async def stop(self) -> None:
+        """Cancels the pending background refresh."""
+        if self._refresh_task and not self._refresh_task.done():
+            self._refresh_task.cancel()
+        self._refresh_task = None
+
+    def invalidate(self) -> None:
+        """Drops the cached token, e.g. after Amadeus answers 401."""
+        self._token = None
+        self._expires_at = 0.0
+        self._refresh_at = 0.0
+
+
+token_manager = AmadeusTokenManager()
@@ -0,0 +1,49 @@
+# services/batch.py
+import os
+import asyncio
+from dotenv import load_dotenv
+from typing import Awaitable, Callable, Dict, Hashable
+
+from .metrics import BATCH_SHARED_WORK
+
+load_dotenv()
+
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "10"))
+# Itinerary pipelines run at once across all batch requests; the rest wait for a slot.
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))
+
+batch_slots = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+
+class SharedWork:
+    """
+    Runs each distinct step of a batch once and hands its result to every item.
+
+    Unlike single-flight coalescing, which only joins calls that overlap in
+    time, results are kept until the batch ends: an item that reaches the
+    step after the first one finished still reuses it, even with the provider
+    cache disabled. Failures are shared the same way. Steps run as tasks and
+    are awaited through shield(), so an item timing out does not cancel the
+    step for the others.
+    """
+
+    def __init__(self):
+        self._tasks: Dict[Hashable, asyncio.Task] = {}
+
+    def run(self, stage: str, key: Hashable, factory: Callable[[], Awaitable]) -> Awaitable:
+        task = self._tasks.get((stage, key))
+        if task is None:
+            task = self._tasks[(stage, key)] = asyncio.ensure_future(factory())
+            BATCH_SHARED_WORK.inc(stage=stage, result="ran")
+        else:
+            BATCH_SHARED_WORK.inc(stage=stage, result="reused")
+        return asyncio.shield(task)
+
+    def close(self) -> None:
+        """Cancels steps still running when the batch ends, e.g. because the client went away."""
+        for task in self._tasks.values():
+            if not task.done():
+                task.cancel()
+            elif not task.cancelled():
+                task.exception()  # Mark failures as retrieved; every item that needed them has seen them
+        self._tasks.clear()
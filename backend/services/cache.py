@@ -0,0 +1,305 @@
+# services/cache.py
+import os
+import json
+import time
+import pickle
+import asyncio
+import hashlib
+import inspect
+import sqlite3
+import threading
+import functools
+from collections import OrderedDict
+from dotenv import load_dotenv
+from typing import Any, Callable, Dict, Iterable, Optional, Set, Tuple
+
+from .storage import cache_path
+from .metrics import register_cache
+from .log import get_logger
+
+load_dotenv()
+
+logger = get_logger(__name__)
+
+# --- TTL Tiers (seconds) ---
+CACHE_TTL_REFERENCE = float(os.getenv("CACHE_TTL_REFERENCE", str(3 * 24 * 3600)))  # city codes, hotel lists, entity IDs
+CACHE_TTL_WEATHER = float(os.getenv("CACHE_TTL_WEATHER", "3600"))
+CACHE_TTL_OFFERS = float(os.getenv("CACHE_TTL_OFFERS", "600"))  # prices and availability
+# How long past its TTL an entry may still be served while it is refreshed in the background.
+CACHE_STALE_FACTOR = float(os.getenv("CACHE_STALE_FACTOR", "1.0"))
+
+PROVIDER_CACHE_BACKEND = os.getenv("PROVIDER_CACHE_BACKEND", "memory")  # "memory", "sqlite" or "none"
+PROVIDER_CACHE_MAX_BYTES = int(os.getenv("PROVIDER_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+PROVIDER_CACHE_PATH = os.getenv("PROVIDER_CACHE_PATH") or cache_path("provider_cache.sqlite3")
+# The SQLite store records a read only when the entry's last recorded access is at least this old,
+# so cache hits rarely turn into write transactions. LRU eviction order is accurate to this resolution.
+PROVIDER_CACHE_ACCESS_RESOLUTION = float(os.getenv("PROVIDER_CACHE_ACCESS_RESOLUTION", "60"))
+
+
+class CacheBackend:
+    """Interface for cache stores. Entries are (value, stored_at) pairs."""
+
+    # Backends doing disk I/O are driven from a worker thread.
+    blocking = False
+
+    def get(self, key: str) -> Optional[Tuple[Any, float]]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: Any, stored_at: float) -> None:
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+
+class NullBackend(CacheBackend):
+    """Disables caching."""
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value, stored_at):
+        pass
+
+    def clear(self):
+        pass
+
+
+class MemoryBackend(CacheBackend):
+    """An in-process LRU store capped by the pickled size of its values."""
+
+    def __init__(self, max_bytes: int = PROVIDER_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries: "OrderedDict[str, Tuple[Any, float, int]]" = OrderedDict()
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        self._entries.move_to_end(key)
+        return entry[0], entry[1]
+
+    def set(self, key, value, stored_at):
+        entry_size = len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+        if entry_size > self.max_bytes:
+            return
+        if key in self._entries:
+            self.size -= self._entries.pop(key)[2]
+        self._entries[key] = (value, stored_at, entry_size)
+        self.size += entry_size
+        while self.size > self.max_bytes:
+            _, (_, _, evicted_size) = self._entries.popitem(last=False)
+            self.size -= evicted_size
+
+    def clear(self):
+        self._entries.clear()
+        self.size = 0
+
+
+class SQLiteBackend(CacheBackend):
+    """
+    An on-disk LRU store shared by every uvicorn/gunicorn worker on the machine.
+
+    WAL mode lets workers read concurrently while one of them writes.
+    """
+
+    blocking = True
+
+    def __init__(self, path: str = PROVIDER_CACHE_PATH, max_bytes: int = PROVIDER_CACHE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, value BLOB, stored_at REAL, accessed_at REAL, size INTEGER)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed_at ON entries (accessed_at)")
+        self._conn.commit()
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, stored_at, accessed_at FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            now = time.time()
+            if now - row[2] >= PROVIDER_CACHE_ACCESS_RESOLUTION:
+                self._conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+                self._conn.commit()
+        return pickle.loads(row[0]), row[1]
+
+    def set(self, key, value, stored_at):
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(blob) > self.max_bytes:
+            return
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)",
+                (key, blob, stored_at, time.time(), len(blob)),
+            )
+            total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            while total > self.max_bytes:
+                oldest = self._conn.execute(
+                    "SELECT key, size FROM entries ORDER BY accessed_at LIMIT 1"
+                ).fetchone()
+                if oldest is None:
+                    break
+                self._conn.execute("DELETE FROM entries WHERE key = ?", (oldest[0],))
+                total -= oldest[1]
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM entries")
+            self._conn.commit()
+
+
+def _build_backend(name: str) -> CacheBackend:
+    if name == "sqlite":
+        return SQLiteBackend()
+    if name == "none":
+        return NullBackend()
+    return MemoryBackend()
+
+
+class ProviderCache:
+    """A TTL cache with stale-while-revalidate on top of a pluggable backend."""
+
+    def __init__(self, backend: CacheBackend):
+        self.backend = backend
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self._refreshing: Set[str] = set()
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def _get(self, key: str):
+        if self.backend.blocking:
+            return await asyncio.to_thread(self.backend.get, key)
+        return self.backend.get(key)
+
+    async def _set(self, key: str, value: Any) -> None:
+        if self.backend.blocking:
+            await asyncio.to_thread(self.backend.set, key, value, time.time())
+        else:
+            self.backend.set(key, value, time.time())
+
+    async def _refresh(self, key: str, loader: Callable) -> None:
+        try:
+            value = await loader()
+            if value:
+                await self._set(key, value)
+        except Exception as e:
+            logger.warning("[Cache] Background refresh failed for %s: %s", key, e)
+        finally:
+            self._refreshing.discard(key)
+
+    async def get(self, key: str, ttl: float) -> Any:
+        """Returns the value stored under `key` if it is younger than `ttl`, else None."""
+        entry = await self._get(key)
+        if entry is None or time.time() - entry[1] >= ttl:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry[0]
+
+    async def set(self, key: str, value: Any) -> None:
+        await self._set(key, value)
+
+    async def get_or_load(
+        self, key: str, loader: Callable, ttl: float, stale_ttl: float, refresher: Optional[Callable] = None
+    ):
+        """
+        Returns the cached value for `key`, calling `loader` on a miss.
+
+        Fresh entries are returned as-is. Entries up to `stale_ttl` past their
+        TTL are returned immediately while one background task reloads them
+        with `refresher` (defaults to `loader`). Falsy results (the service
+        functions' "[]"/None on error) are not stored.
+        """
+        entry = await self._get(key)
+        if entry is not None:
+            value, stored_at = entry
+            age = time.time() - stored_at
+            if age < ttl:
+                self.hits += 1
+                return value
+            if age < ttl + stale_ttl:
+                self.stale_hits += 1
+                if key not in self._refreshing:
+                    self._refreshing.add(key)
+                    task = asyncio.create_task(self._refresh(key, refresher or loader))
+                    self._tasks.add(task)
+                    task.add_done_callback(self._tasks.discard)
+                return value
+
+        self.misses += 1
+        value = await loader()
+        if value:
+            await self._set(key, value)
+        return value
+
+
+provider_cache = ProviderCache(_build_backend(PROVIDER_CACHE_BACKEND))
+register_cache("provider", provider_cache)
+
+
+def _normalize(value: Any) -> Any:
+    """Makes equivalent arguments produce the same key ("Tokyo " == "tokyo")."""
+    if isinstance(value, str):
+        return value.strip().casefold()
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+    if isinstance(value, dict):
+        return {str(k): _normalize(v) for k, v in value.items()}
+    return value
+
+
+def make_key(namespace: str, func: Callable, args: tuple, kwargs: dict, ignore: Iterable[str] = ()) -> str:
+    """Builds a stable key from a function's bound arguments, leaving out `ignore` (e.g. access tokens)."""
+    bound = inspect.signature(func).bind(*args, **kwargs)
+    bound.apply_defaults()
+    arguments = {name: _normalize(value) for name, value in bound.arguments.items() if name not in ignore}
+    digest = hashlib.sha256(json.dumps(arguments, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+    return f"{namespace}:{digest}"
+
+
+def cached(
+    namespace: str,
+    ttl: float,
+    ignore: Iterable[str] = (),
+    stale_ttl: Optional[float] = None,
+    refresh_args: Optional[Dict[str, Callable]] = None,
+):
+    """
+    Caches an async service function's result in the provider cache under a TTL tier.
+
+    `refresh_args` maps argument names to async callables that supply a fresh
+    value for background revalidation, e.g. a new access token in place of the
+    one the original caller passed, which may have expired by then.
+    """
+    ignore = tuple(ignore)
+    stale = ttl * CACHE_STALE_FACTOR if stale_ttl is None else stale_ttl
+
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            key = make_key(namespace, func, args, kwargs, ignore)
+
+            async def refresher():
+                bound = signature.bind(*args, **kwargs)
+                for name, supplier in (refresh_args or {}).items():
+                    bound.arguments[name] = await supplier()
+                return await func(*bound.args, **bound.kwargs)
+
+            return await provider_cache.get_or_load(
+                key, lambda: func(*args, **kwargs), ttl, stale, refresher if refresh_args else None
+            )
+        return wrapper
+    return decorator
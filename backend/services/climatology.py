@@ -0,0 +1,157 @@
+# services/climatology.py
+import os
+import csv
+import calendar
+import numpy as np
+from datetime import date
+from dotenv import load_dotenv
+from typing import List, Optional, Sequence, Tuple
+
+from .storage import cache_path, index_is_current, write_manifest
+from .log import get_logger
+
+load_dotenv()
+
+logger = get_logger(__name__)
+
+SAMPLE_DATASET_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "sample_climate.csv")
+
+# A "city,country,month,temp_c,precip_mm,wet_days" CSV of monthly climate normals,
+# "sample" for the bundled dataset of major cities, or empty to disable the fallback.
+CLIMATOLOGY_DATASET = os.getenv("CLIMATOLOGY_DATASET", "sample")
+
+# Share of a month's days with rain above which a day is described as rainy, or as mixed.
+WET_DAY_SHARE_RAIN = 0.4
+WET_DAY_SHARE_CLOUDS = 0.15
+# Mean temperature at or below which wet days are described as snow.
+SNOW_MAX_TEMP_C = 1.0
+
+TEMP, PRECIP, WET_DAYS = range(3)
+
+# (main, OpenWeather icon) per condition, in the order _classify numbers them.
+CONDITIONS = (("Clear", "01d"), ("Clouds", "03d"), ("Rain", "10d"), ("Snow", "13d"))
+
+
+def _key(city: str, country: str = "") -> bytes:
+    """Case- and whitespace-insensitive "city|country" lookup key."""
+    return f"{' '.join(city.split())}|{' '.join(country.split())}".casefold().encode("utf-8")
+
+
+def _classify(temps: np.ndarray, wet_share: np.ndarray) -> np.ndarray:
+    """Index into CONDITIONS for each (mean temperature, share of wet days) pair."""
+    return np.select(
+        [(wet_share >= WET_DAY_SHARE_CLOUDS) & (temps <= SNOW_MAX_TEMP_C), wet_share >= WET_DAY_SHARE_RAIN, wet_share >= WET_DAY_SHARE_CLOUDS],
+        [3, 2, 1],
+        default=0,
+    )
+
+
+def _describe(condition: int, wet_days: float, days_in_month: int, month: int) -> str:
+    month_name = calendar.month_name[month]
+    if condition == 0:
+        return f"usually dry in {month_name} (climate average)"
+    kind = "snow or rain" if condition == 3 else "rain"
+    return f"{kind} on about {round(wet_days)} of {days_in_month} days in {month_name} (climate average)"
+
+
+class Climatology:
+    """
+    Monthly climate normals per city, for trip days beyond the forecast horizon.
+
+    Like the offline geocoder, the table is built once from a CSV into flat
+    arrays next to the other caches and memory-mapped by every worker: a
+    sorted array of "city|country" keys, searched with np.searchsorted, and
+    a float32 array of (city, month, [temperature, precipitation, wet days]).
+    """
+
+    def __init__(self, index_dir: str):
+        self.index_dir = index_dir
+        self.keys: Optional[np.ndarray] = None
+        self.normals: Optional[np.ndarray] = None
+
+    @property
+    def loaded(self) -> bool:
+        return self.keys is not None and len(self.keys) > 0
+
+    def _paths(self) -> Tuple[str, str]:
+        return os.path.join(self.index_dir, "keys.npy"), os.path.join(self.index_dir, "normals.npy")
+
+    def build(self, dataset_path: str) -> None:
+        """Reads the CSV and writes the key and normals arrays. Cities need all twelve months."""
+        rows = {}
+        with open(dataset_path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                month = int(row["month"])
+                if not row.get("city") or not 1 <= month <= 12:
+                    continue
+                values = rows.setdefault(_key(row["city"], row.get("country", "")), np.full((12, 3), np.nan, dtype=np.float32))
+                values[month - 1] = (float(row["temp_c"]), float(row["precip_mm"]), float(row["wet_days"]))
+
+        complete = sorted(key for key, values in rows.items() if not np.isnan(values).any())
+        keys = np.array(complete, dtype=f"S{max((len(k) for k in complete), default=1)}")
+        normals = np.stack([rows[k] for k in complete]) if complete else np.zeros((0, 12, 3), dtype=np.float32)
+
+        os.makedirs(self.index_dir, exist_ok=True)
+        # Written to temporary files and swapped in so concurrent workers never map a half-written table.
+        for path, array in zip(self._paths(), (keys, normals)):
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                np.save(f, array)
+            os.replace(tmp_path, path)
+        write_manifest(self.index_dir, dataset_path)
+        logger.info("[Climatology] Indexed %d cities from '%s'", len(keys), dataset_path)
+
+    def load(self, dataset_path: Optional[str] = None) -> None:
+        """
+        Memory-maps the table, (re)building it first unless its manifest
+        matches the dataset's path, size and modification time.
+        """
+        keys_path, normals_path = self._paths()
+        if dataset_path and not (os.path.exists(keys_path) and index_is_current(self.index_dir, dataset_path)):
+            self.build(dataset_path)
+        if not os.path.exists(keys_path):
+            return
+        self.keys = np.asarray(np.load(keys_path, mmap_mode="r"))
+        self.normals = np.asarray(np.load(normals_path, mmap_mode="r"))
+        logger.info("[Climatology] Loaded normals for %d cities", len(self.keys))
+
+    def _find(self, city: str, country: str = "") -> Optional[int]:
+        """Row of the city; without an exact country match, the first city of that name."""
+        if not self.loaded:
+            return None
+        exact = _key(city, country)
+        i = int(np.searchsorted(self.keys, exact))
+        if i < len(self.keys) and self.keys[i] == exact:
+            return i
+        prefix = _key(city)
+        i = int(np.searchsorted(self.keys, prefix))
+        if i < len(self.keys) and self.keys[i].startswith(prefix):
+            return i
+        return None
+
+    def typical(self, city: str, country: str, dates: Sequence[date]) -> List[Tuple[date, float, str, str, str]]:
+        """
+        (date, mean temperature, main, description, icon) for each date from
+        the city's normals for its month, or an empty list for an unknown city.
+        """
+        row = self._find(city, country)
+        if row is None or not dates:
+            return []
+        months = np.fromiter((d.month for d in dates), dtype=np.int64, count=len(dates))
+        month_days = np.fromiter((calendar.monthrange(d.year, d.month)[1] for d in dates), dtype=np.int64, count=len(dates))
+        normals = self.normals[row, months - 1]
+        conditions = _classify(normals[:, TEMP], normals[:, WET_DAYS] / month_days)
+        return [
+            (d, round(float(normals[i, TEMP]), 1), CONDITIONS[c][0], _describe(c, float(normals[i, WET_DAYS]), int(month_days[i]), d.month), CONDITIONS[c][1])
+            for i, (d, c) in enumerate(zip(dates, conditions.tolist()))
+        ]
+
+
+climatology = Climatology(cache_path("climatology"))
+
+
+def startup() -> None:
+    """Loads the configured climatology dataset, if any. Called from the FastAPI lifespan."""
+    if not CLIMATOLOGY_DATASET:
+        return
+    climatology.load(SAMPLE_DATASET_PATH if CLIMATOLOGY_DATASET == "sample" else CLIMATOLOGY_DATASET)
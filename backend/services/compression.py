@@ -0,0 +1,120 @@
+# services/compression.py
+"""
+Response compression for the API.
+
+A full itinerary is 20-60 KB of JSON that compresses 5-10x. This ASGI
+middleware compresses complete response bodies with brotli when the client
+accepts it and the `brotli` package is installed, and with gzip otherwise.
+Streamed responses (the SSE endpoints) pass through untouched: compressing
+them would buffer events the client is waiting for.
+"""
+import os
+import gzip
+from dotenv import load_dotenv
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    brotli = None
+    BROTLI_AVAILABLE = False
+
+load_dotenv()
+
+RESPONSE_COMPRESSION = os.getenv("RESPONSE_COMPRESSION", "auto")  # "auto", "gzip" or "none"
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+# Quality 4-5 compresses better than gzip -6 at similar speed; 11 is for static assets.
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "4"))
+
+_SKIPPED_TYPES = (b"text/event-stream",)
+
+
+def _accepted(accept_encoding: str) -> set:
+    """Codings the client accepts, ignoring any with q=0."""
+    codings = set()
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        if params.replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        codings.add(coding.strip().lower())
+    return codings
+
+
+def choose_encoding(accept_encoding: str, mode: str = RESPONSE_COMPRESSION) -> str:
+    """The coding to use for a response: "br", "gzip" or "" for none."""
+    if mode == "none":
+        return ""
+    accepted = _accepted(accept_encoding)
+    if mode == "auto" and BROTLI_AVAILABLE and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return ""
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+
+class CompressionMiddleware:
+    """Compresses single-message HTTP responses of at least `minimum_size` bytes."""
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_SIZE, mode: str = RESPONSE_COMPRESSION):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.mode = mode
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or self.mode == "none":
+            await self.app(scope, receive, send)
+            return
+        accept_encoding = ""
+        for name, value in scope.get("headers", ()):
+            if name == b"accept-encoding":
+                accept_encoding = value.decode("latin-1")
+                break
+        encoding = choose_encoding(accept_encoding, self.mode)
+        if not encoding:
+            await self.app(scope, receive, send)
+            return
+
+        start = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            headers = start.get("headers", [])
+            body = message.get("body", b"")
+            content_type = next((v for k, v in headers if k == b"content-type"), b"")
+            already_encoded = any(k == b"content-encoding" for k, _ in headers)
+            if (message.get("more_body", False) or already_encoded or len(body) < self.minimum_size
+                    or content_type.startswith(_SKIPPED_TYPES)):
+                passthrough = True
+                await send(start)
+                await send(message)
+                return
+
+            compressed = compress(body, encoding)
+            headers = [(k, v) for k, v in headers if k != b"content-length"]
+            headers += [
+                (b"content-encoding", encoding.encode("ascii")),
+                (b"content-length", str(len(compressed)).encode("ascii")),
+                (b"vary", b"Accept-Encoding"),
+            ]
+            await send({**start, "headers": headers})
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, send_compressed)
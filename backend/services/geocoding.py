@@ -0,0 +1,173 @@
+# services/geocoding.py
+import os
+import asyncio
+import sqlite3
+import threading
+from dotenv import load_dotenv
+from typing import Dict, Optional, Tuple
+from geopy.geocoders import Nominatim
+
+from .rate_limiter import AsyncTokenBucket
+from .storage import cache_path
+from .offline_geocoder import offline_geocoder
+from .metrics import timed
+from .single_flight import single_flight
+
+load_dotenv()
+
+# Nominatim's usage policy allows at most one request per second.
+NOMINATIM_USER_AGENT = os.getenv("NOMINATIM_USER_AGENT", "my_personal_address_converter")
+NOMINATIM_RATE_LIMIT_PER_SEC = float(os.getenv("NOMINATIM_RATE_LIMIT_PER_SEC", "1"))
+GEOCODE_MAX_CONCURRENCY = int(os.getenv("GEOCODE_MAX_CONCURRENCY", "2"))
+# 4 decimal places is roughly 11 metres, well inside a hotel's footprint.
+GEOCODE_CACHE_PRECISION = int(os.getenv("GEOCODE_CACHE_PRECISION", "4"))
+GEOCODE_CACHE_PATH = os.getenv("GEOCODE_CACHE_PATH") or cache_path("geocode_cache.sqlite3")
+
+_geolocator = Nominatim(user_agent=NOMINATIM_USER_AGENT, timeout=10)
+_nominatim_limiter = AsyncTokenBucket(NOMINATIM_RATE_LIMIT_PER_SEC, 1)
+_semaphore: Optional[asyncio.Semaphore] = None
+
+
+class GeocodeCache:
+    """
+    A persistent reverse-geocoding cache keyed on rounded coordinates.
+
+    Entries live in SQLite so they survive restarts and are shared by all
+    workers on the machine. Addresses this worker has seen are kept in
+    memory; other keys are looked up in SQLite one at a time, so entries
+    another worker added are found instead of geocoded again. The connection
+    is opened on first use, and `get`/`set` block and run in a worker thread.
+    """
+
+    def __init__(self, path: str, precision: int = GEOCODE_CACHE_PRECISION):
+        self.path = path
+        self.precision = precision
+        self._memory: Dict[Tuple[float, float], str] = {}
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def key(self, lat: float, lon: float) -> Tuple[float, float]:
+        return round(float(lat), self.precision), round(float(lon), self.precision)
+
+    def _connection(self) -> sqlite3.Connection:
+        # Called with self._lock held.
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=10)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS addresses (lat REAL, lon REAL, address TEXT, PRIMARY KEY (lat, lon))"
+            )
+            self._conn.commit()
+        return self._conn
+
+    def get_memory(self, lat: float, lon: float) -> Optional[str]:
+        """The address if this worker already has it, without any I/O."""
+        return self._memory.get(self.key(lat, lon))
+
+    def get(self, lat: float, lon: float) -> Optional[str]:
+        key = self.key(lat, lon)
+        address = self._memory.get(key)
+        if address is not None:
+            return address
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT address FROM addresses WHERE lat = ? AND lon = ?", key
+            ).fetchone()
+        if row is not None:
+            self._memory[key] = row[0]
+            return row[0]
+        return None
+
+    def set(self, lat: float, lon: float, address: str) -> None:
+        key = self.key(lat, lon)
+        self._memory[key] = address
+        with self._lock:
+            conn = self._connection()
+            conn.execute("INSERT OR REPLACE INTO addresses VALUES (?, ?, ?)", (*key, address))
+            conn.commit()
+
+
+geocode_cache = GeocodeCache(GEOCODE_CACHE_PATH)
+
+
+def _format_address(raw_address: dict) -> str:
+    """Formats a Nominatim address dict as "Street, City, Post, Country", omitting missing parts."""
+    # Safely extract address components using .get() to avoid errors
+    # if a key does not exist.
+    road = raw_address.get('road', '')
+    house_number = raw_address.get('house_number', '')
+    city = raw_address.get('city', raw_address.get('town', '')) # Fallback to 'town'
+    postcode = raw_address.get('postcode', '')
+    country = raw_address.get('country', '')
+
+    # Combine house number and road to form a street address
+    street_address = f"{house_number} {road}".strip()
+
+    # Create a list of the parts that are not empty
+    final_address_parts = [part for part in [street_address, city, postcode, country] if part]
+
+    # Join the parts with a comma and space
+    return ", ".join(final_address_parts)
+
+
+def _reverse_blocking(lat: float, lon: float) -> str:
+    """The synchronous Nominatim lookup. Runs in a worker thread."""
+    location = _geolocator.reverse(f"{lat}, {lon}", language='en')
+    if location and 'address' in location.raw:
+        return _format_address(location.raw['address'])
+    return "N/A"
+
+
+async def reverse_geocode_nominatim(lat: float, lon: float) -> str:
+    """Looks up an address through Nominatim without blocking the event loop."""
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(GEOCODE_MAX_CONCURRENCY)
+    async with _semaphore:
+        await _nominatim_limiter.acquire()
+        return await asyncio.to_thread(_reverse_blocking, lat, lon)
+
+
+@timed("geocoding.reverse")
+async def geocode_to_address(lat: float, lon: float) -> str:
+    """
+    Converts latitude and longitude coordinates to a formatted address string.
+
+    Results are cached on rounded coordinates, so each hotel is only sent to
+    Nominatim once. When an offline index is loaded, the nearest known address
+    within OFFLINE_GEOCODER_MAX_DISTANCE_M is used instead. Remaining misses
+    are resolved in a worker thread under a bounded, rate-limited queue that
+    respects Nominatim's usage policy.
+
+    Args:
+        lat: The latitude of the location.
+        lon: The longitude of the location.
+
+    Returns:
+        A formatted address string in the format "Street, City, Post, Country".
+        If a component is not available, it is omitted. Returns an error
+        message if the address cannot be found.
+    """
+    if lat is None or lon is None:
+        return "N/A"
+
+    cached = geocode_cache.get_memory(lat, lon)
+    if cached is None:
+        cached = await asyncio.to_thread(geocode_cache.get, lat, lon)
+    if cached is not None:
+        return cached
+
+    if offline_geocoder.loaded:
+        offline_address = offline_geocoder.lookup(lat, lon)
+        if offline_address is not None:
+            return offline_address
+
+    try:
+        # Requests for the same hotel, e.g. batch items for one city on different dates, share one lookup
+        key = f"geocode:{round(lat, GEOCODE_CACHE_PRECISION)},{round(lon, GEOCODE_CACHE_PRECISION)}"
+        address = await single_flight.do(key, lambda: reverse_geocode_nominatim(lat, lon))
+    except Exception as e:
+        # Handle potential network errors or other issues; errors are not cached
+        return f"An error occurred during geocoding: {e}"
+
+    await asyncio.to_thread(geocode_cache.set, lat, lon, address)
+    return address
@@ -0,0 +1,101 @@
+# services/hotel_ranking.py
+import os
+import numpy as np
+from dotenv import load_dotenv
+from typing import List, Optional, Tuple
+
+from .travel_data_service import HotelResult
+from .log import get_logger
+
+load_dotenv()
+
+logger = get_logger(__name__)
+
+HOTEL_TOP_K = int(os.getenv("HOTEL_TOP_K", "8"))
+# Share of the total budget a hotel is expected to take (prompt.txt asks for 30-50%).
+HOTEL_BUDGET_SHARE = float(os.getenv("HOTEL_BUDGET_SHARE", "0.4"))
+# Distance at which the proximity score has dropped to ~37%.
+HOTEL_DISTANCE_SCALE_KM = float(os.getenv("HOTEL_DISTANCE_SCALE_KM", "3"))
+
+PRICE_WEIGHT, DISTANCE_WEIGHT = 0.6, 0.4
+EARTH_RADIUS_KM = 6371.0088
+
+
+def poi_coordinates(qloo_recommendations: dict) -> List[Tuple[float, float]]:
+    """Extracts (lat, lon) of the recommended Qloo places that have a location."""
+    coords = []
+    for entity in (qloo_recommendations or {}).get("results", {}).get("entities", []):
+        location = entity.get("location") or {}
+        if location.get("lat") is not None and location.get("lon") is not None:
+            coords.append((float(location["lat"]), float(location["lon"])))
+    return coords
+
+
+def haversine_km(lat: np.ndarray, lon: np.ndarray, lat0: float, lon0: float) -> np.ndarray:
+    lat, lon = np.radians(lat), np.radians(lon)
+    lat0, lon0 = np.radians(lat0), np.radians(lon0)
+    a = np.sin((lat - lat0) / 2) ** 2 + np.cos(lat) * np.cos(lat0) * np.sin((lon - lon0) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def score_hotels(
+        hotels: List[HotelResult],
+        budget: float,
+        poi_coords: List[Tuple[float, float]],
+    ) -> np.ndarray:
+    """
+    Scores every hotel in [0, 1] in one vectorized pass.
+
+    - Price fit: 1 up to the target accommodation spend, falling linearly to
+      0 at twice the target; 0 for an offer without a price.
+    - Proximity: exp(-distance / scale) to the centroid of the recommended
+      places; neutral (0.5) when there are no places or no coordinates.
+
+    Availability is not scored: google_hotels only returns available offers.
+    """
+    price = np.array([h.total_price or 0.0 for h in hotels], dtype=np.float64)
+    lat = np.array([np.nan if h.latitude is None else h.latitude for h in hotels], dtype=np.float64)
+    lon = np.array([np.nan if h.longitude is None else h.longitude for h in hotels], dtype=np.float64)
+
+    target = max(budget * HOTEL_BUDGET_SHARE, 1.0)
+    price_fit = np.where(price > 0, np.clip(1.0 - (price - target) / target, 0.0, 1.0), 0.0)
+
+    proximity = np.full(len(hotels), 0.5)
+    if poi_coords:
+        centroid = np.asarray(poi_coords, dtype=np.float64).mean(axis=0)
+        distance = haversine_km(lat, lon, centroid[0], centroid[1])
+        proximity = np.where(np.isnan(distance), 0.5, np.exp(-distance / HOTEL_DISTANCE_SCALE_KM))
+
+    return PRICE_WEIGHT * price_fit + DISTANCE_WEIGHT * proximity
+
+
+def rank_hotels(
+        hotels: List[HotelResult],
+        budget: float,
+        poi_coords: Optional[List[Tuple[float, float]]] = None,
+        top_k: int = HOTEL_TOP_K,
+    ) -> List[HotelResult]:
+    """
+    Returns the `top_k` (at least one) best-scoring hotels, best first.
+
+    The cheapest priced hotel is always kept, because prompt.txt's
+    over-budget fallback is decided on it. Ties break on price, then hotel ID,
+    so the selection is deterministic.
+    """
+    if len(hotels) <= 1:
+        return list(hotels)
+    scores = score_hotels(hotels, budget, poi_coords or [])
+    prices = np.array([h.total_price or 0.0 for h in hotels], dtype=np.float64)
+    ids = np.array([h.hotel_id for h in hotels])
+    # np.lexsort sorts by the last key first: score (descending), then price, then ID.
+    order = np.lexsort((ids, prices, -scores))
+    selected = list(order[:max(top_k, 1)])
+
+    priced = np.flatnonzero(prices > 0)
+    if len(priced):
+        cheapest = priced[np.lexsort((ids[priced], prices[priced]))[0]]
+        if cheapest not in selected:
+            selected[-1] = cheapest
+
+    logger.debug("[Ranking] Kept %d of %d hotels for the prompt.", len(selected), len(hotels))
+    return [hotels[i] for i in selected]
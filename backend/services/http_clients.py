@@ -0,0 +1,126 @@
+# services/http_clients.py
+import os
+import httpx
+from dotenv import load_dotenv
+from typing import Callable, Dict, Optional
+
+from .resilience import ResilientTransport, get_breaker, DEFAULT_RETRIES, DEFAULT_RETRY_BACKOFF, DEFAULT_HEDGE_AFTER
+from .rate_limiter import AsyncTokenBucket
+from .log import get_logger
+
+load_dotenv()
+
+logger = get_logger(__name__)
+
+# HTTP/2 needs the optional 'h2' package (pip install "httpx[http2]").
+# Fall back to HTTP/1.1 keep-alive when it is not installed.
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# --- Pool Configuration ---
+# Defaults can be overridden globally (HTTP_*) or per provider (e.g. AMADEUS_HTTP_TIMEOUT).
+DEFAULT_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+DEFAULT_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+DEFAULT_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+DEFAULT_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "30"))
+DEFAULT_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+
+PROVIDERS = ("amadeus", "viator", "openweather", "qloo")
+
+# (requests per second, burst) per provider, overridable as e.g. AMADEUS_RATE_LIMIT_PER_SEC / _BURST.
+# Enforced in the transport, so retries and hedged requests take a token like any other request.
+# The Amadeus test environment allows 10 transactions/sec and at most one request every 100ms.
+RATE_LIMIT_DEFAULTS = {"amadeus": (10.0, 1.0)}
+
+_clients: Dict[str, httpx.AsyncClient] = {}
+
+# Builds the network transport for a provider; replaced by recorded or fake
+# providers in benchmarks (see bench/). None means real connections.
+transport_factory: Optional[Callable[[str, httpx.Limits], httpx.AsyncBaseTransport]] = None
+
+
+def set_transport_factory(factory: Optional[Callable[[str, httpx.Limits], httpx.AsyncBaseTransport]]) -> None:
+    """Routes every provider client through `factory(provider, limits)`. Clients already open keep their transport."""
+    global transport_factory
+    transport_factory = factory
+
+
+def _provider_setting(provider: str, name: str, default: float) -> float:
+    """Reads a per-provider override such as VIATOR_HTTP_MAX_CONNECTIONS."""
+    value = os.getenv(f"{provider.upper()}_HTTP_{name}")
+    return float(value) if value else default
+
+
+def _build_rate_limiter(provider: str) -> Optional[AsyncTokenBucket]:
+    default_rate, default_burst = RATE_LIMIT_DEFAULTS.get(provider, (0.0, 1.0))
+    rate = float(os.getenv(f"{provider.upper()}_RATE_LIMIT_PER_SEC", default_rate))
+    if rate <= 0:
+        return None
+    return AsyncTokenBucket(rate, float(os.getenv(f"{provider.upper()}_RATE_LIMIT_BURST", default_burst)))
+
+
+# One bucket per provider for the whole process, kept when a client is rebuilt.
+_rate_limiters: Dict[str, Optional[AsyncTokenBucket]] = {provider: _build_rate_limiter(provider) for provider in PROVIDERS}
+
+
+def _build_client(provider: str) -> httpx.AsyncClient:
+    """
+    Creates a pooled, keep-alive client for a single upstream provider, with
+    the provider's rate limit, circuit breaker, retries and hedging in its
+    transport.
+    """
+    limits = httpx.Limits(
+        max_connections=int(_provider_setting(provider, "MAX_CONNECTIONS", DEFAULT_MAX_CONNECTIONS)),
+        max_keepalive_connections=int(_provider_setting(provider, "MAX_KEEPALIVE", DEFAULT_MAX_KEEPALIVE)),
+        keepalive_expiry=_provider_setting(provider, "KEEPALIVE_EXPIRY", DEFAULT_KEEPALIVE_EXPIRY),
+    )
+    timeout = httpx.Timeout(
+        _provider_setting(provider, "TIMEOUT", DEFAULT_TIMEOUT),
+        connect=_provider_setting(provider, "CONNECT_TIMEOUT", DEFAULT_CONNECT_TIMEOUT),
+    )
+    if transport_factory is not None:
+        network = transport_factory(provider, limits)
+    else:
+        network = httpx.AsyncHTTPTransport(limits=limits, http2=HTTP2_AVAILABLE)
+    transport = ResilientTransport(
+        network,
+        get_breaker(provider),
+        retries=int(_provider_setting(provider, "RETRIES", DEFAULT_RETRIES)),
+        backoff=_provider_setting(provider, "RETRY_BACKOFF", DEFAULT_RETRY_BACKOFF),
+        hedge_after=_provider_setting(provider, "HEDGE_AFTER", DEFAULT_HEDGE_AFTER),
+        rate_limiter=_rate_limiters.get(provider),
+    )
+    return httpx.AsyncClient(transport=transport, timeout=timeout)
+
+
+async def startup() -> None:
+    """Opens one client per provider. Called once from the FastAPI lifespan."""
+    for provider in PROVIDERS:
+        if provider not in _clients or _clients[provider].is_closed:
+            _clients[provider] = _build_client(provider)
+    logger.info("[HTTP] Opened pooled clients for %s (HTTP/2: %s)", ", ".join(PROVIDERS), HTTP2_AVAILABLE)
+
+
+async def shutdown() -> None:
+    """Closes every pooled client and drops their connections."""
+    for provider, client in list(_clients.items()):
+        await client.aclose()
+        del _clients[provider]
+    logger.info("[HTTP] Closed pooled clients.")
+
+
+def get_client(provider: str) -> httpx.AsyncClient:
+    """
+    Returns the shared client for a provider.
+
+    Clients are created lazily as well, so service functions keep working
+    when called outside the FastAPI app (scripts, notebooks).
+    """
+    client = _clients.get(provider)
+    if client is None or client.is_closed:
+        client = _build_client(provider)
+        _clients[provider] = client
+    return client
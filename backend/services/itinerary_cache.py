@@ -0,0 +1,86 @@
+# services/itinerary_cache.py
+import os
+import hashlib
+from dotenv import load_dotenv
+from typing import Any, List, Optional
+
+from .cache import ProviderCache, MemoryBackend, SQLiteBackend, NullBackend
+from .storage import cache_path
+from .metrics import register_cache
+from .serialization import dumps
+
+load_dotenv()
+
+ITINERARY_CACHE_BACKEND = os.getenv("ITINERARY_CACHE_BACKEND", "memory")  # "memory", "sqlite" or "none"
+ITINERARY_CACHE_TTL = float(os.getenv("ITINERARY_CACHE_TTL", str(6 * 3600)))
+ITINERARY_CACHE_MAX_BYTES = int(os.getenv("ITINERARY_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+ITINERARY_CACHE_PATH = os.getenv("ITINERARY_CACHE_PATH") or cache_path("itinerary_cache.sqlite3")
+
+
+def _build_backend(name: str):
+    if name == "sqlite":
+        return SQLiteBackend(ITINERARY_CACHE_PATH, ITINERARY_CACHE_MAX_BYTES)
+    if name == "none":
+        return NullBackend()
+    return MemoryBackend(ITINERARY_CACHE_MAX_BYTES)
+
+
+itinerary_cache = ProviderCache(_build_backend(ITINERARY_CACHE_BACKEND))
+register_cache("itinerary", itinerary_cache)
+
+
+def _normalize_terms(terms: Optional[List[str]]) -> List[str]:
+    """Order- and case-insensitive form of a likes/dislikes list."""
+    return sorted({" ".join(t.split()).casefold() for t in (terms or []) if t and t.strip()})
+
+
+def _dump(item: Any) -> dict:
+    return item.model_dump(mode='json') if hasattr(item, 'model_dump') else dict(item)
+
+
+def canonical_request(input_request: dict) -> dict:
+    """The parts of an ItineraryRequest that change the itinerary, in canonical form."""
+    return {
+        "budget": round(float(input_request.get("budget") or 0), 2),
+        "city": " ".join(str(input_request.get("destination_city", "")).split()).casefold(),
+        "country": " ".join(str(input_request.get("destination_country", "")).split()).casefold(),
+        "check_in_date": str(input_request.get("check_in_date")),
+        "check_out_date": str(input_request.get("check_out_date")),
+        "adults": input_request.get("adults") or 0,
+        "children": input_request.get("children") or 0,
+        "rooms": input_request.get("rooms") or 0,
+        "likes": _normalize_terms(input_request.get("likes")),
+        "dislikes": _normalize_terms(input_request.get("dislikes")),
+    }
+
+
+def provider_fingerprint(qloo_recommendations: dict, hotel_options: list, activity_options: list, weather_forecast: list) -> dict:
+    """Summarizes the provider inputs; any change in prices, availability or weather changes the key."""
+    hotels = [_dump(h) for h in hotel_options or []]
+    activities = [_dump(a) for a in activity_options or []]
+    weather = [_dump(w) for w in weather_forecast or []]
+    entities = (qloo_recommendations or {}).get("results", {}).get("entities", [])
+    return {
+        "hotels": sorted((h.get("hotel_id"), h.get("total_price"), h.get("currency")) for h in hotels),
+        "activities": sorted((a.get("activity_id"), a.get("price")) for a in activities),
+        "weather": sorted((str(w.get("date")), w.get("main"), round(w.get("temp_celsius") or 0)) for w in weather),
+        "qloo": sorted(str(e.get("entity_id")) for e in entities),
+    }
+
+
+def itinerary_cache_key(
+        input_request: dict,
+        qloo_recommendations: dict,
+        hotel_options: list,
+        activity_options: list,
+        weather_forecast: list,
+        generation_mode: str = "single",
+    ) -> str:
+    """Cache key of an itinerary. `generation_mode` is the mode actually used, "single" or "parallel"."""
+    payload = {
+        "request": canonical_request(input_request),
+        "generation_mode": generation_mode,
+        "providers": provider_fingerprint(qloo_recommendations, hotel_options, activity_options, weather_forecast),
+    }
+    digest = hashlib.sha256(dumps(payload, sort_keys=True)).hexdigest()
+    return f"itinerary:{digest}"
@@ -0,0 +1,59 @@
+# services/itinerary_edits.py
+import copy
+from datetime import date, timedelta
+from typing import List, Optional, Set
+
+from .activity_selection import text_terms, matches_dislikes
+
+# Parts of a day that hold a planned activity or meal
+DAY_SLOTS = ("morning", "lunch", "afternoon", "evening", "dinner")
+# Slot fields compared against dislikes
+SLOT_TEXT_FIELDS = ("activity_name", "restaurant_name", "type", "cuisine", "description")
+# Weather in which prompt.txt asks for indoor plans; crossing this line changes a day's plan
+WET_WEATHER = {"rain", "drizzle", "thunderstorm", "snow"}
+
+
+def _is_wet(main: Optional[str]) -> bool:
+    return str(main or "").casefold() in WET_WEATHER
+
+
+def _slot_terms(slot: dict) -> Set[str]:
+    return text_terms(*(str(slot.get(field) or "") for field in SLOT_TEXT_FIELDS))
+
+
+def days_matching_dislikes(itinerary: dict, dislikes: List[str]) -> Set[int]:
+    """Day numbers with an activity or meal that matches one of `dislikes`."""
+    dislike_terms = [text_terms(d) for d in dislikes or [] if d and d.strip()]
+    affected = set()
+    for day in itinerary.get("days", []):
+        if any(isinstance(day.get(slot), dict) and matches_dislikes(_slot_terms(day[slot]), dislike_terms) for slot in DAY_SLOTS):
+            affected.add(day.get("day_number"))
+    return affected
+
+
+def shift_itinerary(itinerary: dict, check_in_date: date) -> dict:
+    """Returns a copy of `itinerary` with every day re-dated from a new check-in date."""
+    shifted = copy.deepcopy(itinerary)
+    for day in shifted.get("days", []):
+        if isinstance(day.get("day_number"), int):
+            day["date"] = (check_in_date + timedelta(days=day["day_number"] - 1)).isoformat()
+    return shifted
+
+
+def apply_weather(itinerary: dict, weather_forecast: list) -> Set[int]:
+    """
+    Updates each day's weather in place from the forecast for its date.
+    Returns the day numbers whose weather crossed between dry and wet, whose
+    indoor/outdoor plan should be revisited.
+    """
+    forecast = {wf.date.isoformat(): wf for wf in weather_forecast or []}
+    changed = set()
+    for day in itinerary.get("days", []):
+        wf = forecast.get(str(day.get("date")))
+        if wf is None:
+            continue
+        previous = day.get("weather") or {}
+        if previous and _is_wet(previous.get("main")) != _is_wet(wf.main):
+            changed.add(day.get("day_number"))
+        day["weather"] = {"main": wf.main, "description": wf.description, "temperature_celsius": round(wf.temp_celsius)}
+    return changed
@@ -0,0 +1,102 @@
+# services/itinerary_models.py
+"""
+Pydantic models of the itinerary the API returns.
+
+They mirror response_schemas.ITINERARY_SCHEMA and are declared as the
+endpoints' `response_model`, so the OpenAPI schema and generated clients
+describe the real response instead of an opaque object. The endpoints return
+the itinerary as an already-encoded FastJSONResponse, which FastAPI passes
+through without validating it against these models: validating a 7-day
+itinerary costs several times more than encoding it with orjson. Every
+field but the itinerary's `days` is optional and unknown fields are allowed,
+as the LLM output is not checked field by field.
+"""
+from typing import Any, Dict, List, Optional
+
+from pydantic import BaseModel, ConfigDict
+
+
+class _Lenient(BaseModel):
+    model_config = ConfigDict(extra="allow")
+
+
+class CostRange(_Lenient):
+    min: Optional[float] = None
+    max: Optional[float] = None
+
+
+class _Place(_Lenient):
+    qloo_poi_id: Optional[str] = None
+    address: Optional[str] = None
+    lat: Optional[float] = None
+    lon: Optional[float] = None
+    website: Optional[str] = None
+    estimated_cost_range: Optional[CostRange] = None
+    estimated_cost_level: Optional[str] = None
+    rationale: Optional[str] = None
+
+
+class ActivitySlot(_Place):
+    activity_name: Optional[str] = None
+    type: Optional[str] = None
+    description: Optional[str] = None
+    estimated_duration_hours: Optional[float] = None
+
+
+class MealSlot(_Place):
+    restaurant_name: Optional[str] = None
+    cuisine: Optional[str] = None
+
+
+class AlternativeActivity(ActivitySlot):
+    time_of_day: Optional[str] = None
+
+
+class DayWeather(_Lenient):
+    main: Optional[str] = None
+    description: Optional[str] = None
+    temperature_celsius: Optional[float] = None
+
+
+class ItineraryDay(_Lenient):
+    day_number: Optional[int] = None
+    date: Optional[str] = None
+    theme: Optional[str] = None
+    weather: Optional[DayWeather] = None
+    morning: Optional[ActivitySlot] = None
+    lunch: Optional[MealSlot] = None
+    afternoon: Optional[ActivitySlot] = None
+    evening: Optional[ActivitySlot] = None
+    dinner: Optional[MealSlot] = None
+    alternative_activities: Optional[List[AlternativeActivity]] = None
+
+
+class BudgetAllocation(_Lenient):
+    total_trip_budget: Optional[float] = None
+    accommodation_budget_total: Optional[float] = None
+    food_budget_total: Optional[float] = None
+    activities_budget_total: Optional[float] = None
+    food_budget_daily_avg: Optional[float] = None
+    activities_budget_daily_avg: Optional[float] = None
+    transportation_budget: Optional[float] = None
+    shopping_budget: Optional[float] = None
+
+
+class HotelDetails(_Lenient):
+    name: Optional[str] = None
+    hotelId: Optional[str] = None
+    address: Optional[str] = None
+    price_per_night: Optional[float] = None
+    total_price_for_stay: Optional[float] = None
+    currency: Optional[str] = None
+    rationale: Optional[str] = None
+
+
+class Itinerary(_Lenient):
+    trip_summary: Optional[str] = None
+    budget_allocation: Optional[BudgetAllocation] = None
+    hotel_details: Optional[HotelDetails] = None
+    alternative_hotel_options: Optional[List[HotelDetails]] = None
+    days: List[ItineraryDay]
+    # Prompt statistics, provider sources and edit details added by the API
+    metadata: Optional[Dict[str, Any]] = None
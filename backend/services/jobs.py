@@ -0,0 +1,217 @@
+# services/jobs.py
+import os
+import json
+import time
+import uuid
+import asyncio
+import sqlite3
+import threading
+from dotenv import load_dotenv
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from .storage import cache_path
+from .log import get_logger, request_id
+
+load_dotenv()
+
+logger = get_logger(__name__)
+
+JOB_STORE_BACKEND = os.getenv("JOB_STORE_BACKEND", "memory")  # "memory" or "sqlite"
+JOB_STORE_PATH = os.getenv("JOB_STORE_PATH") or cache_path("jobs.sqlite3")
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_QUEUE_MAX_DEPTH = int(os.getenv("JOB_QUEUE_MAX_DEPTH", "50"))
+JOB_RESULT_TTL = float(os.getenv("JOB_RESULT_TTL", str(24 * 3600)))
+JOB_PURGE_INTERVAL = float(os.getenv("JOB_PURGE_INTERVAL", "600"))
+# Finished jobs the memory store keeps at most, oldest dropped first, on top of the TTL.
+JOB_STORE_MAX_JOBS = int(os.getenv("JOB_STORE_MAX_JOBS", "1000"))
+
+QUEUED, RUNNING, SUCCEEDED, FAILED = "queued", "running", "succeeded", "failed"
+FINISHED_STATES = (SUCCEEDED, FAILED)
+
+
+class JobQueueFull(Exception):
+    """Raised when a job is submitted while the queue is at JOB_QUEUE_MAX_DEPTH."""
+
+
+class JobStore:
+    """Interface for job state. Jobs are plain JSON-serializable dicts."""
+
+    # Stores doing disk I/O are driven from a worker thread.
+    blocking = False
+
+    def save(self, job: dict) -> None:
+        raise NotImplementedError
+
+    def get(self, job_id: str) -> Optional[dict]:
+        raise NotImplementedError
+
+    def purge(self, older_than: float) -> None:
+        raise NotImplementedError
+
+
+class MemoryJobStore(JobStore):
+    """Keeps jobs in this process only; fine for a single uvicorn worker."""
+
+    def __init__(self, max_jobs: int = JOB_STORE_MAX_JOBS):
+        self.max_jobs = max_jobs
+        self._jobs: Dict[str, dict] = {}
+
+    def save(self, job):
+        self._jobs[job["job_id"]] = dict(job)
+        if len(self._jobs) > self.max_jobs:
+            # Jobs are kept in submission order; queued and running ones are never dropped.
+            excess = len(self._jobs) - self.max_jobs
+            for job_id in [j for j, stored in self._jobs.items() if stored["status"] in FINISHED_STATES][:excess]:
+                del self._jobs[job_id]
+
+    def get(self, job_id):
+        job = self._jobs.get(job_id)
+        return dict(job) if job else None
+
+    def purge(self, older_than):
+        for job_id in [j for j, job in self._jobs.items() if job["updated_at"] < older_than]:
+            del self._jobs[job_id]
+
+
+class SQLiteJobStore(JobStore):
+    """Keeps jobs in SQLite so any worker on the machine can report a job's status."""
+
+    blocking = True
+
+    def __init__(self, path: str = JOB_STORE_PATH):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS jobs (job_id TEXT PRIMARY KEY, updated_at REAL, body TEXT)")
+        self._conn.commit()
+
+    def save(self, job):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO jobs VALUES (?, ?, ?)",
+                (job["job_id"], job["updated_at"], json.dumps(job, default=str)),
+            )
+            self._conn.commit()
+
+    def get(self, job_id):
+        with self._lock:
+            row = self._conn.execute("SELECT body FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def purge(self, older_than):
+        with self._lock:
+            self._conn.execute("DELETE FROM jobs WHERE updated_at < ?", (older_than,))
+            self._conn.commit()
+
+
+def _build_store(name: str) -> JobStore:
+    return SQLiteJobStore() if name == "sqlite" else MemoryJobStore()
+
+
+class ItineraryJobQueue:
+    """
+    A bounded background worker pool for itinerary jobs.
+
+    At most JOB_WORKERS pipelines run at once per process, and submissions are
+    rejected with JobQueueFull once JOB_QUEUE_MAX_DEPTH jobs are waiting, so
+    overload turns into a fast 503 instead of unbounded latency.
+    """
+
+    def __init__(self, store: JobStore, workers: int = JOB_WORKERS, max_depth: int = JOB_QUEUE_MAX_DEPTH):
+        self.store = store
+        self.workers = workers
+        self.max_depth = max_depth
+        self._queue: Optional[asyncio.Queue] = None
+        self._runner: Optional[Callable[[dict], Awaitable[dict]]] = None
+        self._worker_tasks: List[asyncio.Task] = []
+        self._purge_task: Optional[asyncio.Task] = None
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize() if self._queue else 0
+
+    async def _call_store(self, method: Callable, *args):
+        if self.store.blocking:
+            return await asyncio.to_thread(method, *args)
+        return method(*args)
+
+    async def _update(self, job: dict, **fields) -> dict:
+        job.update(fields, updated_at=time.time())
+        await self._call_store(self.store.save, job)
+        return job
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        return await self._call_store(self.store.get, job_id)
+
+    async def submit(self, payload: dict) -> dict:
+        """Queues a job for `payload` and returns its initial state."""
+        if self._queue is None:
+            raise RuntimeError("Job queue is not running.")
+        if self._queue.qsize() >= self.max_depth:
+            raise JobQueueFull()
+        now = time.time()
+        job = {
+            "job_id": uuid.uuid4().hex,
+            "status": QUEUED,
+            "created_at": now,
+            "updated_at": now,
+            "result": None,
+            "error": None,
+        }
+        await self._call_store(self.store.save, job)
+        self._queue.put_nowait((job, payload))
+        logger.info("[Jobs] Queued job %s", job["job_id"])
+        return job
+
+    async def _work(self) -> None:
+        while True:
+            job, payload = await self._queue.get()
+            # Records logged while the job runs carry its ID instead of the submitting request's
+            request_id.set(job["job_id"])
+            try:
+                await self._update(job, status=RUNNING)
+                result = await self._runner(payload)
+                await self._update(job, status=SUCCEEDED, result=result)
+            except asyncio.CancelledError:
+                await self._update(job, status=FAILED, error={"status_code": 503, "detail": "Server shutting down."})
+                raise
+            except Exception as e:
+                # HTTPException-like errors keep their status code
+                error = {"status_code": getattr(e, "status_code", 500), "detail": getattr(e, "detail", str(e))}
+                logger.error("[Jobs] Job %s failed: %s", job['job_id'], error['detail'])
+                await self._update(job, status=FAILED, error=error)
+            finally:
+                self._queue.task_done()
+
+    async def _purge_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(JOB_PURGE_INTERVAL)
+            try:
+                await self._call_store(self.store.purge, time.time() - JOB_RESULT_TTL)
+            except Exception as e:
+                logger.warning("[Jobs] Purging expired jobs failed: %s", e)
+
+    async def start(self, runner: Callable[[dict], Awaitable[dict]]) -> None:
+        """Starts the worker pool. `runner` turns a request payload into an itinerary."""
+        self._runner = runner
+        self._queue = asyncio.Queue()
+        await self._call_store(self.store.purge, time.time() - JOB_RESULT_TTL)
+        self._worker_tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+        self._purge_task = asyncio.create_task(self._purge_periodically())
+        logger.info("[Jobs] Started %d itinerary workers (max queue depth %d)", self.workers, self.max_depth)
+
+    async def stop(self) -> None:
+        tasks = self._worker_tasks + ([self._purge_task] if self._purge_task else [])
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._worker_tasks = []
+        self._purge_task = None
+        # Jobs that never started would otherwise stay "queued" forever.
+        while self._queue and not self._queue.empty():
+            job, _ = self._queue.get_nowait()
+            await self._update(job, status=FAILED, error={"status_code": 503, "detail": "Server shutting down."})
+        self._queue = None
+
+
+job_queue = ItineraryJobQueue(_build_store(JOB_STORE_BACKEND))
@@ -0,0 +1,170 @@
+# services/json_stream.py
+import re
+import json
+from typing import Any, List, Optional, Tuple
+
+# Truncated documents are cut back to at most this many earlier element boundaries
+REPAIR_MAX_ATTEMPTS = 64
+
+
+class DayStreamParser:
+    """
+    Pulls complete day objects out of a streamed itinerary JSON document.
+
+    Text is fed in chunks as it arrives from the LLM. The parser tracks string
+    and nesting state across chunks, finds the top-level "days" array and
+    returns each element as soon as its closing brace arrives, well before
+    the whole document is complete. Anything outside the root object (such
+    as a ```json fence) is ignored.
+    """
+
+    def __init__(self, array_key: str = "days"):
+        self.array_key = array_key
+        self.buffer = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._last_string: Optional[str] = None
+        self._array_depth: Optional[int] = None
+        self._array_done = False
+        self._item_start: Optional[int] = None
+
+    def feed(self, text: str) -> List[dict]:
+        """Consumes the next chunk and returns the day objects completed by it."""
+        self.buffer += text
+        completed = []
+        buffer = self.buffer
+        while self._pos < len(buffer):
+            ch = buffer[self._pos]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    self._last_string = buffer[self._string_start + 1:self._pos]
+            elif ch == '"':
+                self._in_string = True
+                self._string_start = self._pos
+            elif ch in "{[":
+                if ch == "[" and self._depth == 1 and self._array_depth is None and self._last_string == self.array_key:
+                    self._array_depth = self._depth + 1
+                elif ch == "{" and not self._array_done and self._depth == self._array_depth:
+                    self._item_start = self._pos
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if ch == "}" and self._item_start is not None and self._depth == self._array_depth:
+                    item = parse_json_object(buffer[self._item_start:self._pos + 1])
+                    if item is not None:
+                        completed.append(item)
+                    self._item_start = None
+                elif ch == "]" and self._array_depth is not None and self._depth == self._array_depth - 1:
+                    self._array_done = True
+            self._pos += 1
+        return completed
+
+
+def parse_json_object(text: str) -> Optional[dict]:
+    """Parses a JSON object, returning None instead of raising on invalid input."""
+    try:
+        value = json.loads(text)
+    except json.JSONDecodeError:
+        return None
+    return value if isinstance(value, dict) else None
+
+
+def strip_code_fence(text: str) -> str:
+    """Returns the body of a ```json fenced block, or the text itself when there is none."""
+    match = re.search(r"```(?:json)?\s*\n(.*?)(?:```|$)", text, re.DOTALL)
+    return match.group(1) if match else text
+
+
+def repair_json(text: str) -> Optional[Any]:
+    """
+    Parses LLM output that is almost JSON. Handles:
+
+    - text or a code fence around the document,
+    - // and /* */ comments and trailing commas,
+    - raw newlines inside strings,
+    - truncation: the document is cut back to the last complete element and
+      its open arrays and objects are closed.
+
+    Returns None when nothing parseable is left.
+    """
+    starts = [i for i in (text.find("{"), text.find("[")) if i >= 0]
+    if not starts:
+        return None
+    out: List[str] = []
+    stack: List[str] = []
+    # (length of out, open closers) at each point where the document could be cut
+    boundaries: List[Tuple[int, str]] = []
+    in_string = escape = False
+    i, n = min(starts), len(text)
+    while i < n:
+        ch = text[i]
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+            elif ch == "\n":
+                ch = "\\n"
+            out.append(ch)
+        elif ch == "/" and text.startswith("//", i):
+            end = text.find("\n", i)
+            i = n if end < 0 else end
+            continue
+        elif ch == "/" and text.startswith("/*", i):
+            end = text.find("*/", i + 2)
+            i = n if end < 0 else end + 2
+            continue
+        elif ch == '"':
+            in_string = True
+            out.append(ch)
+        elif ch in "{[":
+            stack.append("}" if ch == "{" else "]")
+            out.append(ch)
+        elif ch in "}]":
+            while out and out[-1].isspace():
+                out.pop()
+            if out and out[-1] == ",":
+                out.pop()
+            if not stack:
+                break
+            out.append(stack.pop())
+            boundaries.append((len(out), "".join(stack)))
+            if not stack:
+                break
+        elif ch == ",":
+            boundaries.append((len(out), "".join(stack)))
+            out.append(ch)
+        else:
+            out.append(ch)
+        i += 1
+
+    document = "".join(out)
+    if not stack and not in_string:
+        return _loads(document)
+    # Truncated: first try closing everything where it stopped, then cut back
+    tail = document + ('"' if in_string else "")
+    candidates = [(tail, "".join(stack))]
+    candidates += [(document[:length], closers) for length, closers in reversed(boundaries[-REPAIR_MAX_ATTEMPTS:])]
+    for body, closers in candidates:
+        body = body.rstrip().rstrip(",")
+        value = _loads(body + closers[::-1])
+        if value is not None:
+            return value
+    return None
+
+
+def _loads(text: str) -> Optional[Any]:
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        return None
@@ -3,19 +3,97 @@ import os
 import google.generativeai as genai
 from dotenv import load_dotenv
 import asyncio
-import re
-from datetime import datetime, date
-from typing import List, Dict, Any
+from datetime import datetime, date, timedelta
+from typing import List, Dict, Any, AsyncIterator, Optional, Tuple
 
 # Import the new WeatherResult model
 from .travel_data_service import HotelResult, ActivityResult, WeatherResult
+from .json_stream import DayStreamParser, parse_json_object, repair_json, strip_code_fence
+from .response_schemas import ITINERARY_SCHEMA, PLAN_SCHEMA, DAY_SCHEMA, BUDGET_SPLIT_SCHEMA
+from .prompt_budget import (
+    PROMPT_TOKEN_BUDGET, PROMPT_HOTEL_SHARE, estimate_tokens, encode_hotel_rows, compact_activity, fit_lines, section_stats,
+)
+from .itinerary_cache import itinerary_cache, itinerary_cache_key, ITINERARY_CACHE_TTL
+from .metrics import span, timed, record_llm_usage
+from .log import get_logger
+from .serialization import dump_models_python
 
 load_dotenv()
+
+logger = get_logger(__name__)
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 if not GEMINI_API_KEY:
     raise ValueError("GEMINI_API_KEY environment variable not set.")
 genai.configure(api_key=GEMINI_API_KEY)
 
+ITINERARY_GENERATION_MODE = os.getenv("ITINERARY_GENERATION_MODE", "single")  # "single", "parallel" or "auto"
+# In "auto" mode, trips at least this long are generated day by day.
+ITINERARY_PARALLEL_MIN_DAYS = int(os.getenv("ITINERARY_PARALLEL_MIN_DAYS", "4"))
+ITINERARY_DAY_CONCURRENCY = int(os.getenv("ITINERARY_DAY_CONCURRENCY", "4"))
+# Extra attempts for a failed per-day call, so one bad day does not discard the others.
+ITINERARY_DAY_RETRIES = int(os.getenv("ITINERARY_DAY_RETRIES", "1"))
+
+# Top-level itinerary sections written by the planning call in parallel mode.
+PLAN_SECTIONS = ("trip_summary", "budget_allocation", "hotel_details", "alternative_hotel_options")
+
+# Ask Gemini for bare JSON constrained by a response schema instead of a ```json block.
+GEMINI_JSON_MODE = os.getenv("GEMINI_JSON_MODE", "true").lower() in ("1", "true", "yes")
+
+JSON_FIX_PROMPT = """The text below was meant to be a single JSON object, but it is not valid JSON.
+Return the same content as one valid JSON object. Fix only the syntax: do not add, remove or reword any values.
+
+{text}
+"""
+
+
+def _json_config(schema: dict) -> Optional[dict]:
+    """Generation config for JSON response mode, or None to use the model's defaults."""
+    if not GEMINI_JSON_MODE:
+        return None
+    return {"response_mime_type": "application/json", "response_schema": schema}
+
+
+async def decode_json_response(model, generated_text: str, schema: dict, label: str) -> Tuple[Optional[dict], str]:
+    """
+    Turns a Gemini response into a JSON object without discarding the generation.
+
+    Tries a strict parse, then a local repair (comments, trailing commas,
+    truncation), then one short "fix this JSON" call. Returns the object, or
+    None, and how it was obtained: "parsed", "repaired", "fixed" or "failed".
+    """
+    value = parse_json_object(strip_code_fence(generated_text).strip())
+    if value is not None:
+        return value, "parsed"
+    value = repair_json(generated_text)
+    if isinstance(value, dict):
+        logger.warning("[Gemini] Repaired malformed JSON in the %s response.", label)
+        return value, "repaired"
+    if "{" not in generated_text:
+        # Nothing to fix, e.g. an empty or refused response
+        logger.error("[Gemini] The %s response contained no JSON.", label)
+        return None, "failed"
+
+    logger.warning("[Gemini] Asking for a fix of the JSON in the %s response...", label)
+    try:
+        with span("llm.json_fix"):
+            response = await model.generate_content_async(
+                JSON_FIX_PROMPT.format(text=generated_text), generation_config=_json_config(schema),
+            )
+        record_llm_usage(response, "json_fix")
+        value = repair_json(response.text)
+    except Exception as e:
+        logger.error("[Gemini] JSON fix call failed: %s", e)
+        value = None
+    if isinstance(value, dict):
+        return value, "fixed"
+    logger.error("[Gemini] The %s response was not valid JSON.", label)
+    return None, "failed"
+
+
+def _count_decode(prompt_stats: dict, outcome: str) -> None:
+    decodes = prompt_stats.setdefault("json_decode", {})
+    decodes[outcome] = decodes.get(outcome, 0) + 1
+
 
 async def allocate_budget(total_budget: float, trip_length: int, primary_interest: str) -> Dict[str, Any]:
     """Allocates the total budget across different categories using an LLM."""
@@ -43,24 +121,14 @@ async def allocate_budget(total_budget: float, trip_length: int, primary_interes
 
     try:
         model = genai.GenerativeModel('gemini-1.5-flash')
-        print("Sending budget allocation prompt to Gemini...")
-        response = await model.generate_content_async(prompt)
-
-        generated_text = response.text
-        json_match = re.search(r"```json\n(.*?)```", generated_text, re.DOTALL)
-        if json_match:
-            try:
-                budget_json = json.loads(json_match.group(1))
-                print("\n✅ Successfully extracted budget JSON from markdown block!")
-                return budget_json
-            except json.JSONDecodeError:
-                print("❌ Failed to parse budget JSON even from markdown block.")
-                return None
-        else:
-            print("❌ Gemini's budget response was not valid JSON.")
-            return None
+        logger.debug("[Gemini] Sending budget allocation prompt...")
+        with span("llm.budget"):
+            response = await model.generate_content_async(prompt, generation_config=_json_config(BUDGET_SPLIT_SCHEMA))
+        record_llm_usage(response, "budget")
+        budget_json, _ = await decode_json_response(model, response.text, BUDGET_SPLIT_SCHEMA, "budget")
+        return budget_json
     except Exception as e:
-        print(f"An error occurred during Gemini budget call: {e}")
+        logger.error("[Gemini] Budget call failed: %s", e)
         return None
 
 def _normalize_poi_or_activity(item):
@@ -134,6 +202,16 @@ def _normalize_poi_or_activity(item):
     }
 
 
+def _format_date(value) -> str:
+    """Formats a date, or an ISO date string from model_dump(mode='json'), as YYYY-MM-DD."""
+    if isinstance(value, date):
+        return value.strftime('%Y-%m-%d')
+    if isinstance(value, str) and value:
+        return value[:10]
+    return "Unknown Date"
+
+
+@timed("prompt.prepare")
 def _prepare_data_for_prompt(
         user_req_data, 
         hotel_options_list, 
@@ -141,7 +219,14 @@ def _prepare_data_for_prompt(
         activities_raw, 
         weather_forecast: List[WeatherResult], 
     ):
-    """Prepares and formats the input data for the Gemini prompt."""
+    """
+    Prepares and formats the input data for the Gemini prompt.
+
+    Hotels are sent as a compact table and activities as one-line JSON, then
+    both lists are trimmed from the tail of their given order (hotels as
+    ranked, activities in recommendation order) to fit PROMPT_TOKEN_BUDGET.
+    Returns the template fields and per-section token statistics.
+    """
     destination_city = user_req_data.get('destination_city', 'Unknown City')
     destination_country = user_req_data.get('destination_country', 'Unknown Country')
     trip_length = user_req_data.get('trip_length', 1)
@@ -154,11 +239,15 @@ def _prepare_data_for_prompt(
     check_in_date_obj = user_req_data.get('check_in_date')
     check_out_date_obj = user_req_data.get('check_out_date')
 
-    check_in_date_str = check_in_date_obj.strftime('%Y-%m-%d') if isinstance(check_in_date_obj, date) else "Unknown Date"
-    check_out_date_str = check_out_date_obj.strftime('%Y-%m-%d') if isinstance(check_out_date_obj, date) else "Unknown Date"
+    check_in_date_str = _format_date(check_in_date_obj)
+    check_out_date_str = _format_date(check_out_date_obj)
 
-    serializable_hotel_list = [h.model_dump() for h in hotel_options_list]
-    all_hotel_options_string = json.dumps(serializable_hotel_list, indent=2)
+    hotel_budget = int(PROMPT_TOKEN_BUDGET * PROMPT_HOTEL_SHARE)
+    # Hotels arrive ranked best first (hotel_ranking.rank_hotels), so trimming cuts the lowest-ranked ones.
+    serializable_hotel_list = dump_models_python(hotel_options_list)
+    hotel_header, hotel_rows = encode_hotel_rows(serializable_hotel_list)
+    kept_hotel_rows = fit_lines(hotel_rows, hotel_budget, hotel_header)
+    all_hotel_options_string = "\n".join([hotel_header, *kept_hotel_rows]) if kept_hotel_rows else "No hotels available."
 
     combined_activities = []
     qloo_entities = qloo_recs_raw.get('results', {}).get('entities', [])
@@ -166,7 +255,11 @@ def _prepare_data_for_prompt(
         combined_activities.append(_normalize_poi_or_activity(poi))
     for activity in activities_raw:
         combined_activities.append(_normalize_poi_or_activity(activity))
-    all_activities_for_llm_string = json.dumps(combined_activities, indent=2)
+    activity_lines = [compact_activity(activity) for activity in combined_activities]
+    # Activities get the rest of the budget, including whatever the hotels did not use
+    activity_budget = PROMPT_TOKEN_BUDGET - estimate_tokens(all_hotel_options_string)
+    kept_activity_lines = fit_lines(activity_lines, activity_budget)
+    all_activities_for_llm_string = "\n".join(kept_activity_lines) if kept_activity_lines else "No activities available."
 
     # Format the weather forecast for the prompt
     weather_forecast_string = "No forecast available."
@@ -174,6 +267,15 @@ def _prepare_data_for_prompt(
         weather_lines = [f"- {wf.date.strftime('%Y-%m-%d')}: {wf.main} ({wf.description}), {wf.temp_celsius:.0f}°C" for wf in weather_forecast]
         weather_forecast_string = "\n".join(weather_lines)
 
+    prompt_stats = {
+        "budget": PROMPT_TOKEN_BUDGET,
+        "sections": {
+            "hotels": section_stats(all_hotel_options_string, len(kept_hotel_rows), len(hotel_rows)),
+            "activities": section_stats(all_activities_for_llm_string, len(kept_activity_lines), len(activity_lines)),
+            "weather": section_stats(weather_forecast_string, len(weather_forecast or []), len(weather_forecast or [])),
+        },
+    }
+
     # budget_allocation_string = json.dumps(budget_allocation, indent=2)
 
     return {
@@ -190,7 +292,309 @@ def _prepare_data_for_prompt(
         "all_activities_for_llm_string": all_activities_for_llm_string,
         "weather_forecast_string": weather_forecast_string, # Add weather data
         # "budget_allocation_string": budget_allocation_string,
-    }
+    }, prompt_stats
+
+_prompt_templates: Dict[str, str] = {}
+
+def _load_prompt_template(name: str = 'prompt.txt') -> str:
+    """Reads a prompt template once per process; templates never change at runtime."""
+    if name not in _prompt_templates:
+        try:
+            script_dir = os.path.dirname(__file__)
+            prompt_path = os.path.join(script_dir, '..', name)
+            if not os.path.exists(prompt_path):
+                prompt_path = os.path.join(script_dir, name)
+            with open(prompt_path, 'r', encoding='utf-8') as f:
+                _prompt_templates[name] = f.read()
+        except FileNotFoundError:
+            raise FileNotFoundError(f"{name} not found.")
+    return _prompt_templates[name]
+
+
+@timed("prompt.build")
+def build_itinerary_prompt(
+        input_request: dict,
+        qloo_recommendations: dict,
+        hotel_options: list,
+        activity_options: list,
+        weather_forecast: list,
+    ) -> Tuple[str, dict]:
+    """Fills prompt.txt with the user's request and the provider data. Returns the prompt and its token statistics."""
+    prepared_data, prompt_stats = _prepare_data_for_prompt(
+        input_request,
+        hotel_options,
+        qloo_recommendations,
+        activity_options,
+        weather_forecast, # Pass weather data
+        # budget_allocation, # Pass budget allocation
+    )
+    prompt_content = _load_prompt_template().format(**prepared_data)
+    prompt_stats["total_tokens"] = estimate_tokens(prompt_content)
+    return prompt_content, prompt_stats
+
+
+def _attach_prompt_stats(itinerary_json, prompt_stats: dict):
+    """Records the prompt's per-section token counts in the itinerary's metadata."""
+    if isinstance(itinerary_json, dict):
+        itinerary_json.setdefault("metadata", {})["prompt"] = prompt_stats
+    return itinerary_json
+
+
+def use_parallel_generation(trip_length: int, mode: Optional[str] = None) -> bool:
+    """Whether an itinerary is generated as a plan plus concurrent per-day calls."""
+    mode = mode or ITINERARY_GENERATION_MODE
+    if mode == "auto":
+        return trip_length >= ITINERARY_PARALLEL_MIN_DAYS
+    return mode == "parallel"
+
+
+def _activity_key(name: Any) -> str:
+    return " ".join(str(name or "").split()).casefold()
+
+
+def _day_plans(plan: dict, trip_length: int, check_in_date: str) -> List[dict]:
+    """One plan per day 1..trip_length, whatever the planning call returned."""
+    by_number = {}
+    for day_plan in plan.get("day_plans") or []:
+        if isinstance(day_plan, dict) and isinstance(day_plan.get("day_number"), int):
+            by_number.setdefault(day_plan["day_number"], day_plan)
+    try:
+        first_date = date.fromisoformat(check_in_date)
+    except ValueError:
+        first_date = None
+    day_plans = []
+    for day_number in range(1, trip_length + 1):
+        day_plan = dict(by_number.get(day_number, {}))
+        day_plan["day_number"] = day_number
+        if first_date:
+            day_plan["date"] = (first_date + timedelta(days=day_number - 1)).isoformat()
+        day_plan["activities"] = [a for a in day_plan.get("activities") or [] if isinstance(a, str)]
+        day_plans.append(day_plan)
+    return day_plans
+
+
+def _day_notes(day_number: int, trip_length: int) -> str:
+    if trip_length == 1:
+        return "This is a single day trip, so there is no hotel check-in or check-out."
+    if day_number == 1:
+        return "Include the hotel check-in, no earlier than the afternoon."
+    if day_number == trip_length:
+        return "Include the hotel check-out in the morning."
+    return "The day starts and ends at the hotel."
+
+
+def _weather_line(weather_forecast: list, day_date: Optional[str]) -> str:
+    for wf in weather_forecast or []:
+        if _format_date(wf.date) == day_date:
+            return f"{wf.main} ({wf.description}), {wf.temp_celsius:.0f}°C"
+    return "No forecast available."
+
+
+@timed("prompt.day")
+def build_day_prompt(
+        prepared_data: dict,
+        plan: dict,
+        day_plan: dict,
+        weather_forecast: list,
+        activity_lines: List[str],
+        taken: set,
+        notes: str = "",
+        previous_day: Optional[dict] = None,
+    ) -> str:
+    """
+    Fills day_prompt.txt for one day of a plan. `taken` holds the activities
+    assigned to any day. When editing, `previous_day` is the current version
+    of the day and `notes` the user's requested change.
+    """
+    assigned = {_activity_key(name) for name in day_plan["activities"]}
+    assigned_lines, other_lines = [], []
+    for line in activity_lines:
+        key = _activity_key((parse_json_object(line) or {}).get("name"))
+        if key in assigned:
+            assigned_lines.append(line)
+        elif key not in taken:
+            other_lines.append(line)
+    budget_allocation = plan.get("budget_allocation") or {}
+    previous_day_section = ""
+    if previous_day:
+        previous_day_json = json.dumps(previous_day, ensure_ascii=False, separators=(",", ":"))
+        previous_day_section = f"\n3.  **Current Version of This Day (revise it, keeping what still fits)**:\n{previous_day_json}\n"
+    return _load_prompt_template('day_prompt.txt').format(
+        destination_city=prepared_data["destination_city"],
+        destination_country=prepared_data["destination_country"],
+        trip_length=prepared_data["trip_length"],
+        primary_interest=prepared_data["primary_interest"],
+        dislikes_string=prepared_data["dislikes_string"],
+        dislikes_string_for_llm=prepared_data["dislikes_string_for_llm"],
+        day_number=day_plan["day_number"],
+        date=day_plan.get("date", "Unknown Date"),
+        theme=day_plan.get("theme") or "Free choice",
+        day_notes=" ".join(filter(None, [_day_notes(day_plan["day_number"], prepared_data["trip_length"]), notes])),
+        hotel_name=(plan.get("hotel_details") or {}).get("name") or "N/A",
+        food_budget_daily_avg=budget_allocation.get("food_budget_daily_avg", "unknown"),
+        activities_budget_daily_avg=budget_allocation.get("activities_budget_daily_avg", "unknown"),
+        weather_string=_weather_line(weather_forecast, day_plan.get("date")),
+        assigned_activities_string="\n".join(assigned_lines) or "None assigned; pick from the other available places.",
+        other_activities_string="\n".join(other_lines) or "None.",
+        previous_day_section=previous_day_section,
+    )
+
+
+async def _generate_json(model, prompt: str, schema: dict, label: str, prompt_stats: dict) -> Optional[dict]:
+    call = label.split()[0]  # "day 3" is timed as "day"
+    try:
+        with span(f"llm.{call}"):
+            response = await model.generate_content_async(prompt, generation_config=_json_config(schema))
+        record_llm_usage(response, call)
+        generated_text = response.text
+    except Exception as e:
+        logger.error("[Gemini] %s call failed: %s", label, e)
+        return None
+    result, outcome = await decode_json_response(model, generated_text, schema, label)
+    _count_decode(prompt_stats, outcome)
+    return result
+
+
+async def _generate_day(model, prompt: str, label: str, prompt_stats: dict, semaphore: asyncio.Semaphore) -> Optional[dict]:
+    """One day_prompt.txt call, retried up to ITINERARY_DAY_RETRIES times."""
+    for attempt in range(ITINERARY_DAY_RETRIES + 1):
+        if attempt:
+            logger.warning("[Gemini] Retrying %s (attempt %d of %d).", label, attempt + 1, ITINERARY_DAY_RETRIES + 1)
+        async with semaphore:
+            day = await _generate_json(model, prompt, DAY_SCHEMA, label, prompt_stats)
+        if day is not None:
+            return day
+    return None
+
+
+async def _generate_parallel(
+        input_request: dict,
+        qloo_recommendations: dict,
+        hotel_options: list,
+        activity_options: list,
+        weather_forecast: list,
+    ) -> AsyncIterator[Tuple[str, Any]]:
+    """
+    Generates an itinerary as one short planning call followed by concurrent
+    per-day calls, so wall-clock time follows the slowest day rather than the
+    sum of all days.
+
+    The plan picks the hotel, allocates the budget and assigns activities to
+    days; each day is then written from its own assignment. Yields ("day", day)
+    as each day completes, in completion order, then ("itinerary", itinerary)
+    merged into the prompt.txt schema, or None if the plan failed or a day
+    still failed after ITINERARY_DAY_RETRIES retries.
+    """
+    prepared_data, prompt_stats = _prepare_data_for_prompt(
+        input_request, hotel_options, qloo_recommendations, activity_options, weather_forecast,
+    )
+    plan_prompt = _load_prompt_template('plan_prompt.txt').format(**prepared_data)
+    prompt_stats.update(mode="parallel", total_tokens=estimate_tokens(plan_prompt))
+
+    model = genai.GenerativeModel('gemini-2.5-flash')
+    logger.debug("[Gemini] Sending itinerary planning prompt...")
+    plan = await _generate_json(model, plan_prompt, PLAN_SCHEMA, "planning", prompt_stats)
+    if plan is None:
+        yield "itinerary", None
+        return
+
+    day_plans = _day_plans(plan, prepared_data["trip_length"], prepared_data["check_in_date"])
+    taken = {_activity_key(name) for day_plan in day_plans for name in day_plan["activities"]}
+    activity_lines = prepared_data["all_activities_for_llm_string"].split("\n")
+    semaphore = asyncio.Semaphore(ITINERARY_DAY_CONCURRENCY)
+
+    async def generate_day(day_plan: dict) -> Optional[dict]:
+        prompt = build_day_prompt(prepared_data, plan, day_plan, weather_forecast, activity_lines, taken)
+        prompt_stats["total_tokens"] += estimate_tokens(prompt)
+        day = await _generate_day(model, prompt, f"day {day_plan['day_number']}", prompt_stats, semaphore)
+        if day is not None:
+            day["day_number"] = day_plan["day_number"]
+            day.setdefault("date", day_plan.get("date"))
+        return day
+
+    logger.debug("[Gemini] Generating %d days with up to %d concurrent calls...", len(day_plans), ITINERARY_DAY_CONCURRENCY)
+    tasks = [asyncio.ensure_future(generate_day(day_plan)) for day_plan in day_plans]
+    days = []
+    try:
+        for next_day in asyncio.as_completed(tasks):
+            day = await next_day
+            if day is not None:
+                days.append(day)
+                yield "day", day
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    if len(days) < len(day_plans):
+        logger.error("[Gemini] Only %d of %d days were generated.", len(days), len(day_plans))
+        yield "itinerary", None
+        return
+    itinerary_json = {section: plan[section] for section in PLAN_SECTIONS if section in plan}
+    itinerary_json["days"] = sorted(days, key=lambda d: d["day_number"])
+    yield "itinerary", _attach_prompt_stats(itinerary_json, prompt_stats)
+
+
+def _day_activity_keys(day: dict) -> set:
+    keys = set()
+    for slot in day.values():
+        if isinstance(slot, dict):
+            keys.update(_activity_key(slot.get(field)) for field in ("activity_name", "restaurant_name") if slot.get(field))
+    return keys
+
+
+async def regenerate_days(
+        itinerary: dict,
+        input_request: dict,
+        qloo_recommendations: dict,
+        activity_options: list,
+        weather_forecast: list,
+        day_numbers: List[int],
+        instructions: Optional[str] = None,
+    ) -> Optional[dict]:
+    """
+    Rewrites only `day_numbers` of an existing itinerary, concurrently, with
+    one day_prompt.txt call each. Hotel, budget and the other days are kept;
+    places already used on the other days are not offered again. Returns the
+    updated itinerary, or None if any day still failed after retries.
+    """
+    prepared_data, prompt_stats = _prepare_data_for_prompt(
+        input_request, [], qloo_recommendations, activity_options, weather_forecast,
+    )
+    prompt_stats.update(mode="edit", total_tokens=0)
+    days_by_number = {day.get("day_number"): day for day in itinerary.get("days", [])}
+    targets = [n for n in sorted(set(day_numbers)) if n in days_by_number]
+    taken = set()
+    for number, day in days_by_number.items():
+        if number not in targets:
+            taken |= _day_activity_keys(day)
+    activity_lines = prepared_data["all_activities_for_llm_string"].split("\n")
+    notes = f"The user asked for this change: {instructions}" if instructions else "Revise this day for the user's updated preferences."
+    semaphore = asyncio.Semaphore(ITINERARY_DAY_CONCURRENCY)
+    model = genai.GenerativeModel('gemini-2.5-flash')
+
+    async def rewrite_day(day_number: int) -> Optional[dict]:
+        previous_day = days_by_number[day_number]
+        day_plan = {"day_number": day_number, "date": previous_day.get("date"), "theme": previous_day.get("theme"), "activities": []}
+        prompt = build_day_prompt(prepared_data, itinerary, day_plan, weather_forecast, activity_lines, taken, notes, previous_day)
+        prompt_stats["total_tokens"] += estimate_tokens(prompt)
+        day = await _generate_day(model, prompt, f"day {day_number} edit", prompt_stats, semaphore)
+        if day is not None:
+            day["day_number"] = day_number
+            day["date"] = previous_day.get("date")
+        return day
+
+    logger.debug("[Gemini] Regenerating days %s of the itinerary...", targets)
+    new_days = await asyncio.gather(*(rewrite_day(n) for n in targets))
+    if any(day is None for day in new_days):
+        return None
+    replaced = dict(zip(targets, new_days))
+    edited = dict(itinerary)
+    edited["days"] = [replaced.get(day.get("day_number"), day) for day in itinerary.get("days", [])]
+    metadata = dict(edited.get("metadata") or {})
+    metadata["edit"] = {"regenerated_days": targets, "prompt": prompt_stats}
+    edited["metadata"] = metadata
+    return edited
+
 
 async def generate_itinerary(
         input_request: dict, 
@@ -199,47 +603,127 @@ async def generate_itinerary(
         activity_options: list, 
         weather_forecast: list,
         # budget_allocation: str
+        regenerate: bool = False,
+        mode: Optional[str] = None,
     ):
-    """Main function to generate a travel itinerary using Gemini."""
-    prepared_data = _prepare_data_for_prompt(
+    """
+    Main function to generate a travel itinerary using Gemini.
+
+    Itineraries are cached on the canonical request plus a fingerprint of the
+    provider data, so an equivalent request is answered without a Gemini call.
+    `regenerate=True` skips the lookup and replaces the stored itinerary.
+    `mode` overrides ITINERARY_GENERATION_MODE for this call.
+    """
+    parallel = use_parallel_generation(input_request.get('trip_length', 1), mode)
+    cache_key = itinerary_cache_key(
+        input_request, qloo_recommendations, hotel_options, activity_options, weather_forecast,
+        generation_mode="parallel" if parallel else "single",
+    )
+    if not regenerate:
+        cached_itinerary = await itinerary_cache.get(cache_key, ITINERARY_CACHE_TTL)
+        if cached_itinerary:
+            logger.info("Serving itinerary from cache.")
+            return cached_itinerary
+
+    if parallel:
+        itinerary_json = None
+        async for kind, payload in _generate_parallel(
+            input_request, qloo_recommendations, hotel_options, activity_options, weather_forecast,
+        ):
+            if kind == "itinerary":
+                itinerary_json = payload
+        if itinerary_json:
+            await itinerary_cache.set(cache_key, itinerary_json)
+        return itinerary_json
+
+    prompt_content, prompt_stats = build_itinerary_prompt(
         input_request,
-        hotel_options,
         qloo_recommendations,
+        hotel_options,
         activity_options,
-        weather_forecast, # Pass weather data
-        # budget_allocation, # Pass budget allocation
+        weather_forecast,
     )
 
-    try:
-        script_dir = os.path.dirname(__file__)
-        prompt_path = os.path.join(script_dir, '..', 'prompt.txt')
-        if not os.path.exists(prompt_path):
-            prompt_path = os.path.join(script_dir, 'prompt.txt')
-        with open(prompt_path, 'r', encoding='utf-8') as f:
-            prompt_template = f.read()
-    except FileNotFoundError:
-        raise FileNotFoundError(f"prompt.txt not found.")
-    
-    prompt_content = prompt_template.format(**prepared_data)
+    model = genai.GenerativeModel('gemini-2.5-flash')
+    logger.debug("[Gemini] Sending weather-aware itinerary prompt...")
+    itinerary_json = await _generate_json(model, prompt_content, ITINERARY_SCHEMA, "itinerary", prompt_stats)
+    itinerary_json = _attach_prompt_stats(itinerary_json, prompt_stats)
+
+    if isinstance(itinerary_json, dict) and "days" in itinerary_json:
+        await itinerary_cache.set(cache_key, itinerary_json)
+    return itinerary_json
 
+
+async def stream_itinerary(
+        input_request: dict,
+        qloo_recommendations: dict,
+        hotel_options: list,
+        activity_options: list,
+        weather_forecast: list,
+        regenerate: bool = False,
+        mode: Optional[str] = None,
+    ) -> AsyncIterator[Tuple[str, Any]]:
+    """
+    Streams an itinerary from Gemini.
+
+    Yields ("day", day) for every day object as soon as it has been fully
+    generated, then a single ("itinerary", itinerary) with the parsed final
+    document, which is None if the complete response could not be parsed.
+    Shares the itinerary cache with generate_itinerary.
+    """
+    parallel = use_parallel_generation(input_request.get('trip_length', 1), mode)
+    cache_key = itinerary_cache_key(
+        input_request, qloo_recommendations, hotel_options, activity_options, weather_forecast,
+        generation_mode="parallel" if parallel else "single",
+    )
+    if not regenerate:
+        cached_itinerary = await itinerary_cache.get(cache_key, ITINERARY_CACHE_TTL)
+        if cached_itinerary:
+            for day in cached_itinerary.get("days", []):
+                yield "day", day
+            yield "itinerary", cached_itinerary
+            return
+
+    if parallel:
+        # Days arrive whole from their own calls, in completion order
+        async for kind, payload in _generate_parallel(
+            input_request, qloo_recommendations, hotel_options, activity_options, weather_forecast,
+        ):
+            if kind == "itinerary" and payload:
+                await itinerary_cache.set(cache_key, payload)
+            yield kind, payload
+        return
+
+    prompt_content, prompt_stats = build_itinerary_prompt(
+        input_request,
+        qloo_recommendations,
+        hotel_options,
+        activity_options,
+        weather_forecast,
+    )
+
+    parser = DayStreamParser()
     try:
-        model = genai.GenerativeModel('gemini-2.5-flash') # Using 1.5 Flash 
-        print("Sending weather-aware itinerary prompt to Gemini...")
-        response = await model.generate_content_async(prompt_content)
-        
-        generated_text = response.text
-        json_match = re.search(r"```json\n(.*?)```", generated_text, re.DOTALL)
-        if json_match:
-            try:
-                itinerary_json = json.loads(json_match.group(1))
-                print("\n✅ Successfully extracted JSON from markdown block!")
-                return itinerary_json
-            except json.JSONDecodeError:
-                print("❌ Failed to parse JSON even from markdown block.")
-                return None
-        else:
-            print("❌ Gemini's response was not valid JSON.")
-            return None
+        model = genai.GenerativeModel('gemini-2.5-flash')
+        logger.debug("[Gemini] Streaming weather-aware itinerary prompt...")
+        with span("llm.itinerary_stream"):
+            response = await model.generate_content_async(
+                prompt_content, stream=True, generation_config=_json_config(ITINERARY_SCHEMA),
+            )
+            chunk = None
+            async for chunk in response:
+                for day in parser.feed(chunk.text):
+                    yield "day", day
+        # Usage is reported on the last chunk of a stream
+        record_llm_usage(chunk, "itinerary_stream")
     except Exception as e:
-        print(f"An error occurred during Gemini call: {e}")
-        return None
\ No newline at end of file
+        logger.error("[Gemini] Streaming call failed: %s", e)
+        yield "itinerary", None
+        return
+
+    itinerary_json, outcome = await decode_json_response(model, parser.buffer, ITINERARY_SCHEMA, "itinerary")
+    _count_decode(prompt_stats, outcome)
+    itinerary_json = _attach_prompt_stats(itinerary_json, prompt_stats)
+    if isinstance(itinerary_json, dict) and "days" in itinerary_json:
+        await itinerary_cache.set(cache_key, itinerary_json)
+    yield "itinerary", itinerary_json
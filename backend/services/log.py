@@ -0,0 +1,167 @@
+# services/log.py
+"""
+Structured, non-blocking logging for the API and its services.
+
+Service modules log through `get_logger(__name__)`. Records are put on a
+bounded in-memory queue by the calling coroutine and written to stdout by a
+background thread, so a slow terminal or log collector never stalls the
+event loop; when the queue is full, records are dropped and counted rather
+than blocking. Every record carries the request ID of the request it was
+logged for, read from a context variable that asyncio copies into the tasks
+a request starts.
+
+Messages use %-style arguments and are formatted by the writer thread, not
+the coroutine that logged them, so arguments must not be mutated after
+logging; nothing is formatted for disabled levels. Large payloads go through
+`log_payload`, which is sampled and serializes only when the record is
+actually written.
+
+`setup_logging()` is called from the FastAPI lifespan and the bench scripts.
+Until then, records of WARNING and above go to stderr through the logging
+module's last-resort handler.
+"""
+import os
+import sys
+import json
+import time
+import queue
+import random
+import logging
+import logging.handlers
+from contextvars import ContextVar
+from dotenv import load_dotenv
+from typing import Any, Optional
+
+load_dotenv()
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")  # "text" or "json"
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+# Share of requests whose full request/itinerary payloads are logged at DEBUG.
+LOG_PAYLOAD_SAMPLE_RATE = float(os.getenv("LOG_PAYLOAD_SAMPLE_RATE", "0.01"))
+
+ROOT_LOGGER = "tastetrail"
+
+request_id: ContextVar[str] = ContextVar("request_id", default="-")
+
+# Attributes every LogRecord has; anything else was passed through `extra=`.
+_RECORD_FIELDS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "request_id"}
+
+
+class LazyJson:
+    """Serializes its value only when the log record is written."""
+
+    __slots__ = ("value", "indent")
+
+    def __init__(self, value: Any, indent: Optional[int] = None):
+        self.value = value
+        self.indent = indent
+
+    def __str__(self) -> str:
+        value = self.value
+        if hasattr(value, "model_dump"):
+            value = value.model_dump(mode="json")
+        return json.dumps(value, indent=self.indent, ensure_ascii=False, default=str)
+
+
+class _RequestIdFilter(logging.Filter):
+    """Stamps the current request ID on a record, in the task that logged it."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id.get()
+        return True
+
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    """A QueueHandler that drops records instead of blocking or raising when the queue is full."""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """
+        Leaves the message to be formatted by the writer thread. Only a
+        traceback is rendered here, while the frames it refers to still exist;
+        `exc_info` is kept so formatters can tell the record has one.
+        """
+        if record.exc_info and not record.exc_text:
+            record.exc_text = _traceback_formatter.formatException(record.exc_info)
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, request ID, message and any `extra=` fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", "-"),
+            "msg": record.getMessage(),
+        }
+        entry.update({key: value for key, value in vars(record).items() if key not in _RECORD_FIELDS})
+        if record.exc_text or record.exc_info:
+            entry["exc"] = record.exc_text or self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+_traceback_formatter = logging.Formatter()
+
+TEXT_FORMAT = "%(asctime)s %(levelname)-7s [%(request_id)s] %(name)s: %(message)s"
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_queue_handler: Optional[_DroppingQueueHandler] = None
+_stream_handler: Optional[logging.Handler] = None
+
+
+def setup_logging(level: str = LOG_LEVEL, fmt: str = LOG_FORMAT) -> None:
+    """Routes the `tastetrail` loggers through the queue to stdout and starts the writer thread. Idempotent."""
+    global _listener, _queue_handler, _stream_handler
+    logger = logging.getLogger(ROOT_LOGGER)
+    logger.setLevel(level)
+    if _queue_handler is None:
+        _stream_handler = logging.StreamHandler(sys.stdout)
+        _queue_handler = _DroppingQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+        _queue_handler.addFilter(_RequestIdFilter())
+        logger.addHandler(_queue_handler)
+        logger.propagate = False
+    _stream_handler.setFormatter(JsonFormatter() if fmt == "json" else logging.Formatter(TEXT_FORMAT))
+    if _listener is None:
+        _listener = logging.handlers.QueueListener(_queue_handler.queue, _stream_handler)
+        _listener.start()
+
+
+def shutdown_logging() -> None:
+    """Writes out queued records, stops the writer thread and detaches the queue. Idempotent."""
+    global _listener, _queue_handler
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+    if _queue_handler is not None:
+        logger = logging.getLogger(ROOT_LOGGER)
+        logger.removeHandler(_queue_handler)
+        logger.propagate = True
+        _queue_handler = None
+
+
+def dropped_records() -> int:
+    return _queue_handler.dropped if _queue_handler is not None else 0
+
+
+def get_logger(name: str) -> logging.Logger:
+    """The logger for a module, e.g. get_logger(__name__) in services/qloo_service.py -> "tastetrail.services.qloo_service"."""
+    return logging.getLogger(f"{ROOT_LOGGER}.{name}")
+
+
+def log_payload(logger: logging.Logger, label: str, payload: Any, sample_rate: float = LOG_PAYLOAD_SAMPLE_RATE) -> None:
+    """Logs a full payload at DEBUG for a sample of calls, serializing it only if the record is written."""
+    if logger.isEnabledFor(logging.DEBUG) and random.random() < sample_rate:
+        logger.debug("%s: %s", label, LazyJson(payload, indent=2))
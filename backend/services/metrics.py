@@ -0,0 +1,212 @@
+# services/metrics.py
+import os
+import time
+import asyncio
+import functools
+import threading
+from dotenv import load_dotenv
+from typing import Any, Callable, Dict, Iterable, List, Tuple
+
+load_dotenv()
+
+# Mirror spans to OpenTelemetry when its API is installed; exporters are configured the usual OTEL_* way.
+OTEL_ENABLED = os.getenv("TASTETRAIL_OTEL", "false").lower() in ("1", "true", "yes")
+try:
+    from opentelemetry import trace as _otel_trace
+    _tracer = _otel_trace.get_tracer("tastetrail") if OTEL_ENABLED else None
+except ImportError:
+    _tracer = None
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[Any, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    """A monotonically increasing count per label set."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = ()):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self._values: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {value}" for key, value in items]
+
+
+class Histogram:
+    """Cumulative bucket counts, sum and count per label set."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values: Dict[Tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+            state[1] += value
+            state[2] += 1
+
+    def snapshot(self) -> Dict[Tuple, Tuple[List[int], float, int]]:
+        """A copy of (bucket counts, sum, count) per label set, e.g. to diff around a benchmark run."""
+        with self._lock:
+            return {key: (list(s[0]), s[1], s[2]) for key, s in self._values.items()}
+
+    def samples(self) -> List[str]:
+        items = sorted(self.snapshot().items())
+        lines = []
+        for key, (counts, total, count) in items:
+            for bound, bucket_count in zip(self.buckets, counts):
+                le = 'le="%s"' % bound
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {bucket_count}")
+            le = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+class CallbackMetric:
+    """A gauge or counter whose samples are read from live objects at scrape time."""
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = (), kind: str = "gauge"):
+        self.name, self.help, self.labelnames, self.kind = name, help, tuple(labelnames), kind
+        self._callbacks: List[Tuple[Tuple, Callable[[], float]]] = []
+
+    def register(self, callback: Callable[[], float], **labels) -> None:
+        self._callbacks.append((tuple(labels.get(name, "") for name in self.labelnames), callback))
+
+    def samples(self) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {callback()}" for key, callback in self._callbacks]
+
+
+STAGE_SECONDS = Histogram("tastetrail_stage_duration_seconds", "Duration of pipeline stages and service calls.", ("stage",))
+STAGE_ERRORS = Counter("tastetrail_stage_errors_total", "Pipeline stages and service calls that raised.", ("stage", "error"))
+UPSTREAM_REQUESTS = Counter("tastetrail_upstream_requests_total", "HTTP requests to upstream providers by outcome.", ("provider", "status"))
+UPSTREAM_SECONDS = Histogram("tastetrail_upstream_request_duration_seconds", "Latency of single HTTP attempts to upstream providers.", ("provider",))
+LLM_TOKENS = Counter("tastetrail_llm_tokens_total", "Gemini tokens used, by call and token kind.", ("call", "kind"))
+CACHE_LOOKUPS = CallbackMetric("tastetrail_cache_lookups_total", "Cache lookups by result.", ("cache", "result"), kind="counter")
+CACHE_HIT_RATIO = CallbackMetric("tastetrail_cache_hit_ratio", "Share of cache lookups answered from the cache (fresh or stale).", ("cache",))
+COALESCED_CALLS = CallbackMetric("tastetrail_coalesced_calls_total", "Calls through single-flight coalescing, by whether they ran or joined one in flight.", ("result",), kind="counter")
+BATCH_SHARED_WORK = Counter("tastetrail_batch_shared_work_total", "Batch pipeline steps, by whether they ran or reused another item's result.", ("stage", "result"))
+
+REGISTRY = [
+    STAGE_SECONDS, STAGE_ERRORS, UPSTREAM_REQUESTS, UPSTREAM_SECONDS, LLM_TOKENS,
+    CACHE_LOOKUPS, CACHE_HIT_RATIO, COALESCED_CALLS, BATCH_SHARED_WORK,
+]
+
+
+def register_cache(name: str, cache: Any) -> None:
+    """Exposes a ProviderCache's hit/stale/miss counters and hit ratio."""
+    CACHE_LOOKUPS.register(lambda: cache.hits, cache=name, result="hit")
+    CACHE_LOOKUPS.register(lambda: cache.stale_hits, cache=name, result="stale")
+    CACHE_LOOKUPS.register(lambda: cache.misses, cache=name, result="miss")
+
+    def hit_ratio() -> float:
+        lookups = cache.hits + cache.stale_hits + cache.misses
+        return (cache.hits + cache.stale_hits) / lookups if lookups else 0.0
+
+    CACHE_HIT_RATIO.register(hit_ratio, cache=name)
+
+
+def register_single_flight(flight: Any) -> None:
+    COALESCED_CALLS.register(lambda: flight.calls - flight.shared, result="executed")
+    COALESCED_CALLS.register(lambda: flight.shared, result="shared")
+
+
+def record_llm_usage(response: Any, call: str) -> None:
+    """Counts the prompt and output tokens Gemini reports for a response."""
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return
+    LLM_TOKENS.inc(getattr(usage, "prompt_token_count", 0) or 0, call=call, kind="prompt")
+    LLM_TOKENS.inc(getattr(usage, "candidates_token_count", 0) or 0, call=call, kind="output")
+
+
+class _Span:
+    def __init__(self, stage: str):
+        self.stage = stage
+        self._start = 0.0
+        self._otel = None
+
+    def __enter__(self):
+        if _tracer is not None:
+            self._otel = _tracer.start_as_current_span(self.stage)
+            self._otel.__enter__()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        STAGE_SECONDS.observe(time.perf_counter() - self._start, stage=self.stage)
+        if exc_type is not None and not issubclass(exc_type, asyncio.CancelledError):
+            STAGE_ERRORS.inc(stage=self.stage, error=exc_type.__name__)
+        if self._otel is not None:
+            self._otel.__exit__(exc_type, exc, tb)
+        return False
+
+    async def __aenter__(self):
+        return self.__enter__()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return self.__exit__(exc_type, exc, tb)
+
+
+def span(stage: str) -> _Span:
+    """Times a block as a named stage: `with span("prompt.prepare"):` or `async with span(...)`."""
+    return _Span(stage)
+
+
+def timed(stage: str):
+    """Decorator form of span() for service functions, sync or async."""
+    def decorator(func):
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(stage):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def render() -> str:
+    """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+    lines = []
+    for metric in REGISTRY:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.samples())
+    return "\n".join(lines) + "\n"
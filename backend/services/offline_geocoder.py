@@ -0,0 +1,205 @@
+# services/offline_geocoder.py
+import os
+import csv
+import math
+import numpy as np
+from dotenv import load_dotenv
+from typing import List, Optional, Tuple
+
+from .storage import cache_path, index_is_current, write_manifest
+from .log import get_logger
+
+load_dotenv()
+
+logger = get_logger(__name__)
+
+EARTH_RADIUS_M = 6371008.8
+
+SAMPLE_DATASET_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "sample_places.csv")
+
+# Set OFFLINE_GEOCODER_DATASET to a "lat,lon,address" CSV to enable the offline engine,
+# or to "sample" to use the small bundled dataset.
+OFFLINE_GEOCODER_DATASET = os.getenv("OFFLINE_GEOCODER_DATASET")
+# Beyond this distance the nearest known address is not trusted and Nominatim is used instead.
+OFFLINE_GEOCODER_MAX_DISTANCE_M = float(os.getenv("OFFLINE_GEOCODER_MAX_DISTANCE_M", "75"))
+
+# Ranges this small are scanned with one vectorized distance computation instead of being split further.
+LEAF_SIZE = 32
+
+
+def _to_unit_vectors(lats, lons) -> np.ndarray:
+    """Projects lat/lon degrees onto the unit sphere so Euclidean distance orders like great-circle distance."""
+    lat = np.radians(np.asarray(lats, dtype=np.float64))
+    lon = np.radians(np.asarray(lons, dtype=np.float64))
+    return np.column_stack((np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)))
+
+
+def _chord_to_metres(chord: float) -> float:
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, chord / 2))
+
+
+def _build_implicit_kdtree(points: np.ndarray) -> np.ndarray:
+    """
+    Returns a permutation that lays `points` out as an implicit KD-tree.
+
+    Each node is the median of its [lo, hi) range along axis depth % 3, with
+    the left subtree in [lo, mid) and the right one in [mid + 1, hi); ranges of
+    at most LEAF_SIZE points are left unsorted as leaf buckets. The tree
+    therefore needs no pointers and can be stored as a flat array.
+    """
+    order = np.arange(len(points))
+    stack = [(0, len(points), 0)]
+    while stack:
+        lo, hi, depth = stack.pop()
+        if hi - lo <= LEAF_SIZE:
+            continue
+        mid = (lo + hi) // 2
+        axis = depth % 3
+        segment = order[lo:hi]
+        # Partial sort around the median is enough: O(n) per level.
+        order[lo:hi] = segment[np.argpartition(points[segment, axis], mid - lo)]
+        stack.append((lo, mid, depth + 1))
+        stack.append((mid + 1, hi, depth + 1))
+    return order
+
+
+class OfflineGeocoder:
+    """
+    A reverse geocoder backed by a memory-mapped, array-based KD-tree.
+
+    The index is built once from a CSV of known addresses and written next to
+    the other caches; every worker then memory-maps the same files, so the OS
+    shares the pages instead of each process holding its own copy.
+    """
+
+    def __init__(self, index_dir: str):
+        self.index_dir = index_dir
+        self.points: Optional[np.ndarray] = None
+        self.addresses: Optional[np.ndarray] = None
+        self.offsets: Optional[np.ndarray] = None
+
+    @property
+    def loaded(self) -> bool:
+        return self.points is not None and len(self.points) > 0
+
+    def _paths(self) -> Tuple[str, str, str]:
+        return (
+            os.path.join(self.index_dir, "points.npy"),
+            os.path.join(self.index_dir, "addresses.bin"),
+            os.path.join(self.index_dir, "offsets.npy"),
+        )
+
+    def build(self, dataset_path: str) -> None:
+        """Reads a "lat,lon,address" CSV and writes the tree-ordered index files."""
+        lats: List[float] = []
+        lons: List[float] = []
+        addresses: List[str] = []
+        with open(dataset_path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                if row.get("lat") and row.get("lon") and row.get("address"):
+                    lats.append(float(row["lat"]))
+                    lons.append(float(row["lon"]))
+                    addresses.append(row["address"])
+
+        points = _to_unit_vectors(lats, lons)
+        order = _build_implicit_kdtree(points)
+        encoded = [addresses[i].encode("utf-8") for i in order]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(a) for a in encoded])
+
+        os.makedirs(self.index_dir, exist_ok=True)
+        points_path, addresses_path, offsets_path = self._paths()
+        # Write to temporary files and swap them in so concurrent workers never map a half-written index.
+        for path, writer in (
+            (points_path, lambda f: np.save(f, points[order])),
+            (offsets_path, lambda f: np.save(f, offsets)),
+            (addresses_path, lambda f: f.write(b"".join(encoded))),
+        ):
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                writer(f)
+            os.replace(tmp_path, path)
+        write_manifest(self.index_dir, dataset_path)
+        logger.info("[OfflineGeocoder] Indexed %d addresses from '%s'", len(encoded), dataset_path)
+
+    def load(self, dataset_path: Optional[str] = None) -> None:
+        """
+        Memory-maps the index, (re)building it first unless its manifest
+        matches the dataset's path, size and modification time.
+        """
+        points_path, addresses_path, offsets_path = self._paths()
+        if dataset_path and not (os.path.exists(points_path) and index_is_current(self.index_dir, dataset_path)):
+            self.build(dataset_path)
+        if not os.path.exists(points_path):
+            return
+        # np.asarray keeps the memory mapping but drops the slower np.memmap subclass.
+        self.points = np.asarray(np.load(points_path, mmap_mode="r"))
+        self.offsets = np.asarray(np.load(offsets_path, mmap_mode="r"))
+        if os.path.getsize(addresses_path):
+            self.addresses = np.memmap(addresses_path, dtype=np.uint8, mode="r")
+        else:
+            self.addresses = np.zeros(0, dtype=np.uint8)
+        logger.info("[OfflineGeocoder] Loaded index with %d addresses", len(self.points))
+
+    def _address_at(self, index: int) -> str:
+        start, end = int(self.offsets[index]), int(self.offsets[index + 1])
+        return bytes(self.addresses[start:end]).decode("utf-8")
+
+    def nearest(self, lat: float, lon: float) -> Optional[Tuple[str, float]]:
+        """Returns (address, distance in metres) of the closest indexed point, or None if the index is empty."""
+        if not self.loaded:
+            return None
+        query = _to_unit_vectors([lat], [lon])[0]
+        qx, qy, qz = query
+        points = self.points
+        best_index, best_sq = -1, float("inf")
+        stack = [(0, len(points), 0, 0.0)]
+        while stack:
+            lo, hi, depth, plane_sq = stack.pop()
+            # Skip subtrees whose splitting plane is further away than the best match so far.
+            if lo >= hi or plane_sq >= best_sq:
+                continue
+            if hi - lo <= LEAF_SIZE:
+                leaf_sq = ((points[lo:hi] - query) ** 2).sum(axis=1)
+                leaf_best = int(leaf_sq.argmin())
+                if leaf_sq[leaf_best] < best_sq:
+                    best_index, best_sq = lo + leaf_best, float(leaf_sq[leaf_best])
+                continue
+            mid = (lo + hi) // 2
+            px, py, pz = points[mid]
+            dist_sq = float((px - qx) ** 2 + (py - qy) ** 2 + (pz - qz) ** 2)
+            if dist_sq < best_sq:
+                best_index, best_sq = mid, dist_sq
+            axis = depth % 3
+            diff = float(query[axis] - points[mid, axis])
+            near, far = ((lo, mid), (mid + 1, hi)) if diff < 0 else ((mid + 1, hi), (lo, mid))
+            # Push the far side first so the near side is explored first.
+            stack.append((far[0], far[1], depth + 1, diff * diff))
+            stack.append((near[0], near[1], depth + 1, 0.0))
+        return self._address_at(best_index), _chord_to_metres(math.sqrt(best_sq))
+
+    def lookup(self, lat: float, lon: float, max_distance_m: float = OFFLINE_GEOCODER_MAX_DISTANCE_M) -> Optional[str]:
+        """Returns the nearest known address within `max_distance_m`, or None on a miss."""
+        match = self.nearest(lat, lon)
+        if match is None or match[1] > max_distance_m:
+            return None
+        return match[0]
+
+
+offline_geocoder = OfflineGeocoder(cache_path("offline_geocoder"))
+
+
+def load_sample_dataset(geocoder: OfflineGeocoder = offline_geocoder) -> OfflineGeocoder:
+    """Loads the bundled sample dataset, which needs no network access."""
+    geocoder.load(SAMPLE_DATASET_PATH)
+    return geocoder
+
+
+def startup() -> None:
+    """Loads the configured offline dataset, if any. Called from the FastAPI lifespan."""
+    if not OFFLINE_GEOCODER_DATASET:
+        return
+    if OFFLINE_GEOCODER_DATASET == "sample":
+        load_sample_dataset()
+    else:
+        offline_geocoder.load(OFFLINE_GEOCODER_DATASET)
@@ -0,0 +1,78 @@
+# services/prompt_budget.py
+import os
+import math
+from dotenv import load_dotenv
+from typing import Any, Dict, List, Tuple
+
+from .serialization import dumps_str
+
+load_dotenv()
+
+# Gemini averages roughly four characters per token on English text and JSON.
+PROMPT_CHARS_PER_TOKEN = float(os.getenv("PROMPT_CHARS_PER_TOKEN", "4"))
+# Token budget for the hotel and activity sections together; weather is always sent in full.
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "8000"))
+PROMPT_HOTEL_SHARE = float(os.getenv("PROMPT_HOTEL_SHARE", "0.3"))
+PROMPT_DESCRIPTION_CHARS = int(os.getenv("PROMPT_DESCRIPTION_CHARS", "240"))
+PROMPT_MAX_KEYWORDS = 5
+
+HOTEL_COLUMNS = ("hotel_id", "name", "address", "total_price", "currency")
+
+# Values _normalize_poi_or_activity uses when a field is missing; they carry no information.
+_PLACEHOLDERS = {
+    None, "", "N/A", "unknown", "Unknown address.", "No description available.", "No precise location.",
+    "Varies by event or seasonal. Check their website.",
+}
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / PROMPT_CHARS_PER_TOKEN)
+
+
+def _cell(value: Any) -> str:
+    if isinstance(value, float):
+        return f"{value:.2f}"
+    return "" if value is None else str(value).replace("|", "/").replace("\n", " ")
+
+
+def encode_hotel_rows(hotels: List[dict]) -> Tuple[str, List[str]]:
+    """Encodes hotels as a pipe-separated table: one header line plus one row per hotel."""
+    header = " | ".join(HOTEL_COLUMNS)
+    rows = [" | ".join(_cell(hotel.get(column)) for column in HOTEL_COLUMNS) for hotel in hotels]
+    return header, rows
+
+
+def compact_activity(activity: dict) -> str:
+    """Encodes one normalized activity as single-line JSON without placeholder or empty fields."""
+    compact = {}
+    for key, value in activity.items():
+        if isinstance(value, list):
+            value = value[:PROMPT_MAX_KEYWORDS]
+            if not value:
+                continue
+        elif (value is None or isinstance(value, str)) and value in _PLACEHOLDERS:
+            continue
+        if key == "description" and isinstance(value, str) and len(value) > PROMPT_DESCRIPTION_CHARS:
+            value = value[:PROMPT_DESCRIPTION_CHARS].rsplit(" ", 1)[0] + "…"
+        compact[key] = value
+    return dumps_str(compact)
+
+
+def fit_lines(lines: List[str], budget_tokens: int, header: str = "") -> List[str]:
+    """
+    Keeps lines in their given (priority) order until the token budget is spent.
+    The first line is always kept so a section is never empty when data exists.
+    """
+    used = estimate_tokens(header) if header else 0
+    kept = []
+    for line in lines:
+        cost = estimate_tokens(line) + 1  # +1 for the newline
+        if kept and used + cost > budget_tokens:
+            break
+        kept.append(line)
+        used += cost
+    return kept
+
+
+def section_stats(text: str, kept: int, available: int) -> Dict[str, int]:
+    return {"tokens": estimate_tokens(text), "items": kept, "available": available}
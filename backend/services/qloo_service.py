@@ -1,13 +1,31 @@
 # services/qloo_service.py
 import os
+import time
+import asyncio
 import httpx
 from dotenv import load_dotenv
 import json
 
+from .http_clients import get_client
+from .cache import cached, SQLiteBackend, CACHE_TTL_REFERENCE
+from .single_flight import coalesced
+from .storage import cache_path
+from .metrics import timed
+from .log import get_logger, log_payload
+
 load_dotenv()
+
+logger = get_logger(__name__)
 QLOO_API_KEY = os.getenv("QLOO_API_KEY")
 QLOO_API_URL = os.getenv("QLOO_API_URL")
 
+# Like resolution: concurrent searches, how long a resolved term is trusted,
+# and the maximum number of entities sent as the insights signal.
+QLOO_SEARCH_CONCURRENCY = int(os.getenv("QLOO_SEARCH_CONCURRENCY", "4"))
+QLOO_TERM_INDEX_TTL = float(os.getenv("QLOO_TERM_INDEX_TTL", str(30 * 24 * 3600)))
+QLOO_MAX_SIGNAL_ENTITIES = int(os.getenv("QLOO_MAX_SIGNAL_ENTITIES", "25"))
+QLOO_TERM_INDEX_PATH = os.getenv("QLOO_TERM_INDEX_PATH") or cache_path("qloo_terms.sqlite3")
+
 # Common headers for every request
 # Using the X-Api-Key header as specified in your original file.
 HEADERS = {
@@ -16,6 +34,9 @@ HEADERS = {
 }
 
 
+@timed("provider.qloo.search")
+@coalesced("qloo.search")
+@cached("qloo.search", CACHE_TTL_REFERENCE)
 async def search_entities(query: str) -> list[dict]:
     """
     Searches for entities and returns a list of dictionaries, each
@@ -24,45 +45,105 @@ async def search_entities(query: str) -> list[dict]:
     It ignores results that do not have a valid 'urn:entity:' type.
     """
     # Assuming QLOO_API_URL and HEADERS are defined elsewhere in your file
-    async with httpx.AsyncClient() as client:
-        try:
-            print(f"🚀 [Qloo] searching for '{query}'")
-            resp = await client.get(
-                f"{QLOO_API_URL}/search",
-                params={"query": query},
-                headers=HEADERS,
+    client = get_client("qloo")
+    try:
+        logger.debug("[Qloo] Searching for '%s'", query)
+        resp = await client.get(
+            f"{QLOO_API_URL}/search",
+            params={"query": query},
+            headers=HEADERS,
+        )
+        resp.raise_for_status()
+        results = resp.json()["results"]
+
+        processed_results = []
+        for item in results:
+            # Find the first type that starts with 'urn:entity:', which
+            # identifies what the item actually is (artist, movie, etc.).
+            primary_type = next(
+                (t for t in item.get("types", []) if t.startswith("urn:entity:")),
+                None  # Use None as the default if no match is found
             )
-            resp.raise_for_status()
-            results = resp.json()["results"]
 
-            processed_results = []
-            for item in results:
-                # Find the first type that starts with 'urn:entity:', which
-                # identifies what the item actually is (artist, movie, etc.).
-                primary_type = next(
-                    (t for t in item.get("types", []) if t.startswith("urn:entity:")),
-                    None  # Use None as the default if no match is found
-                )
+            # Only add the item to our list if we found a valid primary type
+            if primary_type:
+                processed_results.append({
+                    "id": item["entity_id"],
+                    "type": primary_type
+                })
+
+        return processed_results
+
+    except httpx.HTTPStatusError as e:
+        logger.error("[Qloo] Search failed: HTTP %s: %s", e.response.status_code, e.response.text)
+        return []
+    except Exception as e:
+        logger.error("[Qloo] Search error: %s", e)
+        return []
 
-                # Only add the item to our list if we found a valid primary type
-                if primary_type:
-                    processed_results.append({
-                        "id": item["entity_id"],
-                        "type": primary_type
-                    })
 
-            return processed_results
+def normalize_like(like: str) -> str:
+    """Collapses case and whitespace so "  Street food" and "street Food" are one term."""
+    return " ".join(like.split()).casefold()
 
-        except httpx.HTTPStatusError as e:
-            print(f"HTTP {e.response.status_code}: {e.response.text}")
-            return []
-        except Exception as e:
-            print(f"search_entities() error: {e}")
-            return []
 
+# Persistent term -> entities index shared by all workers; entity IDs are stable,
+# so a term only needs to be searched once a month.
+term_index = SQLiteBackend(QLOO_TERM_INDEX_PATH, max_bytes=16 * 1024 * 1024)
 
-# In services/qloo_service.py
 
+@timed("provider.qloo.resolve_likes")
+async def resolve_likes(likes: list[str], max_entities: int = QLOO_MAX_SIGNAL_ENTITIES) -> list[dict]:
+    """
+    Resolves the user's likes to a deduplicated, size-capped list of Qloo entities.
+
+    Likes are normalized and deduplicated, previously resolved terms are read
+    from the persistent term index, and only the misses are searched, at most
+    QLOO_SEARCH_CONCURRENCY at a time. Entities are then taken round-robin
+    across likes (first match of every like, then second matches, ...) so
+    each like is represented before the signal is capped at `max_entities`.
+    """
+    terms = list(dict.fromkeys(normalize_like(like) for like in likes if like and like.strip()))
+    if not terms:
+        return []
+
+    keys = {term: f"qloo.term:{term}" for term in terms}
+    stored = await asyncio.gather(*(asyncio.to_thread(term_index.get, keys[term]) for term in terms))
+    resolved = {}
+    misses = []
+    for term, entry in zip(terms, stored):
+        if entry is not None and time.time() - entry[1] < QLOO_TERM_INDEX_TTL:
+            resolved[term] = entry[0]
+        else:
+            misses.append(term)
+
+    if misses:
+        logger.debug("[Qloo] Resolving %d new likes (%d from the term index)", len(misses), len(terms) - len(misses))
+        semaphore = asyncio.Semaphore(QLOO_SEARCH_CONCURRENCY)
+
+        async def resolve(term: str) -> list[dict]:
+            async with semaphore:
+                return await search_entities(term)
+
+        for term, entities in zip(misses, await asyncio.gather(*(resolve(term) for term in misses))):
+            resolved[term] = entities
+            if entities:
+                await asyncio.to_thread(term_index.set, keys[term], entities, time.time())
+
+    unique_entities = []
+    seen_ids = set()
+    per_term = [resolved.get(term, []) for term in terms]
+    for rank in range(max((len(entities) for entities in per_term), default=0)):
+        for entities in per_term:
+            if rank < len(entities) and entities[rank]["id"] not in seen_ids:
+                seen_ids.add(entities[rank]["id"])
+                unique_entities.append(entities[rank])
+    return unique_entities[:max_entities]
+
+
+@timed("provider.qloo.recommendations")
+@coalesced("qloo.recommendations")
+@cached("qloo.recommendations", CACHE_TTL_REFERENCE)
 async def get_recommendations(
     user_likes: list[dict],
     filter_type: str,
@@ -76,8 +157,10 @@ async def get_recommendations(
     if not user_likes:
         return {}
 
+    # Duplicate IDs add nothing to the signal but make the request larger
+    unique_ids = list(dict.fromkeys(like["id"] for like in user_likes))[:QLOO_MAX_SIGNAL_ENTITIES]
     entities_payload = [
-        {"entity": like["id"], "weight": 100} for like in user_likes
+        {"entity": entity_id, "weight": 100} for entity_id in unique_ids
     ]
 
     # Correctly structure the main payload for a POST request
@@ -104,20 +187,18 @@ async def get_recommendations(
 
     final_url = f"{QLOO_API_URL}/v2/insights"
     
-    print("🚀 [Qloo] Sending Final Recommendations Request (POST)")
-    # print(f"URL: {final_url}")
-    # print(f"PAYLOAD: {payload}")
-    # print("--------------------------------------------------")
-
-    async with httpx.AsyncClient(timeout=30.0) as client:
-        try:
-            resp = await client.post(final_url, json=payload, headers=HEADERS)
-            resp.raise_for_status()
-            print("✅ [Qloo] Sucessfully generated recommendations")
-            return resp.json()
-        except httpx.HTTPStatusError as e:
-            print(f"❌ [Qloo] ERROR: Request failed. HTTP {e.response.status_code}: {e.response.text}")
-            return {}
-        except Exception as e:
-            print(f"❌ [Qloo] An unexpected application error occurred: {e}")
-            raise
+    logger.debug("[Qloo] Sending recommendations request to %s", final_url)
+    log_payload(logger, "[Qloo] Recommendations payload", payload)
+
+    client = get_client("qloo")
+    try:
+        resp = await client.post(final_url, json=payload, headers=HEADERS)
+        resp.raise_for_status()
+        logger.debug("[Qloo] Received recommendations")
+        return resp.json()
+    except httpx.HTTPStatusError as e:
+        logger.error("[Qloo] Recommendations request failed: HTTP %s: %s", e.response.status_code, e.response.text)
+        return {}
+    except Exception as e:
+        logger.exception("[Qloo] Unexpected error during recommendations request: %s", e)
+        raise
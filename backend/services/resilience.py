@@ -0,0 +1,217 @@
+# services/resilience.py
+import os
+import time
+import random
+import asyncio
+import httpx
+from dotenv import load_dotenv
+from typing import Awaitable, Dict, Optional
+
+from .metrics import UPSTREAM_REQUESTS, UPSTREAM_SECONDS
+from .rate_limiter import AsyncTokenBucket
+from .log import get_logger
+
+load_dotenv()
+
+logger = get_logger(__name__)
+
+# --- Retries, Hedging & Circuit Breaking ---
+# Defaults can be overridden globally (HTTP_*) or per provider (e.g. QLOO_HTTP_RETRIES).
+DEFAULT_RETRIES = int(os.getenv("HTTP_RETRIES", "2"))
+DEFAULT_RETRY_BACKOFF = float(os.getenv("HTTP_RETRY_BACKOFF", "0.25"))
+# Send a second, identical GET when the first has not answered after this many seconds; 0 disables hedging.
+DEFAULT_HEDGE_AFTER = float(os.getenv("HTTP_HEDGE_AFTER", "0"))
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+CIRCUIT_RESET_SECONDS = float(os.getenv("CIRCUIT_RESET_SECONDS", "30"))
+
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS"}
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# --- Request Deadlines ---
+REQUEST_DEADLINE_SECONDS = float(os.getenv("REQUEST_DEADLINE_SECONDS", "120"))
+# Share of the request deadline the provider stage may use; the LLM gets the rest.
+PROVIDER_STAGE_SHARE = float(os.getenv("PROVIDER_STAGE_SHARE", "0.4"))
+# Upper bound per provider stage, whatever the deadline allows.
+STAGE_TIMEOUTS = {
+    "qloo": float(os.getenv("QLOO_STAGE_TIMEOUT", "20")),
+    "hotels": float(os.getenv("HOTELS_STAGE_TIMEOUT", "45")),
+    "activities": float(os.getenv("ACTIVITIES_STAGE_TIMEOUT", "15")),
+    "weather": float(os.getenv("WEATHER_STAGE_TIMEOUT", "10")),
+    # Reverse geocoding of the ranked hotels, after the provider calls
+    "geocode": float(os.getenv("GEOCODE_STAGE_TIMEOUT", "15")),
+}
+
+
+class CircuitOpenError(httpx.TransportError):
+    """Raised instead of calling a provider whose circuit is open."""
+
+
+class ProviderUnavailableError(Exception):
+    """Raised by a service function whose provider failed outright, so the failure is not mistaken for an empty result."""
+
+
+class CircuitBreaker:
+    """
+    Stops calling a provider after CIRCUIT_FAILURE_THRESHOLD consecutive
+    failures. While open, calls fail immediately; every CIRCUIT_RESET_SECONDS
+    one trial call is let through, and a success closes the circuit again.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD, reset_timeout: float = CIRCUIT_RESET_SECONDS):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self._opened_at: Optional[float] = None
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        return "half_open" if time.monotonic() - self._opened_at >= self.reset_timeout else "open"
+
+    def allow(self) -> bool:
+        if self._opened_at is None:
+            return True
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            # One trial call per reset window
+            self._opened_at = time.monotonic()
+            return True
+        return False
+
+    def record_success(self) -> None:
+        if self._opened_at is not None:
+            logger.info("[Circuit] %s recovered; circuit closed.", self.name)
+        self.failures = 0
+        self._opened_at = None
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.failures >= self.failure_threshold:
+            if self._opened_at is None:
+                logger.warning("[Circuit] %s failed %d times in a row; circuit opened.", self.name, self.failures)
+            self._opened_at = time.monotonic()
+
+
+class ResilientTransport(httpx.AsyncBaseTransport):
+    """
+    Wraps a provider's pooled transport with its circuit breaker, retries of
+    idempotent requests with full-jitter exponential backoff, and optional
+    hedging. Only GET-like requests are retried or hedged; a POST is sent once.
+    With a `rate_limiter`, every request sent upstream takes a token, retries
+    and hedges included.
+    """
+
+    def __init__(
+            self,
+            transport: httpx.AsyncBaseTransport,
+            breaker: CircuitBreaker,
+            retries: int = DEFAULT_RETRIES,
+            backoff: float = DEFAULT_RETRY_BACKOFF,
+            hedge_after: float = DEFAULT_HEDGE_AFTER,
+            rate_limiter: Optional[AsyncTokenBucket] = None,
+        ):
+        self.transport = transport
+        self.breaker = breaker
+        self.retries = retries
+        self.backoff = backoff
+        self.hedge_after = hedge_after
+        self.rate_limiter = rate_limiter
+
+    async def _send(self, request: httpx.Request) -> httpx.Response:
+        if self.rate_limiter is not None:
+            await self.rate_limiter.acquire()
+        return await self.transport.handle_async_request(request)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        idempotent = request.method in IDEMPOTENT_METHODS
+        attempts = 1 + (self.retries if idempotent else 0)
+        for attempt in range(attempts):
+            if not self.breaker.allow():
+                UPSTREAM_REQUESTS.inc(provider=self.breaker.name, status="circuit_open")
+                raise CircuitOpenError(f"Circuit for {self.breaker.name} is open", request=request)
+            last_attempt = attempt == attempts - 1
+            started = time.perf_counter()
+            try:
+                if idempotent and self.hedge_after > 0:
+                    response = await self._hedged(request)
+                else:
+                    response = await self._send(request)
+            except httpx.TransportError as e:
+                UPSTREAM_SECONDS.observe(time.perf_counter() - started, provider=self.breaker.name)
+                UPSTREAM_REQUESTS.inc(provider=self.breaker.name, status=type(e).__name__)
+                self.breaker.record_failure()
+                if last_attempt:
+                    raise
+            else:
+                # Time to response headers; the body is streamed by the caller
+                UPSTREAM_SECONDS.observe(time.perf_counter() - started, provider=self.breaker.name)
+                UPSTREAM_REQUESTS.inc(provider=self.breaker.name, status=str(response.status_code))
+                if response.status_code >= 500:
+                    self.breaker.record_failure()
+                else:
+                    self.breaker.record_success()
+                if last_attempt or response.status_code not in RETRY_STATUSES:
+                    return response
+                await response.aclose()
+            await asyncio.sleep(random.uniform(0, self.backoff * 2 ** attempt))
+
+    async def _hedged(self, request: httpx.Request) -> httpx.Response:
+        """Returns the first successful of up to two identical requests, the second sent after `hedge_after`."""
+        tasks = {asyncio.ensure_future(self._send(request))}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self.hedge_after)
+            if not done:
+                tasks.add(asyncio.ensure_future(self._send(request)))
+            pending, error = set(tasks), None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                # .exception() raises CancelledError on a cancelled attempt, so those are skipped
+                finished = [task for task in done if not task.cancelled()]
+                winners = [task for task in finished if task.exception() is None]
+                if winners:
+                    # A loser that also finished must release its connection
+                    for task in winners[1:]:
+                        await task.result().aclose()
+                    return winners[0].result()
+                error = next((task.exception() for task in finished), error)
+            # Every attempt was cancelled without a provider error to report
+            raise error or asyncio.CancelledError()
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    async def aclose(self) -> None:
+        await self.transport.aclose()
+
+
+class Deadline:
+    """A per-request time budget that stages draw their timeouts from."""
+
+    def __init__(self, seconds: float = REQUEST_DEADLINE_SECONDS):
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def stage_timeout(self, stage: str) -> float:
+        """Timeout for a provider stage: its own limit, capped by the provider share of what is left."""
+        return min(STAGE_TIMEOUTS.get(stage, REQUEST_DEADLINE_SECONDS), self.remaining() * PROVIDER_STAGE_SHARE)
+
+
+async def with_timeout(awaitable: Awaitable, timeout: float):
+    """asyncio.wait_for with a readable error, so a degraded source reports why."""
+    try:
+        return await asyncio.wait_for(awaitable, timeout)
+    except asyncio.TimeoutError:
+        raise asyncio.TimeoutError(f"timed out after {timeout:.2f}s")
+
+
+breakers: Dict[str, CircuitBreaker] = {}
+
+
+def get_breaker(provider: str) -> CircuitBreaker:
+    if provider not in breakers:
+        breakers[provider] = CircuitBreaker(provider)
+    return breakers[provider]
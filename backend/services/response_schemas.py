@@ -0,0 +1,147 @@
+# services/response_schemas.py
+"""
+Gemini response schemas for the JSON documents the prompts ask for.
+
+They mirror the OUTPUT SCHEMA sections of prompt.txt, plan_prompt.txt and
+day_prompt.txt, in the OpenAPI subset Gemini accepts. Passed as
+`response_schema` together with `response_mime_type="application/json"`,
+they make Gemini emit bare JSON of that shape instead of a fenced block.
+"""
+from typing import Dict, List, Optional
+
+
+def _string(nullable: bool = False) -> dict:
+    return {"type": "STRING", "nullable": True} if nullable else {"type": "STRING"}
+
+
+def _number(nullable: bool = False) -> dict:
+    return {"type": "NUMBER", "nullable": True} if nullable else {"type": "NUMBER"}
+
+
+def _object(properties: Dict[str, dict], required: Optional[List[str]] = None) -> dict:
+    return {
+        "type": "OBJECT",
+        "properties": properties,
+        "required": list(properties) if required is None else required,
+    }
+
+
+def _array(items: dict) -> dict:
+    return {"type": "ARRAY", "items": items}
+
+
+COST_RANGE = _object({"min": _number(), "max": _number()})
+
+_PLACE_FIELDS = {
+    "address": _string(nullable=True),
+    "lat": _number(nullable=True),
+    "lon": _number(nullable=True),
+    "website": _string(nullable=True),
+    "estimated_cost_range": COST_RANGE,
+}
+
+ACTIVITY_SLOT = _object({
+    "activity_name": _string(),
+    "qloo_poi_id": _string(nullable=True),
+    "type": _string(),
+    "description": _string(),
+    "rationale": _string(),
+    "estimated_duration_hours": _number(),
+    "estimated_cost_level": {"type": "STRING", "enum": ["low", "medium", "high"]},
+    **_PLACE_FIELDS,
+})
+
+MEAL_SLOT = _object({
+    "restaurant_name": _string(),
+    "qloo_poi_id": _string(nullable=True),
+    "cuisine": _string(),
+    "rationale": _string(),
+    "estimated_cost_level": {"type": "STRING", "enum": ["low", "medium", "high"]},
+    **_PLACE_FIELDS,
+})
+
+ALTERNATIVE_ACTIVITY = _object({
+    "activity_name": _string(),
+    "qloo_poi_id": _string(nullable=True),
+    "time_of_day": {"type": "STRING", "enum": ["morning", "afternoon", "evening"]},
+    "type": _string(),
+    "description": _string(),
+    "rationale": _string(),
+    "estimated_cost_level": {"type": "STRING", "enum": ["low", "medium", "high"]},
+    **_PLACE_FIELDS,
+})
+
+DAY_SCHEMA = _object(
+    {
+        "day_number": {"type": "INTEGER"},
+        "date": _string(),
+        "theme": _string(),
+        "weather": _object({"main": _string(), "description": _string(), "temperature_celsius": _number()}),
+        "morning": ACTIVITY_SLOT,
+        "lunch": MEAL_SLOT,
+        "afternoon": ACTIVITY_SLOT,
+        "evening": ACTIVITY_SLOT,
+        "dinner": MEAL_SLOT,
+        "alternative_activities": _array(ALTERNATIVE_ACTIVITY),
+    },
+    required=["day_number", "date", "weather", "morning", "lunch", "afternoon", "evening", "dinner", "alternative_activities"],
+)
+
+BUDGET_ALLOCATION = _object({
+    "total_trip_budget": _number(),
+    "accommodation_budget_total": _number(),
+    "food_budget_total": _number(),
+    "activities_budget_total": _number(),
+    "food_budget_daily_avg": _number(),
+    "activities_budget_daily_avg": _number(),
+    "transportation_budget": _number(),
+    "shopping_budget": _number(),
+})
+
+_HOTEL_FIELDS = {
+    "name": _string(),
+    "hotelId": _string(nullable=True),
+    "address": _string(nullable=True),
+    "price_per_night": _number(nullable=True),
+    "total_price_for_stay": _number(nullable=True),
+    "currency": _string(nullable=True),
+    "rationale": _string(nullable=True),
+}
+
+HOTEL_DETAILS = _object(_HOTEL_FIELDS, required=["name"])
+
+_PLAN_HEADER = {
+    "trip_summary": _string(),
+    "budget_allocation": BUDGET_ALLOCATION,
+    "hotel_details": HOTEL_DETAILS,
+    "alternative_hotel_options": _array(_object(_HOTEL_FIELDS, required=["name", "hotelId"])),
+}
+
+# prompt.txt
+ITINERARY_SCHEMA = _object(
+    {**_PLAN_HEADER, "days": _array(DAY_SCHEMA)},
+    required=["trip_summary", "budget_allocation", "hotel_details", "days"],
+)
+
+# plan_prompt.txt
+PLAN_SCHEMA = _object(
+    {
+        **_PLAN_HEADER,
+        "day_plans": _array(_object({
+            "day_number": {"type": "INTEGER"},
+            "date": _string(),
+            "theme": _string(),
+            "activities": _array(_string()),
+        })),
+    },
+    required=["trip_summary", "budget_allocation", "hotel_details", "day_plans"],
+)
+
+# allocate_budget
+BUDGET_SPLIT_SCHEMA = _object({
+    "accommodation_budget": _number(),
+    "food_budget": _number(),
+    "activities_budget": _number(),
+    "transportation_budget": _number(),
+    "shopping_budget": _number(),
+})
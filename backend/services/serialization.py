@@ -0,0 +1,76 @@
+# services/serialization.py
+"""
+JSON encoding for API responses, SSE events, prompt lines and cache keys.
+
+With JSON_BACKEND=orjson (the default when orjson is installed) values are
+encoded by orjson, which handles dates, datetimes and numpy scalars natively
+and is several times faster than the stdlib on itinerary-sized documents.
+JSON_BACKEND=stdlib falls back to `json.dumps` with compact separators; both
+produce the same JSON. Lists of Pydantic models are encoded by pydantic-core
+in one call through a cached TypeAdapter instead of model_dump() per item.
+"""
+import os
+import json
+import functools
+from datetime import date, datetime
+from dotenv import load_dotenv
+from typing import Any, List
+
+from pydantic import BaseModel, TypeAdapter
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    orjson = None
+    ORJSON_AVAILABLE = False
+
+load_dotenv()
+
+JSON_BACKEND = os.getenv("JSON_BACKEND", "orjson" if ORJSON_AVAILABLE else "stdlib")  # "orjson" or "stdlib"
+FAST_JSON = JSON_BACKEND == "orjson" and ORJSON_AVAILABLE
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if hasattr(value, "tolist"):  # numpy arrays and scalars
+        return value.tolist()
+    if isinstance(value, (set, frozenset, tuple)):
+        return list(value)
+    return str(value)
+
+
+def dumps(value: Any, sort_keys: bool = False) -> bytes:
+    """Compact UTF-8 JSON for any value the services produce, including Pydantic models."""
+    if FAST_JSON:
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(value, default=_default, option=option)
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"), sort_keys=sort_keys, default=_default).encode("utf-8")
+
+
+def dumps_str(value: Any, sort_keys: bool = False) -> str:
+    return dumps(value, sort_keys=sort_keys).decode("utf-8")
+
+
+@functools.lru_cache(maxsize=None)
+def _list_adapter(model_type: type) -> TypeAdapter:
+    return TypeAdapter(List[model_type])
+
+
+def dump_models(models: List[BaseModel]) -> bytes:
+    """Encodes a list of same-typed Pydantic models with pydantic-core; other lists go through `dumps`."""
+    if models and isinstance(models[0], BaseModel) and all(type(m) is type(models[0]) for m in models):
+        return _list_adapter(type(models[0])).dump_json(models)
+    return dumps(models)
+
+
+def dump_models_python(models: List[BaseModel]) -> List[dict]:
+    """The list as plain dicts, converted by pydantic-core in one call."""
+    if models and isinstance(models[0], BaseModel) and all(type(m) is type(models[0]) for m in models):
+        return _list_adapter(type(models[0])).dump_python(models)
+    return [m.model_dump() if isinstance(m, BaseModel) else m for m in models]
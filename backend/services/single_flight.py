@@ -0,0 +1,52 @@
+# services/single_flight.py
+import asyncio
+import functools
+from typing import Awaitable, Callable, Dict, Iterable
+
+from .cache import make_key
+from .metrics import register_single_flight
+
+
+class SingleFlight:
+    """
+    Coalesces identical concurrent calls into one upstream request.
+
+    The first caller for a key starts the work as a task; callers arriving
+    while it is in flight await the same task and receive the same result
+    (or exception). The key is forgotten as soon as the task finishes, so
+    this never serves stale data; it only collapses bursts.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.shared = 0
+        self._in_flight: Dict[str, asyncio.Task] = {}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable]):
+        self.calls += 1
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        else:
+            self.shared += 1
+        # shield() so one caller being cancelled does not cancel the call for everyone else.
+        return await asyncio.shield(task)
+
+
+single_flight = SingleFlight()
+register_single_flight(single_flight)
+
+
+def coalesced(namespace: str, ignore: Iterable[str] = ()):
+    """Shares one in-flight call between concurrent callers with the same normalized arguments."""
+    ignore = tuple(ignore)
+
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            key = make_key(namespace, func, args, kwargs, ignore)
+            return await single_flight.do(key, lambda: func(*args, **kwargs))
+        return wrapper
+    return decorator
@@ -0,0 +1,39 @@
+# services/storage.py
+import os
+import json
+
+# Local, machine-wide state (caches, indexes) shared by every worker process.
+CACHE_DIR = os.getenv("TASTETRAIL_CACHE_DIR", os.path.join(os.path.dirname(__file__), "..", ".cache"))
+
+# Written next to an index built from a dataset file, to tell which file and version it was built from.
+MANIFEST_FILENAME = "manifest.json"
+
+
+def cache_path(filename: str) -> str:
+    """Returns the absolute path of a file inside the cache directory, creating the directory if needed."""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    return os.path.abspath(os.path.join(CACHE_DIR, filename))
+
+
+def dataset_manifest(dataset_path: str) -> dict:
+    """Identifies a dataset file by its absolute path, size and modification time."""
+    stat = os.stat(dataset_path)
+    return {"dataset": os.path.abspath(dataset_path), "size": stat.st_size, "mtime": stat.st_mtime}
+
+
+def index_is_current(index_dir: str, dataset_path: str) -> bool:
+    """Whether the index in `index_dir` was built from this exact dataset file."""
+    try:
+        with open(os.path.join(index_dir, MANIFEST_FILENAME), "r", encoding="utf-8") as f:
+            return json.load(f) == dataset_manifest(dataset_path)
+    except (OSError, ValueError):
+        return False
+
+
+def write_manifest(index_dir: str, dataset_path: str) -> None:
+    """Records the dataset an index was built from. Call after the index files are in place."""
+    path = os.path.join(index_dir, MANIFEST_FILENAME)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(dataset_manifest(dataset_path), f)
+    os.replace(tmp_path, path)
@@ -3,25 +3,40 @@ import httpx
 from dotenv import load_dotenv
 from pydantic import BaseModel, Field
 from typing import List, Optional
-from datetime import datetime, timedelta, date
-from geopy.geocoders import Nominatim
+from datetime import datetime, timedelta, timezone, date
 import asyncio
 import math
-import time
+import numpy as np
+
+from .http_clients import get_client
+from .amadeus_auth import token_manager
+from .geocoding import geocode_to_address
+from .viator_catalog import viator_catalog
+from .climatology import climatology
+from .single_flight import coalesced
+from .cache import cached, CACHE_TTL_REFERENCE, CACHE_TTL_WEATHER, CACHE_TTL_OFFERS
+from .metrics import timed
+from .resilience import ProviderUnavailableError
+from .log import get_logger
 
 # Load environment variables from .env file
 load_dotenv()
 
+logger = get_logger(__name__)
+
 # --- API Credentials ---
 AMADEUS_CLIENT_ID = os.getenv("AMADEUS_CLIENT_ID")
 AMADEUS_CLIENT_SECRET = os.getenv("AMADEUS_CLIENT_SECRET")
 AMADEUS_API_BASE_URL = "https://test.api.amadeus.com"
+HOTEL_OFFERS_BATCH_SIZE = 50
 
 VIATOR_API_KEY = os.getenv("VIATOR_API_KEY")
 VIATOR_API_BASE_URL = "https://api.viator.com/partner"
 
 OPENWEATHER_KEY = os.getenv("OPENWEATHER_KEY")
 OPENWEATHER_API_BASE_URL = "https://api.openweathermap.org"
+# The free 5-day / 3-hour forecast covers today and the next four days.
+OPENWEATHER_FORECAST_DAYS = 5
 
 # --- Pydantic Models for Standardized Data ---
 
@@ -54,70 +69,60 @@ class WeatherResult(BaseModel):
     main: str # e.g., "Rain", "Clouds", "Clear"
     description: str
     icon_code: str
+    source: str = "forecast" # "forecast" or "climatology"
 
-# --- Helper Functions ---
+# --- OpenWeather API Service Functions ---
 
-async def geocode_to_address(lat: float, lon: float) -> str:
+def aggregate_forecast(items: List[dict], utc_offset: int = 0) -> List[WeatherResult]:
     """
-    Converts latitude and longitude coordinates to a formatted address string.
-
-    This function takes geographic coordinates and uses the Nominatim geocoding
-    service (based on OpenStreetMap data) to find the corresponding
-    physical address. It then formats it into a clean, readable string.
-
-    Args:
-        lat: The latitude of the location.
-        lon: The longitude of the location.
-
-    Returns:
-        A formatted address string in the format "Street, City, Post, Country".
-        If a component is not available, it is omitted. Returns an error
-        message if the address cannot be found.
+    Aggregates 3-hour forecast entries into one result per local calendar day:
+    the mean temperature and the day's most frequent condition, described by
+    its first entry with that condition. `utc_offset` is the city's offset in
+    seconds, as OpenWeather returns it in city.timezone.
     """
-    # Initialize the geolocator with a unique user agent
-    geolocator = Nominatim(user_agent="my_personal_address_converter")
-    coordinates = f"{lat}, {lon}"
-
-    try:
-        # Perform the reverse geocoding lookup
-        location = geolocator.reverse(coordinates, language='en')
-
-        # Check if a location was found and has address data
-        if location and 'address' in location.raw:
-            address_parts = location.raw['address']
-
-            # Safely extract address components using .get() to avoid errors
-            # if a key does not exist.
-            road = address_parts.get('road', '')
-            house_number = address_parts.get('house_number', '')
-            city = address_parts.get('city', address_parts.get('town', '')) # Fallback to 'town'
-            postcode = address_parts.get('postcode', '')
-            country = address_parts.get('country', '')
-
-            # Combine house number and road to form a street address
-            street_address = f"{house_number} {road}".strip()
-
-            # Create a list of the parts that are not empty
-            final_address_parts = [part for part in [street_address, city, postcode, country] if part]
-
-            # Join the parts with a comma and space
-            return ", ".join(final_address_parts)
-        else:
-            return "N/A"
-
-    except Exception as e:
-        # Handle potential network errors or other issues
-        return f"An error occurred during geocoding: {e}"
-
-# --- OpenWeather API Service Functions ---
-
+    items = [item for item in items if item.get("weather")]
+    if not items:
+        return []
+    timestamps = np.fromiter((item["dt"] for item in items), dtype=np.int64, count=len(items))
+    temps = np.fromiter((item["main"]["temp"] for item in items), dtype=np.float64, count=len(items))
+    days, day_index = np.unique((timestamps + utc_offset) // 86400, return_inverse=True)
+    mean_temps = np.bincount(day_index, weights=temps) / np.bincount(day_index)
+
+    codes = {}
+    condition_index = np.fromiter(
+        (codes.setdefault(item["weather"][0]["main"], len(codes)) for item in items), dtype=np.int64, count=len(items),
+    )
+    counts = np.zeros((len(days), len(codes)), dtype=np.int64)
+    np.add.at(counts, (day_index, condition_index), 1)
+    dominant = counts.argmax(axis=1)
+    matching = np.flatnonzero(condition_index == dominant[day_index])
+    _, first_of_day = np.unique(day_index[matching], return_index=True)
+    representative = matching[first_of_day]
+
+    epoch = date(1970, 1, 1)
+    results = []
+    for day, temp, i in zip(days.tolist(), mean_temps.tolist(), representative.tolist()):
+        weather = items[i]["weather"][0]
+        results.append(WeatherResult(
+            date=epoch + timedelta(days=day),
+            temp_celsius=temp,
+            main=weather["main"],
+            description=weather["description"],
+            icon_code=weather["icon"],
+        ))
+    return results
+
+@timed("provider.openweather.forecast")
+@coalesced("openweather.forecast")
+@cached("openweather.forecast", CACHE_TTL_WEATHER)
 async def get_weather_forecast(city_name: str) -> List[WeatherResult]:
     """
     Gets a 5-day weather forecast for a city directly by name.
     Note: The free OpenWeather plan often provides a 5-day forecast with 3-hour intervals.
-    We will aggregate this to get a daily average.
+    We will aggregate this to get a daily average. Cached per city for CACHE_TTL_WEATHER
+    (an hour by default), as the forecast itself is only updated every few hours.
     """
-    print(f"\n🚀 [OpenWeather] Fetching 5-day forecast for '{city_name}'...")
+    logger.debug("[OpenWeather] Fetching 5-day forecast for '%s'...", city_name)
     params = {
         "q": city_name,
         "appid": OPENWEATHER_KEY,
@@ -126,91 +131,89 @@ async def get_weather_forecast(city_name: str) -> List[WeatherResult]:
     # Using the /data/2.5/forecast endpoint which is commonly available on free plans
     url = f"{OPENWEATHER_API_BASE_URL}/data/2.5/forecast"
     
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get(url, params=params)
-            response.raise_for_status()
-            forecast_data = response.json().get("list", [])
-            
-            # Aggregate 3-hour data into daily forecasts
-            daily_forecasts = {}
-            for item in forecast_data:
-                item_date = date.fromtimestamp(item['dt'])
-                if item_date not in daily_forecasts:
-                    daily_forecasts[item_date] = {
-                        "temps": [],
-                        "weather": item['weather'][0] # Take first weather entry as representative
-                    }
-                daily_forecasts[item_date]["temps"].append(item['main']['temp'])
-
-            standardized_results = []
-            for d, data in daily_forecasts.items():
-                avg_temp = sum(data['temps']) / len(data['temps'])
-                weather = WeatherResult(
-                    date=d,
-                    temp_celsius=avg_temp,
-                    main=data['weather']['main'],
-                    description=data['weather']['description'],
-                    icon_code=data['weather']['icon']
-                )
-                standardized_results.append(weather)
-            
-            print(f"✅ [OpenWeather] Successfully processed {len(standardized_results)}-day forecast.")
-            return standardized_results
+    client = get_client("openweather")
+    try:
+        response = await client.get(url, params=params)
+        response.raise_for_status()
+        body = response.json()
+        standardized_results = aggregate_forecast(body.get("list", []), body.get("city", {}).get("timezone", 0))
+
+        logger.debug("[OpenWeather] Processed %d-day forecast.", len(standardized_results))
+        return standardized_results
+
+    except httpx.HTTPStatusError as e:
+        logger.error("[OpenWeather] Forecast failed: %s - %s", e.response.status_code, e.response.text)
+        return []
+    except Exception as e:
+        logger.exception("[OpenWeather] Unexpected error processing forecast: %s", e)
+        return []
+
+
+@timed("provider.weather")
+async def get_trip_weather(city_name: str, country: str, start: date, days: int) -> List[WeatherResult]:
+    """
+    Weather for each day of a trip, in date order. Days within the forecast
+    horizon get the OpenWeather forecast; the others, and any day the forecast
+    misses, get the city's climate normals for the month, which need no
+    network call. Days with neither are left out.
+    """
+    trip_dates = [start + timedelta(days=i) for i in range(days)]
+    today = datetime.now(timezone.utc).date()
+    horizon = today + timedelta(days=OPENWEATHER_FORECAST_DAYS - 1)
 
-        except httpx.HTTPStatusError as e:
-            print(f"❌ ERROR [OpenWeather] forecast: {e.response.status_code} - {e.response.text}")
-            return []
-        except Exception as e:
-            print(f"❌ UNEXPECTED ERROR [OpenWeather] processing forecast: {e}")
-            return []
+    by_date = {}
+    if any(today <= d <= horizon for d in trip_dates):
+        # One cache entry per city however it was capitalized or spaced
+        forecast = await get_weather_forecast(" ".join(city_name.split()).title())
+        by_date = {wf.date: wf for wf in forecast}
+
+    missing = [d for d in trip_dates if d not in by_date]
+    for d, temp, main, description, icon in climatology.typical(city_name, country, missing):
+        by_date[d] = WeatherResult(date=d, temp_celsius=temp, main=main, description=description, icon_code=icon, source="climatology")
+    return [by_date[d] for d in trip_dates if d in by_date]
 
 
 # --- Amadeus API Service Functions ---
 
+def _is_outage(e: httpx.HTTPStatusError) -> bool:
+    """Whether an error response means the provider is failing, rather than that nothing matched."""
+    return e.response.status_code >= 500 or e.response.status_code in (401, 429)
+
 async def get_amadeus_access_token() -> Optional[str]:
-    """Authenticates with Amadeus to get an API access token."""
-    print("🚀 [Amadeus] Attempting to get access token...")
-    headers = {"Content-Type": "application/x-www-form-urlencoded"}
-    data = {
-        "grant_type": "client_credentials",
-        "client_id": AMADEUS_CLIENT_ID,
-        "client_secret": AMADEUS_CLIENT_SECRET,
-    }
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.post(f"{AMADEUS_API_BASE_URL}/v1/security/oauth2/token", headers=headers, data=data)
-            response.raise_for_status()
-            access_token = response.json().get("access_token")
-            print("✅ [Amadeus] Successfully retrieved access token.")
-            return access_token
-        except httpx.HTTPStatusError as e:
-            print(f"❌ ERROR [Amadeus] getting token: {e.response.status_code} - {e.response.text}")
-            return None
+    """Returns a cached Amadeus API access token, authenticating only when it is about to expire."""
+    return await token_manager.get_token()
 
+@timed("provider.amadeus.city_code")
+@coalesced("amadeus.city_code", ignore=("access_token",))
+@cached("amadeus.city_code", CACHE_TTL_REFERENCE, ignore=("access_token",), refresh_args={"access_token": token_manager.get_token})
 async def get_city_code(city_name: str, access_token: str) -> Optional[str]:
     """Gets the IATA city code required for hotel searches."""
-    print(f"🚀 [Amadeus] Fetching IATA city code for '{city_name}'...")
+    logger.debug("[Amadeus] Fetching IATA city code for '%s'...", city_name)
     headers = {"Authorization": f"Bearer {access_token}"}
     params = {"keyword": city_name, "subType": "CITY"}
     url = f"{AMADEUS_API_BASE_URL}/v1/reference-data/locations"
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get(url, headers=headers, params=params)
-            response.raise_for_status()
-            data = response.json().get("data", [])
-            data = [thing for thing in data if thing.get("iataCode")]
-            if data:
-                city_code = data[0].get("iataCode")
-                print(f"✅ [Amadeus] Found IATA code for '{city_name}': {city_code}")
-                return city_code
-            else:
-                print(f"⚠️ [Amadeus] No IATA code found for '{city_name}'.")
-                return None
-        except httpx.HTTPStatusError as e:
-            print(f"❌ [Amadeus] ERROR getting city code: {e.response.status_code} - {e.response.text}")
+    client = get_client("amadeus")
+    try:
+        response = await client.get(url, headers=headers, params=params)
+        response.raise_for_status()
+        data = response.json().get("data", [])
+        data = [thing for thing in data if thing.get("iataCode")]
+        if data:
+            city_code = data[0].get("iataCode")
+            logger.debug("[Amadeus] Found IATA code for '%s': %s", city_name, city_code)
+            return city_code
+        else:
+            logger.warning("[Amadeus] No IATA code found for '%s'.", city_name)
             return None
-
+    except httpx.HTTPStatusError as e:
+        if e.response.status_code == 401: token_manager.invalidate()
+        logger.error("[Amadeus] Getting city code failed: %s - %s", e.response.status_code, e.response.text)
+        if _is_outage(e): raise ProviderUnavailableError(f"Amadeus city code lookup failed ({e.response.status_code})") from e
+        return None
+
+@timed("provider.amadeus.hotel_list")
+@coalesced("amadeus.hotel_list", ignore=("access_token",))
+@cached("amadeus.hotel_list", CACHE_TTL_REFERENCE, ignore=("access_token",), refresh_args={"access_token": token_manager.get_token})
 async def list_hotels(
         city_name: str,
         access_token: str,
@@ -224,20 +227,49 @@ async def list_hotels(
     params = {"cityCode": city_code, "radius": 20, "radiusUnit": "KM"}
     url = f"{AMADEUS_API_BASE_URL}/v1/reference-data/locations/hotels/by-city"
 
-    print(f"\n🚀 [Amadeus] Listing hotels for '{city_name}'")
+    logger.debug("[Amadeus] Listing hotels for '%s'", city_name)
+
+    client = get_client("amadeus")
+    try:
+        response = await client.get(url, headers=headers, params=params)
+        response.raise_for_status()
+        api_results = response.json().get("data", [])
+        listings = [listing.get("hotelId") for listing in api_results if listing.get("hotelId")]
+        logger.debug("[Amadeus] Listed %d hotel results", len(listings))
+        return listings
+    except httpx.HTTPStatusError as e:
+        if e.response.status_code == 401: token_manager.invalidate()
+        logger.error("[Amadeus] Hotel listing failed: %s - %s", e.response.status_code, e.response.text)
+        if _is_outage(e): raise ProviderUnavailableError(f"Amadeus hotel listing failed ({e.response.status_code})") from e
+        return []
 
-    async with httpx.AsyncClient(timeout=30.0) as client:
-        try:
-            response = await client.get(url, headers=headers, params=params)
-            response.raise_for_status()
-            api_results = response.json().get("data", [])
-            listings = [listing.get("hotelId") for listing in api_results if listing.get("hotelId")]
-            print(f"✅ [Amadeus] Listed {len(listings)} hotel results")
-            return listings
-        except httpx.HTTPStatusError as e:
-            print(f"❌ ERROR [Amadeus] during hotel listing: {e.response.status_code} - {e.response.text}")
-            return []
+@timed("provider.amadeus.hotel_offers")
+@coalesced("amadeus.hotel_offers", ignore=("access_token",))
+@cached("amadeus.hotel_offers", CACHE_TTL_OFFERS, ignore=("access_token",), refresh_args={"access_token": token_manager.get_token})
+async def get_hotel_offers_batch(hotel_ids: List[str], access_token: str, base_params: dict) -> Optional[list]:
+    """
+    Fetches offers for one batch of hotel IDs.
 
+    Returns the raw offer list, or None if the batch failed so callers can
+    keep the results of the other batches.
+    """
+    headers = {"Authorization": f"Bearer {access_token}"}
+    url = f"{AMADEUS_API_BASE_URL}/v3/shopping/hotel-offers"
+    params = {**base_params, "hotelIds": hotel_ids}
+    client = get_client("amadeus")
+    try:
+        response = await client.get(url, headers=headers, params=params, timeout=120.0)
+        response.raise_for_status()
+        return response.json().get("data", [])
+    except httpx.HTTPStatusError as e:
+        if e.response.status_code == 401: token_manager.invalidate()
+        logger.error("[Amadeus] Hotel offers search failed: %s - %s", e.response.status_code, e.response.text)
+        return None
+    except Exception as e:
+        logger.error("[Amadeus] Unexpected error during hotel offers search: %s - %s", type(e).__name__, e)
+        return None
+
+@timed("provider.hotels")
 async def google_hotels(
     city_name: str,
     check_in_date: date = None,
@@ -246,19 +278,19 @@ async def google_hotels(
     children: int = 1,
     rooms: int = 1
 ) -> List[HotelResult]:
-    """Searches for hotels in a given city using the Amadeus API with concurrent geocoding."""
+    """Searches for hotels in a given city using the Amadeus API. Addresses are added later by add_hotel_addresses."""
     
-    print(f"\n🚀 [Amadeus] Starting hotel search for '{city_name}'")
+    logger.debug("[Amadeus] Starting hotel search for '%s'", city_name)
     if (check_out_date - check_in_date).days <= 0:
-        print("⚠️ [Amadeus] Invalid date range: Check-out date must be after check-in date.")
+        logger.warning("[Amadeus] Invalid date range: Check-out date must be after check-in date.")
         return []
 
     if rooms <= 0:
-        print("⚠️ [Amadeus] Invalid room number: Rooms must be a positive integer.")
+        logger.warning("[Amadeus] Invalid room number: Rooms must be a positive integer.")
         return []
 
     access_token = await get_amadeus_access_token()
-    if not access_token: return []
+    if not access_token: raise ProviderUnavailableError("no Amadeus access token")
 
     city_code = await get_city_code(city_name, access_token)
     if not city_code: return []
@@ -266,61 +298,37 @@ async def google_hotels(
     hotelId_list = await list_hotels(city_name, access_token, city_code)
     if not hotelId_list: return []
 
-    headers = {"Authorization": f"Bearer {access_token}"}
-    url = f"{AMADEUS_API_BASE_URL}/v3/shopping/hotel-offers"
-    api_results = []
-
-    # Fetch all hotel offers first
-    batch_size = 50
-    async with httpx.AsyncClient(timeout=120.0) as client:
-        for i in range(0, len(hotelId_list), batch_size):
-            try:
-                params = {
-                    "hotelIds": hotelId_list[i:i+batch_size],
-                    "adults": math.ceil((adults + children/2) / rooms), # adults per room
-                    "checkInDate": check_in_date.strftime("%Y-%m-%d"),
-                    "checkOutDate": check_out_date.strftime("%Y-%m-%d"),
-                    "roomQuantity": rooms,
-                    "includeClosed": "false",
-                    "paymentPolicy": "NONE",
-                    "bestRateOnly": "true",
-                    "view": "FULL",
-                    "sort": "PRICE",
-                }
-                response = await client.get(url, headers=headers, params=params)
-                response.raise_for_status()
-                api_results.extend(response.json().get("data", []))
-            except httpx.HTTPStatusError as e:
-                print(f"❌ [Amadeus] ERROR during hotel offers search: {e.response.status_code} - {e.response.text}")
-                return []
-            except Exception as e:
-                # This is the new block that catches ALL other errors
-                print(f"❌ [Amadeus] UNEXPECTED ERROR: {type(e).__name__} - {e}")
-                return []
-            time.sleep(1)
-            
-    print(f"🚀 [Amadeus] Processing {len(api_results)} hotel listings")
+    base_params = {
+        "adults": math.ceil((adults + children/2) / rooms), # adults per room
+        "checkInDate": check_in_date.strftime("%Y-%m-%d"),
+        "checkOutDate": check_out_date.strftime("%Y-%m-%d"),
+        "roomQuantity": rooms,
+        "includeClosed": "false",
+        "paymentPolicy": "NONE",
+        "bestRateOnly": "true",
+        "view": "FULL",
+        "sort": "PRICE",
+    }
 
-    # Prepare and run geocoding tasks concurrently
-    geocoding_tasks = []
-    valid_offers = []
-    for offer in api_results:
-        if offer.get('available') and 'hotel' in offer and 'offers' in offer:
-            hotel_data = offer['hotel']
-            lat = hotel_data.get('latitude')
-            lon = hotel_data.get('longitude')
-            # Create a task for each valid offer's geocoding lookup
-            geocoding_tasks.append(geocode_to_address(lat, lon))
-            valid_offers.append(offer)
-
-    # Run all tasks at once
-    print(f"🚀 [Geocoder] Starting {len(geocoding_tasks)} concurrent address lookups...")
-    addresses = await asyncio.gather(*geocoding_tasks)
-    print("✅ [Geocoder] All addresses retrieved.")
-
-    # 4. Combine results
+    # Fetch all hotel offer batches concurrently; the Amadeus client's rate limiter spaces them out
+    batches = [hotelId_list[i:i+HOTEL_OFFERS_BATCH_SIZE] for i in range(0, len(hotelId_list), HOTEL_OFFERS_BATCH_SIZE)]
+    batch_results = await asyncio.gather(
+        *(get_hotel_offers_batch(batch, access_token, base_params) for batch in batches)
+    )
+    api_results = [offer for batch in batch_results if batch for offer in batch]
+    failed_batches = sum(1 for batch in batch_results if batch is None)
+    if failed_batches == len(batches):
+        raise ProviderUnavailableError(f"all {len(batches)} Amadeus offer batches failed")
+    if failed_batches:
+        logger.warning("[Amadeus] %d/%d offer batches failed; keeping partial results.", failed_batches, len(batches))
+
+    logger.debug("[Amadeus] Processing %d hotel listings", len(api_results))
+
+    # Addresses are looked up later, only for the hotels that survive ranking (add_hotel_addresses)
     standardized_results = []
-    for i, offer in enumerate(valid_offers):
+    for offer in api_results:
+        if not (offer.get('available') and 'hotel' in offer and 'offers' in offer):
+            continue
         hotel_data = offer['hotel']
         offer_data = offer['offers'][0]
         hotel = HotelResult(
@@ -328,36 +336,38 @@ async def google_hotels(
             name=hotel_data.get('name'),
             latitude=hotel_data.get('latitude'),
             longitude=hotel_data.get('longitude'),
-            address=addresses[i],  # Use the result from the gathered tasks
             total_price=float(offer_data.get('price', {}).get('total', 0)),
             currency=offer_data.get('price', {}).get('currency', 'EUR')
         )
         standardized_results.append(hotel)
 
-    print(f"✅ [Amadeus] Standardized {len(standardized_results)} hotel results")
+    logger.debug("[Amadeus] Standardized %d hotel results", len(standardized_results))
     return standardized_results
         
 
+async def add_hotel_addresses(hotels: List[HotelResult]) -> List[HotelResult]:
+    """
+    Returns copies of `hotels` with their addresses reverse-geocoded concurrently.
+    Called on the ranked shortlist, so Nominatim's 1 request/s limit is spent
+    only on hotels that reach the prompt.
+    """
+    pending = [h for h in hotels if h.address is None]
+    logger.debug("[Geocoder] Starting %d concurrent address lookups...", len(pending))
+    addresses = await asyncio.gather(*(geocode_to_address(h.latitude, h.longitude) for h in pending))
+    found = {id(h): address for h, address in zip(pending, addresses)}
+    return [h.model_copy(update={"address": found[id(h)]}) if id(h) in found else h for h in hotels]
+
+
 # --- Viator API Service Functions ---
 
 async def get_viator_destination_id(city_name: str) -> Optional[str]:
-    """Gets Viator's internal destination ID for a given city name."""
+    """Gets Viator's internal destination ID for a given city name from the indexed destination catalog."""
     if not VIATOR_API_KEY: return None
-    headers = {"exp-api-key": VIATOR_API_KEY, "Accept-Language": "en-US", "Accept": "application/json;version=2.0"}
-    url = f"{VIATOR_API_BASE_URL}/destinations"
-    async with httpx.AsyncClient(timeout=30.0) as client:
-        try:
-            response = await client.get(url, headers=headers)
-            response.raise_for_status()
-            destinations = response.json().get("destinations", [])
-            for dest in destinations:
-                if dest.get("type") == "CITY" and city_name.lower() in dest.get("name", "").lower():
-                    return dest["destinationId"]
-            return None
-        except httpx.HTTPStatusError as e:
-            print(f"❌ [Viator] ERROR getting destination ID: {e.response.status_code} - {e.response.text}")
-            return None
+    return await viator_catalog.lookup(city_name)
 
+@timed("provider.viator.activities")
+@coalesced("viator.activities")
+@cached("viator.activities", CACHE_TTL_OFFERS)
 async def search_activities(city_name: str) -> List[ActivityResult]:
     """Searches for activities in a city using the Viator API."""
     destination_id = await get_viator_destination_id(city_name)
@@ -371,27 +381,27 @@ async def search_activities(city_name: str) -> List[ActivityResult]:
     }
     url = f"{VIATOR_API_BASE_URL}/products/search"
     
-    async with httpx.AsyncClient(timeout=30.0) as client:
-        try:
-            response = await client.post(url, headers=headers, json=payload)
-            response.raise_for_status()
-            products = response.json().get('products', [])
+    client = get_client("viator")
+    try:
+        response = await client.post(url, headers=headers, json=payload)
+        response.raise_for_status()
+        products = response.json().get('products', [])
             
-            standardized_results = []
-            for prod in products:
-                price_info = prod.get('pricing', {}).get('summary', {}).get('fromPrice')
-                activity = ActivityResult(
-                    activity_id=prod.get('productCode'),
-                    name=prod.get('title'),
-                    description=prod.get('description'),
-                    price=price_info if price_info is not None else 0.0,
-                    currency=prod.get('pricing', {}).get('currency', 'USD'),
-                    rating=prod.get('reviews', {}).get('combinedAverageRating'),
-                    image_url=prod.get('images', [{}])[0].get('url'),
-                    booking_link=prod.get('webURL')
-                )
-                standardized_results.append(activity)
-            return standardized_results
-        except httpx.HTTPStatusError as e:
-            print(f"❌ [Viator] ERROR during activity search: {e.response.status_code} - {e.response.text}")
-            return []
+        standardized_results = []
+        for prod in products:
+            price_info = prod.get('pricing', {}).get('summary', {}).get('fromPrice')
+            activity = ActivityResult(
+                activity_id=prod.get('productCode'),
+                name=prod.get('title'),
+                description=prod.get('description'),
+                price=price_info if price_info is not None else 0.0,
+                currency=prod.get('pricing', {}).get('currency', 'USD'),
+                rating=prod.get('reviews', {}).get('combinedAverageRating'),
+                image_url=prod.get('images', [{}])[0].get('url'),
+                booking_link=prod.get('webURL')
+            )
+            standardized_results.append(activity)
+        return standardized_results
+    except httpx.HTTPStatusError as e:
+        logger.error("[Viator] Activity search failed: %s - %s", e.response.status_code, e.response.text)
+        return []
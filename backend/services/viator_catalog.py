@@ -0,0 +1,238 @@
+# services/viator_catalog.py
+import os
+import re
+import json
+import time
+import bisect
+import asyncio
+import difflib
+import unicodedata
+import httpx
+from dotenv import load_dotenv
+from typing import Dict, List, Optional, Set
+
+from .http_clients import get_client
+from .storage import cache_path
+from .log import get_logger
+
+load_dotenv()
+
+logger = get_logger(__name__)
+
+VIATOR_API_KEY = os.getenv("VIATOR_API_KEY")
+VIATOR_API_BASE_URL = "https://api.viator.com/partner"
+
+VIATOR_CATALOG_PATH = os.getenv("VIATOR_CATALOG_PATH") or cache_path("viator_destinations.json")
+VIATOR_CATALOG_REFRESH_SECONDS = float(os.getenv("VIATOR_CATALOG_REFRESH_SECONDS", str(24 * 3600)))
+# Wait after a failed download before the next attempt, doubled on each consecutive failure up to the refresh interval.
+VIATOR_CATALOG_RETRY_SECONDS = float(os.getenv("VIATOR_CATALOG_RETRY_SECONDS", "300"))
+VIATOR_FUZZY_CUTOFF = float(os.getenv("VIATOR_FUZZY_CUTOFF", "0.85"))
+
+
+def normalize_name(name: str) -> str:
+    """Lowercases, strips accents and punctuation: "São Paulo " -> "sao paulo"."""
+    name = unicodedata.normalize("NFKD", name or "")
+    name = "".join(ch for ch in name if not unicodedata.combining(ch))
+    name = re.sub(r"[^\w\s]", " ", name.casefold())
+    return " ".join(name.split())
+
+
+class ViatorDestinationCatalog:
+    """
+    An in-memory index of Viator's CITY destinations.
+
+    The full /destinations list is downloaded once, persisted to disk and
+    refreshed on a schedule. Once an index is loaded, lookups never wait for
+    a download: a stale catalog is served while one background task refreshes
+    it, and failed downloads are retried with backoff. Lookups try, in order: an exact normalized name,
+    a name the query is a whole-word prefix of, the longest name made only of
+    query tokens, and finally a close fuzzy match. Ties are broken on name
+    length and then the name itself, so the same query always resolves the
+    same way.
+    """
+
+    def __init__(self, path: str = VIATOR_CATALOG_PATH, refresh_seconds: float = VIATOR_CATALOG_REFRESH_SECONDS):
+        self.path = path
+        self.refresh_seconds = refresh_seconds
+        self.fetched_at = 0.0
+        self.attempted_at = 0.0
+        self._failures = 0
+        self._by_name: Dict[str, List[str]] = {}
+        self._sorted_names: List[str] = []
+        self._by_token: Dict[str, Set[str]] = {}
+        self._lock: Optional[asyncio.Lock] = None
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._background: Optional[asyncio.Task] = None
+
+    @property
+    def loaded(self) -> bool:
+        return bool(self._by_name)
+
+    def _index(self, destinations: List[dict]) -> None:
+        by_name: Dict[str, List[str]] = {}
+        for dest in destinations:
+            if dest.get("type") != "CITY" or not dest.get("destinationId"):
+                continue
+            by_name.setdefault(normalize_name(dest.get("name", "")), []).append(str(dest["destinationId"]))
+        by_token: Dict[str, Set[str]] = {}
+        for name in by_name:
+            for token in name.split():
+                by_token.setdefault(token, set()).add(name)
+        self._by_name = {name: sorted(ids) for name, ids in by_name.items() if name}
+        self._sorted_names = sorted(self._by_name)
+        self._by_token = by_token
+
+    def _load_from_disk(self) -> bool:
+        if not os.path.exists(self.path):
+            return False
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                stored = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning("[Viator] Could not read destination catalog from disk: %s", e)
+            return False
+        self._index(stored.get("destinations", []))
+        self.fetched_at = stored.get("fetched_at", 0.0)
+        return self.loaded
+
+    def _save_to_disk(self, destinations: List[dict]) -> None:
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"fetched_at": self.fetched_at, "destinations": destinations}, f)
+        os.replace(tmp_path, self.path)
+
+    async def _download(self) -> Optional[List[dict]]:
+        if not VIATOR_API_KEY: return None
+        headers = {"exp-api-key": VIATOR_API_KEY, "Accept-Language": "en-US", "Accept": "application/json;version=2.0"}
+        client = get_client("viator")
+        try:
+            logger.info("[Viator] Downloading destination catalog...")
+            response = await client.get(f"{VIATOR_API_BASE_URL}/destinations", headers=headers)
+            response.raise_for_status()
+            # Only the fields used for matching are kept on disk.
+            destinations = [
+                {"destinationId": d.get("destinationId"), "name": d.get("name"), "type": d.get("type")}
+                for d in response.json().get("destinations", [])
+                if d.get("type") == "CITY"
+            ]
+            logger.info("[Viator] Indexed %d city destinations.", len(destinations))
+            return destinations
+        except httpx.HTTPStatusError as e:
+            logger.error("[Viator] Getting destination catalog failed: %s - %s", e.response.status_code, e.response.text)
+            return None
+        except Exception as e:
+            logger.error("[Viator] Unexpected error getting destination catalog: %s", e)
+            return None
+
+    async def refresh(self) -> bool:
+        """Downloads the catalog and swaps in the new index. Keeps the old one on failure."""
+        self.attempted_at = time.time()
+        destinations = await self._download()
+        if not destinations:
+            self._failures += 1
+            return False
+        self._failures = 0
+        self.fetched_at = time.time()
+        self._index(destinations)
+        await asyncio.to_thread(self._save_to_disk, destinations)
+        return True
+
+    def _refresh_due(self) -> bool:
+        """Whether the catalog is stale and any backoff after failed downloads has passed."""
+        now = time.time()
+        if now - self.fetched_at < self.refresh_seconds:
+            return False
+        if self._failures:
+            backoff = min(VIATOR_CATALOG_RETRY_SECONDS * 2 ** (self._failures - 1), self.refresh_seconds)
+            return now - self.attempted_at >= backoff
+        return True
+
+    async def _refresh_if_due(self) -> None:
+        async with self._lock:
+            if self._refresh_due():
+                await self.refresh()
+
+    def _refresh_in_background(self) -> None:
+        if self._background is None or self._background.done():
+            self._background = asyncio.create_task(self._refresh_if_due())
+
+    async def ensure_loaded(self) -> None:
+        """
+        Loads the catalog from disk, downloading it only if there is none.
+        A stale catalog is returned as-is and refreshed in the background.
+        """
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        if not self.loaded:
+            async with self._lock:
+                if not self.loaded:
+                    await asyncio.to_thread(self._load_from_disk)
+                if not self.loaded and self._refresh_due():
+                    await self.refresh()
+        if self.loaded and self._refresh_due():
+            self._refresh_in_background()
+
+    def match(self, city_name: str) -> Optional[str]:
+        """Resolves a city name against the loaded index without any I/O."""
+        query = normalize_name(city_name)
+        if not query or not self.loaded:
+            return None
+
+        if query in self._by_name:
+            return self._by_name[query][0]
+
+        candidates: List[str] = []
+        start = bisect.bisect_left(self._sorted_names, query)
+        for name in self._sorted_names[start:]:
+            if not name.startswith(query):
+                break
+            # Only whole-word prefixes: "york" must not match "yorktown".
+            if name[len(query)] == " ":
+                candidates.append(name)
+
+        if not candidates:
+            # Names made only of query tokens: "new york city usa" -> "new york city".
+            # The reverse is never allowed, so "york" cannot resolve to "new york".
+            query_tokens = set(query.split())
+            names = set().union(*(self._by_token.get(token, set()) for token in query_tokens))
+            contained = [name for name in names if set(name.split()) <= query_tokens]
+            if contained:
+                best = max(contained, key=lambda name: (len(name.split()), len(name), name))
+                return self._by_name[best][0]
+
+        if not candidates:
+            candidates = difflib.get_close_matches(query, self._sorted_names, n=1, cutoff=VIATOR_FUZZY_CUTOFF)
+
+        if not candidates:
+            return None
+        best = min(candidates, key=lambda name: (len(name), name))
+        return self._by_name[best][0]
+
+    async def lookup(self, city_name: str) -> Optional[str]:
+        await self.ensure_loaded()
+        return self.match(city_name)
+
+    async def _refresh_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self.refresh_seconds)
+            async with self._lock:
+                refreshed = await self.refresh()
+            if not refreshed:
+                logger.warning("[Viator] Scheduled catalog refresh failed; keeping the previous catalog.")
+
+    async def start(self) -> None:
+        """Loads the catalog and schedules periodic refreshes. Called from the FastAPI lifespan."""
+        if not VIATOR_API_KEY:
+            return
+        await self.ensure_loaded()
+        self._refresh_task = asyncio.create_task(self._refresh_periodically())
+
+    async def stop(self) -> None:
+        for task in (self._refresh_task, self._background):
+            if task and not task.done():
+                task.cancel()
+        self._refresh_task = None
+        self._background = None
+
+
+viator_catalog = ViatorDestinationCatalog()